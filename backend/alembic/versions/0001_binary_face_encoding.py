@@ -0,0 +1,74 @@
+"""Store Person.face_encoding as raw float32 bytes instead of JSON
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+import numpy as np
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+
+def _face_encoding_is_binary(bind) -> bool:
+    columns = {column["name"]: column for column in sa.inspect(bind).get_columns("persons")}
+    return isinstance(columns["face_encoding"]["type"], sa.LargeBinary)
+
+
+def _convert(bind, source_type, target_type, convert):
+    """Rewrite face_encoding from ``source_type`` to ``target_type`` in id-ordered batches."""
+    op.add_column("persons", sa.Column("face_encoding_new", target_type))
+
+    persons = sa.table(
+        "persons",
+        sa.column("id", sa.Integer),
+        sa.column("face_encoding", source_type),
+        sa.column("face_encoding_new", target_type),
+    )
+
+    update = persons.update().where(persons.c.id == sa.bindparam("_id")).values(
+        face_encoding_new=sa.bindparam("_value", type_=target_type)
+    )
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(persons.c.id, persons.c.face_encoding)
+            .where(persons.c.id > last_id, persons.c.face_encoding.isnot(None))
+            .order_by(persons.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        bind.execute(update, [{"_id": row.id, "_value": convert(row.face_encoding)} for row in rows])
+        last_id = rows[-1].id
+
+    with op.batch_alter_table("persons") as batch_op:
+        batch_op.drop_column("face_encoding")
+        batch_op.alter_column("face_encoding_new", new_column_name="face_encoding")
+
+
+def upgrade():
+    bind = op.get_bind()
+    # Databases created after this change already have the binary column
+    if _face_encoding_is_binary(bind):
+        return
+    _convert(
+        bind, sa.JSON(), sa.LargeBinary(),
+        lambda value: np.asarray(value, dtype=np.float32).tobytes()
+    )
+
+
+def downgrade():
+    bind = op.get_bind()
+    if not _face_encoding_is_binary(bind):
+        return
+    _convert(
+        bind, sa.LargeBinary(), sa.JSON(),
+        lambda value: np.frombuffer(value, dtype=np.float32).tolist()
+    )
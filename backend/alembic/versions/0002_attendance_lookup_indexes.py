@@ -0,0 +1,50 @@
+"""Index attendance records by person and check-in time
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+OPEN_WHERE = sa.text("check_out_time IS NULL")
+
+
+def _existing_indexes(bind) -> set:
+    return {index["name"] for index in sa.inspect(bind).get_indexes("attendance_records")}
+
+
+def upgrade():
+    bind = op.get_bind()
+    existing = _existing_indexes(bind)
+    # Build without blocking check-ins on PostgreSQL; CONCURRENTLY cannot run in a transaction
+    with op.get_context().autocommit_block():
+        if "ix_attendance_person_check_in" not in existing:
+            op.create_index(
+                "ix_attendance_person_check_in",
+                "attendance_records",
+                ["person_id", "check_in_time"],
+                postgresql_concurrently=True
+            )
+        if "ix_attendance_open_person_check_in" not in existing:
+            op.create_index(
+                "ix_attendance_open_person_check_in",
+                "attendance_records",
+                ["person_id", "check_in_time"],
+                postgresql_where=OPEN_WHERE,
+                sqlite_where=OPEN_WHERE,
+                postgresql_concurrently=True
+            )
+
+
+def downgrade():
+    bind = op.get_bind()
+    existing = _existing_indexes(bind)
+    for name in ("ix_attendance_open_person_check_in", "ix_attendance_person_check_in"):
+        if name in existing:
+            op.drop_index(name, table_name="attendance_records")
@@ -0,0 +1,34 @@
+"""Index attendance records in listing order for keyset pagination
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def _existing_indexes(bind) -> set:
+    return {index["name"] for index in sa.inspect(bind).get_indexes("attendance_records")}
+
+
+def upgrade():
+    if "ix_attendance_check_in_id" in _existing_indexes(op.get_bind()):
+        return
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_attendance_check_in_id",
+            "attendance_records",
+            ["check_in_time", "id"],
+            postgresql_concurrently=True
+        )
+
+
+def downgrade():
+    if "ix_attendance_check_in_id" in _existing_indexes(op.get_bind()):
+        op.drop_index("ix_attendance_check_in_id", table_name="attendance_records")
@@ -0,0 +1,87 @@
+"""Add the attendance_daily rollup table and backfill it from attendance_records
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    columns = (
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("date", sa.Date(), nullable=False),
+        sa.Column("location", sa.String(), nullable=False),
+        sa.Column("department", sa.String(), nullable=False),
+        sa.Column("check_ins", sa.Integer(), nullable=False),
+        sa.Column("check_outs", sa.Integer(), nullable=False),
+        sa.Column("persons", sa.Integer(), nullable=False),
+    )
+    # Databases the app has already started against got the table from create_all
+    if not sa.inspect(bind).has_table("attendance_daily"):
+        op.create_table(
+            "attendance_daily",
+            *columns,
+            sa.UniqueConstraint("date", "location", "department", name="uq_attendance_daily_key"),
+        )
+        op.create_index("ix_attendance_daily_id", "attendance_daily", ["id"])
+    daily = sa.table("attendance_daily", *(sa.column(column.name) for column in columns))
+
+    # Only an empty rollup is backfilled; a populated one is already maintained by check-ins
+    if bind.execute(sa.select(sa.func.count()).select_from(daily)).scalar():
+        return
+
+    records = sa.table(
+        "attendance_records",
+        sa.column("id", sa.Integer),
+        sa.column("person_id", sa.Integer),
+        sa.column("check_in_time", sa.DateTime),
+        sa.column("check_out_time", sa.DateTime),
+        sa.column("location", sa.String),
+    )
+    persons = sa.table(
+        "persons",
+        sa.column("id", sa.Integer),
+        sa.column("department", sa.String),
+    )
+
+    # One row per record, flagged with whether it is the person's first check-in of its day
+    day = sa.func.date(records.c.check_in_time)
+    per_record = sa.select(
+        day.label("date"),
+        sa.func.coalesce(records.c.location, "").label("location"),
+        sa.func.coalesce(persons.c.department, "").label("department"),
+        sa.case((records.c.check_out_time.isnot(None), 1), else_=0).label("closed"),
+        sa.func.row_number().over(
+            partition_by=(records.c.person_id, day),
+            order_by=(records.c.check_in_time, records.c.id)
+        ).label("nth"),
+    ).select_from(
+        records.outerjoin(persons, persons.c.id == records.c.person_id)
+    ).subquery()
+
+    bind.execute(
+        daily.insert().from_select(
+            ["date", "location", "department", "check_ins", "check_outs", "persons"],
+            sa.select(
+                per_record.c.date,
+                per_record.c.location,
+                per_record.c.department,
+                sa.func.count(),
+                sa.func.sum(per_record.c.closed),
+                sa.func.sum(sa.case((per_record.c.nth == 1, 1), else_=0)),
+            ).group_by(per_record.c.date, per_record.c.location, per_record.c.department)
+        )
+    )
+
+
+def downgrade():
+    op.drop_index("ix_attendance_daily_id", table_name="attendance_daily")
+    op.drop_table("attendance_daily")
@@ -0,0 +1,36 @@
+"""Add face_templates for additional encodings per person
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases the app has already started against got the table from create_all
+    if sa.inspect(op.get_bind()).has_table("face_templates"):
+        return
+    op.create_table(
+        "face_templates",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("person_id", sa.Integer(), sa.ForeignKey("persons.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("encoding", sa.LargeBinary(), nullable=False),
+        sa.Column("source", sa.String(), nullable=False),
+        sa.Column("photo_path", sa.String()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_face_templates_id", "face_templates", ["id"])
+    op.create_index("ix_face_templates_person_id", "face_templates", ["person_id"])
+
+
+def downgrade():
+    op.drop_index("ix_face_templates_person_id", table_name="face_templates")
+    op.drop_index("ix_face_templates_id", table_name="face_templates")
+    op.drop_table("face_templates")
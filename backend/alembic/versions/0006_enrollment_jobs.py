@@ -0,0 +1,45 @@
+"""Add enrollment_jobs for bulk person enrollment
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases the app has already started against got the table from create_all
+    if sa.inspect(op.get_bind()).has_table("enrollment_jobs"):
+        return
+    # Shares the status type created for training_jobs
+    status = sa.Enum("PENDING", "RUNNING", "COMPLETED", "FAILED", name="trainingstatus").with_variant(
+        postgresql.ENUM(name="trainingstatus", create_type=False), "postgresql"
+    )
+    op.create_table(
+        "enrollment_jobs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("status", status),
+        sa.Column("total", sa.Integer()),
+        sa.Column("processed", sa.Integer()),
+        sa.Column("succeeded", sa.Integer()),
+        sa.Column("failed", sa.Integer()),
+        sa.Column("report", sa.JSON()),
+        sa.Column("error_message", sa.Text()),
+        sa.Column("started_at", sa.DateTime(timezone=True)),
+        sa.Column("completed_at", sa.DateTime(timezone=True)),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_enrollment_jobs_id", "enrollment_jobs", ["id"])
+
+
+def downgrade():
+    op.drop_index("ix_enrollment_jobs_id", table_name="enrollment_jobs")
+    op.drop_table("enrollment_jobs")
@@ -0,0 +1,56 @@
+"""Add reencode_jobs and the face_encoding_stage table
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    # Shares the status type created for training_jobs
+    status = sa.Enum("PENDING", "RUNNING", "COMPLETED", "FAILED", name="trainingstatus").with_variant(
+        postgresql.ENUM(name="trainingstatus", create_type=False), "postgresql"
+    )
+    # Databases the app has already started against got the tables from create_all
+    if not inspector.has_table("reencode_jobs"):
+        op.create_table(
+            "reencode_jobs",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+            sa.Column("status", status),
+            sa.Column("parameters", sa.JSON()),
+            sa.Column("total", sa.Integer()),
+            sa.Column("processed", sa.Integer()),
+            sa.Column("failed", sa.Integer()),
+            sa.Column("last_person_id", sa.Integer()),
+            sa.Column("throughput", sa.Float()),
+            sa.Column("eta_seconds", sa.Float()),
+            sa.Column("failures", sa.JSON()),
+            sa.Column("error_message", sa.Text()),
+            sa.Column("started_at", sa.DateTime(timezone=True)),
+            sa.Column("completed_at", sa.DateTime(timezone=True)),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        )
+        op.create_index("ix_reencode_jobs_id", "reencode_jobs", ["id"])
+    if not inspector.has_table("face_encoding_stage"):
+        op.create_table(
+            "face_encoding_stage",
+            sa.Column("job_id", sa.Integer(), sa.ForeignKey("reencode_jobs.id", ondelete="CASCADE"), primary_key=True),
+            sa.Column("person_id", sa.Integer(), sa.ForeignKey("persons.id", ondelete="CASCADE"), primary_key=True),
+            sa.Column("encoding", sa.LargeBinary(), nullable=False),
+        )
+
+
+def downgrade():
+    op.drop_table("face_encoding_stage")
+    op.drop_index("ix_reencode_jobs_id", table_name="reencode_jobs")
+    op.drop_table("reencode_jobs")
@@ -0,0 +1,30 @@
+"""Add person_sites to scope face matching by check-in location
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases the app has already started against got the table from create_all
+    if sa.inspect(op.get_bind()).has_table("person_sites"):
+        return
+    op.create_table(
+        "person_sites",
+        sa.Column("person_id", sa.Integer(), sa.ForeignKey("persons.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("location", sa.String(), primary_key=True),
+    )
+    op.create_index("ix_person_sites_location", "person_sites", ["location"])
+
+
+def downgrade():
+    op.drop_index("ix_person_sites_location", table_name="person_sites")
+    op.drop_table("person_sites")
@@ -0,0 +1,27 @@
+"""Add per-model micro-batching limits
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases the app has already started against got the columns from create_all
+    existing = {column["name"] for column in sa.inspect(op.get_bind()).get_columns("models")}
+    if "max_batch_size" not in existing:
+        op.add_column("models", sa.Column("max_batch_size", sa.Integer()))
+    if "max_batch_wait_ms" not in existing:
+        op.add_column("models", sa.Column("max_batch_wait_ms", sa.Float()))
+
+
+def downgrade():
+    op.drop_column("models", "max_batch_wait_ms")
+    op.drop_column("models", "max_batch_size")
@@ -0,0 +1,49 @@
+"""Add prediction_jobs for background batch inference
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0010"
+down_revision = "0009"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases the app has already started against got the table from create_all
+    if sa.inspect(op.get_bind()).has_table("prediction_jobs"):
+        return
+    # Shares the status type created for training_jobs
+    status = sa.Enum("PENDING", "RUNNING", "COMPLETED", "FAILED", name="trainingstatus").with_variant(
+        postgresql.ENUM(name="trainingstatus", create_type=False), "postgresql"
+    )
+    op.create_table(
+        "prediction_jobs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("model_id", sa.Integer(), sa.ForeignKey("models.id", ondelete="CASCADE")),
+        sa.Column("status", status),
+        sa.Column("confidence", sa.Float()),
+        sa.Column("iou_threshold", sa.Float()),
+        sa.Column("total", sa.Integer()),
+        sa.Column("processed", sa.Integer()),
+        sa.Column("failed", sa.Integer()),
+        sa.Column("result_path", sa.String()),
+        sa.Column("error_message", sa.Text()),
+        sa.Column("started_at", sa.DateTime(timezone=True)),
+        sa.Column("completed_at", sa.DateTime(timezone=True)),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_prediction_jobs_id", "prediction_jobs", ["id"])
+    op.create_index("ix_prediction_jobs_model_id", "prediction_jobs", ["model_id"])
+
+
+def downgrade():
+    op.drop_index("ix_prediction_jobs_model_id", table_name="prediction_jobs")
+    op.drop_index("ix_prediction_jobs_id", table_name="prediction_jobs")
+    op.drop_table("prediction_jobs")
@@ -0,0 +1,31 @@
+"""Add exported CPU runtime columns to models
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0011"
+down_revision = "0010"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases the app has already started against got the columns from create_all
+    existing = {column["name"] for column in sa.inspect(op.get_bind()).get_columns("models")}
+    for column in (
+        sa.Column("runtime", sa.String()),
+        sa.Column("runtime_path", sa.String()),
+        sa.Column("runtime_error", sa.Text()),
+    ):
+        if column.name not in existing:
+            op.add_column("models", column)
+
+
+def downgrade():
+    op.drop_column("models", "runtime_error")
+    op.drop_column("models", "runtime_path")
+    op.drop_column("models", "runtime")
@@ -0,0 +1,83 @@
+"""Count attendance_daily persons per location and add the day-wide day_persons count
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0012"
+down_revision = "0011"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    # Databases the app has already started against got the column from create_all
+    if "day_persons" not in {column["name"] for column in sa.inspect(bind).get_columns("attendance_daily")}:
+        op.add_column(
+            "attendance_daily",
+            sa.Column("day_persons", sa.Integer(), nullable=False, server_default="0")
+        )
+
+    daily = sa.table(
+        "attendance_daily",
+        sa.column("date", sa.Date),
+        sa.column("location", sa.String),
+        sa.column("department", sa.String),
+        sa.column("check_ins", sa.Integer),
+        sa.column("check_outs", sa.Integer),
+        sa.column("persons", sa.Integer),
+        sa.column("day_persons", sa.Integer),
+    )
+    records = sa.table(
+        "attendance_records",
+        sa.column("id", sa.Integer),
+        sa.column("person_id", sa.Integer),
+        sa.column("check_in_time", sa.DateTime),
+        sa.column("check_out_time", sa.DateTime),
+        sa.column("location", sa.String),
+    )
+    persons = sa.table(
+        "persons",
+        sa.column("id", sa.Integer),
+        sa.column("department", sa.String),
+    )
+
+    # persons used to count each person under their first check-in of the day
+    # only; rebuild the rollup with both counts from the records
+    day = sa.func.date(records.c.check_in_time)
+    location = sa.func.coalesce(records.c.location, "")
+    order = (records.c.check_in_time, records.c.id)
+    per_record = sa.select(
+        day.label("date"),
+        location.label("location"),
+        sa.func.coalesce(persons.c.department, "").label("department"),
+        sa.case((records.c.check_out_time.isnot(None), 1), else_=0).label("closed"),
+        sa.func.row_number().over(partition_by=(records.c.person_id, day, location), order_by=order).label("nth_here"),
+        sa.func.row_number().over(partition_by=(records.c.person_id, day), order_by=order).label("nth"),
+    ).select_from(
+        records.outerjoin(persons, persons.c.id == records.c.person_id)
+    ).subquery()
+
+    bind.execute(daily.delete())
+    bind.execute(
+        daily.insert().from_select(
+            ["date", "location", "department", "check_ins", "check_outs", "persons", "day_persons"],
+            sa.select(
+                per_record.c.date,
+                per_record.c.location,
+                per_record.c.department,
+                sa.func.count(),
+                sa.func.sum(per_record.c.closed),
+                sa.func.sum(sa.case((per_record.c.nth_here == 1, 1), else_=0)),
+                sa.func.sum(sa.case((per_record.c.nth == 1, 1), else_=0)),
+            ).group_by(per_record.c.date, per_record.c.location, per_record.c.department)
+        )
+    )
+
+
+def downgrade():
+    op.drop_column("attendance_daily", "day_persons")
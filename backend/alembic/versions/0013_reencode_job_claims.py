@@ -0,0 +1,40 @@
+"""Add re-encode job heartbeats, the template resume point and face_template_stage
+
+Revision ID: 0013
+Revises: 0012
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0013"
+down_revision = "0012"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    # Databases the app has already started against got these from create_all
+    existing = {column["name"] for column in inspector.get_columns("reencode_jobs")}
+    for column in (
+        sa.Column("last_template_id", sa.Integer()),
+        sa.Column("heartbeat_at", sa.DateTime(timezone=True)),
+    ):
+        if column.name not in existing:
+            op.add_column("reencode_jobs", column)
+    if not inspector.has_table("face_template_stage"):
+        op.create_table(
+            "face_template_stage",
+            sa.Column("job_id", sa.Integer(), sa.ForeignKey("reencode_jobs.id", ondelete="CASCADE"), primary_key=True),
+            sa.Column(
+                "template_id", sa.Integer(), sa.ForeignKey("face_templates.id", ondelete="CASCADE"), primary_key=True
+            ),
+            sa.Column("encoding", sa.LargeBinary()),
+        )
+
+
+def downgrade():
+    op.drop_table("face_template_stage")
+    op.drop_column("reencode_jobs", "heartbeat_at")
+    op.drop_column("reencode_jobs", "last_template_id")
@@ -1,76 +1,315 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
-from sqlalchemy.orm import Session
-from typing import List, Optional
-from app.db.session import get_db
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status, UploadFile, File, Form, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, tuple_, update
+from sqlalchemy.orm import Session, joinedload
+from typing import List, Optional, Tuple
+from app.db.session import get_db, SessionLocal
 from app.api.auth import get_current_user
-from app.models.models import User, Person, AttendanceRecord
+from app.models.models import User, Person, AttendanceRecord, FaceTemplate, EnrollmentJob, ReencodeJob, TrainingStatus
 from app.schemas.schemas import (
     Person as PersonSchema,
-    PersonCreate,
     PersonUpdate,
+    FaceTemplate as FaceTemplateSchema,
+    EnrollmentJob as EnrollmentJobSchema,
+    ReencodeJob as ReencodeJobSchema,
     AttendanceRecord as AttendanceRecordSchema,
+    BatchCheckInItem,
+    BatchCheckInResult,
+    DailyAttendance,
+    AttendanceAnalytics,
+    PersonDayStats,
+    DepartmentRate,
     FaceDetectionResult,
     FaceDetection
 )
 from app.core.config import settings
-import face_recognition
-import numpy as np
-from PIL import Image
+from app.services.face_gallery import get_face_gallery, encoding_to_bytes, parse_sites, FaceMatch
+from app.services.face_worker import (
+    run_face_task, detect_and_encode, detect_and_encode_checked, detect_only, encode_only, face_pool_stats
+)
+from app.services.face_quality import QUALITY_MESSAGES, face_quality_stats
+from app.services.face_tracker import FaceTracker
+from app.services.face_templates import add_template, learn_templates, remove_template_photo
+from app.services.bulk_enrollment import parse_manifest, run_enrollment_job
+from app.services.gallery_reencode import encoding_parameters, job_active, job_total, run_reencode_job
+from app.services.frame_gate import frame_gate, frame_signature
+from app.services.image_io import save_upload, read_image_archive, image_extension
+from app.services.attendance_export import export_statement, iter_csv, iter_columnar
+from app.services.attendance_rollup import new_increments, rollup_key, increment_rollups, daily_totals
+from app.services.attendance_analytics import person_days, department_rates, analytics_cache
 import os
 import time
-import tempfile
-from datetime import datetime, timedelta
-import cv2
+import json
+import asyncio
+import base64
+import uuid
+import zipfile
+from io import BytesIO
+from datetime import date, datetime
 
 router = APIRouter()
 
 
+def _save_person(db: Session, person: Person) -> Person:
+    """Insert a new person and add them to the gallery (runs in the threadpool)."""
+    db.add(person)
+    db.commit()
+    db.refresh(person)
+    get_face_gallery(db).upsert(person)
+    return person
+
+
+def _save_template(db: Session, person: Person, encoding: bytes, photo_path: str) -> Optional[FaceTemplate]:
+    """Store an enrolled template and refresh the person's gallery rows (runs in the threadpool)."""
+    template, evicted = add_template(person, encoding, photo_path=photo_path)
+    if template is None:
+        return None
+    db.commit()
+    if evicted is not None:
+        remove_template_photo(evicted)
+    db.refresh(template)
+    get_face_gallery(db).upsert(person)
+    return template
+
+
+def _record_attendances(
+    db: Session,
+    entries: List[Tuple[FaceMatch, bytes, str]],
+    location: Optional[str]
+) -> List[Tuple[Optional[AttendanceRecord], bool]]:
+    """Check matched persons in, or out if already checked in today, in one transaction.
+    
+    ``entries`` holds (match, photo bytes, filename) for distinct persons. Returns
+    (record, checked_out) per entry; the record is ``None`` if the person no
+    longer exists. Runs in the threadpool.
+    """
+    person_ids = sorted({match.person_id for match, _, _ in entries})
+    # Lock the persons' rows (in id order) so concurrent scans of the same person
+    # serialize instead of both inserting an open record
+    persons = {
+        p.id: p for p in db.query(Person).filter(Person.id.in_(person_ids))
+        .order_by(Person.id).with_for_update()
+    }
+    
+    # Check out everyone with an open record from today in one statement; the
+    # partial index on open records keeps this an index lookup
+    now = datetime.now()
+    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    closed = db.execute(
+        update(AttendanceRecord)
+        .where(
+            AttendanceRecord.person_id.in_(list(persons)),
+            AttendanceRecord.check_in_time >= today_start,
+            AttendanceRecord.check_out_time == None
+        )
+        .values(check_out_time=now)
+        .returning(AttendanceRecord.person_id, AttendanceRecord.id, AttendanceRecord.location)
+        .execution_options(synchronize_session=False)
+    ).all() if persons else []
+    checked_out = {row.person_id: row.id for row in closed}
+    
+    # Persons checking in who were already here earlier today are not new to the
+    # day's count, nor to a location's count if it was at that location
+    seen_today = db.query(AttendanceRecord.person_id, AttendanceRecord.location).filter(
+        AttendanceRecord.person_id.in_([p for p in persons if p not in checked_out]),
+        AttendanceRecord.check_in_time >= today_start
+    ).distinct().all()
+    returning_today = {person_id for person_id, _ in seen_today}
+    returning_here = {(person_id, seen_at or "") for person_id, seen_at in seen_today}
+    
+    increments = new_increments()
+    for row in closed:
+        increments[rollup_key(now.date(), row.location, persons[row.person_id].department)]["check_outs"] += 1
+    
+    record_ids = []
+    for match, content, filename in entries:
+        person = persons.get(match.person_id)
+        if person is None:
+            record_ids.append(None)
+            continue
+        
+        if person.id in checked_out:
+            record_ids.append(checked_out[person.id])
+            continue
+        
+        # Keep the check-in photo only when configured to
+        photo_path = None
+        if settings.CHECKIN_SAVE_PHOTOS:
+            timestamp = int(time.time())
+            ext = os.path.splitext(filename)[1]
+            photo_path = save_upload(
+                content,
+                os.path.join(settings.UPLOAD_DIR, "checkin"),
+                f"checkin_{person.id}_{timestamp}{ext}"
+            )
+        
+        # Create new attendance record
+        record = AttendanceRecord(
+            person_id=person.id,
+            photo_path=photo_path,
+            confidence=1.0 - match.distance,
+            location=location
+        )
+        db.add(record)
+        record_ids.append(record)
+        
+        counts = increments[rollup_key(now.date(), location, person.department)]
+        counts["check_ins"] += 1
+        if (person.id, location or "") not in returning_here:
+            counts["persons"] += 1
+        if person.id not in returning_today:
+            counts["day_persons"] += 1
+    
+    increment_rollups(db, increments)
+    db.flush()
+    record_ids = [r.id if isinstance(r, AttendanceRecord) else r for r in record_ids]
+    db.commit()
+    analytics_cache.invalidate(now.date())
+    
+    # Load the committed rows and their persons in one query rather than a refresh each
+    records = {}
+    if any(record_id is not None for record_id in record_ids):
+        records = {
+            r.id: r for r in db.query(AttendanceRecord).options(joinedload(AttendanceRecord.person)).filter(
+                AttendanceRecord.id.in_([record_id for record_id in record_ids if record_id is not None])
+            )
+        }
+    
+    return [
+        (records.get(record_id), record_id is not None and entries[i][0].person_id in checked_out)
+        for i, record_id in enumerate(record_ids)
+    ]
+
+
+def _record_attendance(
+    db: Session,
+    match: FaceMatch,
+    content: bytes,
+    filename: str,
+    location: Optional[str]
+) -> AttendanceRecord:
+    """Check a matched person in, or out if already checked in today (runs in the threadpool)."""
+    record, _ = _record_attendances(db, [(match, content, filename)], location)[0]
+    if record is None:
+        raise HTTPException(status_code=404, detail="Person not found")
+    return record
+
+
+def _authenticate(token: str) -> Optional[User]:
+    """Resolve a bearer token to a user for WebSocket connections."""
+    db = SessionLocal()
+    try:
+        return get_current_user(token, db)
+    except HTTPException:
+        return None
+    finally:
+        db.close()
+
+
+def _load_gallery():
+    db = SessionLocal()
+    try:
+        return get_face_gallery(db)
+    finally:
+        db.close()
+
+
+def _stream_check_in(match: FaceMatch, content: bytes, location: Optional[str]) -> str:
+    """Record attendance for a tracked identity and return it as JSON."""
+    db = SessionLocal()
+    try:
+        # Frames may be JPEG, PNG or WebP; keep the saved photo's extension truthful
+        record = _record_attendance(db, match, content, f"stream{image_extension(content)}", location)
+        return AttendanceRecordSchema.model_validate(record).model_dump_json()
+    finally:
+        db.close()
+
+
+async def _process_stream_frame(tracker: FaceTracker, content: bytes, location: Optional[str]) -> FaceDetectionResult:
+    """Detect faces in a frame, re-encoding only new or stale tracks."""
+    start_time = time.time()
+    face_locations, timings = await run_face_task(detect_only, content)
+    tracks, stale = tracker.update(face_locations)
+    
+    if stale:
+        encode_start = time.time()
+        face_encodings = await run_face_task(encode_only, content, [face_locations[i] for i in stale])
+        timings["encode"] = time.time() - encode_start
+        
+        match_start = time.time()
+        gallery = await run_in_threadpool(_load_gallery)
+        matches = await run_in_threadpool(gallery.match, face_encodings, None, location)
+        for i, match in zip(stale, matches):
+            tracker.set_identity(tracks[i], match)
+        timings["match"] = time.time() - match_start
+    
+    detections = []
+    for (top, right, bottom, left), track in zip(face_locations, tracks):
+        match = track.match
+        detections.append(FaceDetection(
+            x=left,
+            y=top,
+            width=right - left,
+            height=bottom - top,
+            confidence=1.0,
+            person_id=match.person_id if match else None,
+            person_name=match.person_name if match else None,
+            match_confidence=1.0 - match.distance if match else None,
+            track_id=track.id
+        ))
+    
+    return FaceDetectionResult(
+        faces=detections,
+        processing_time=time.time() - start_time,
+        timings=timings
+    )
+
+
 @router.post("/persons/", response_model=PersonSchema)
 async def create_person(
     name: str = Form(...),
     employee_id: Optional[str] = Form(None),
     department: Optional[str] = Form(None),
+    sites: Optional[str] = Form(None),
     file: UploadFile = File(...),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Register a new person with their face photo."""
+    """Register a new person with their face photo.
+    
+    ``sites`` is a comma-separated list of the locations the person checks in
+    at; without it they are matched at every location.
+    """
     # Check if employee_id already exists
     if employee_id:
-        existing = db.query(Person).filter(Person.employee_id == employee_id).first()
+        existing = await run_in_threadpool(
+            lambda: db.query(Person).filter(Person.employee_id == employee_id).first()
+        )
         if existing:
             raise HTTPException(status_code=400, detail="Employee ID already exists")
     
-    # Save the photo
-    photo_dir = os.path.join(settings.UPLOAD_DIR, "faces")
-    os.makedirs(photo_dir, exist_ok=True)
-    
-    # Create unique filename
-    timestamp = int(time.time())
-    ext = os.path.splitext(file.filename)[1]
-    photo_filename = f"person_{timestamp}{ext}"
-    photo_path = os.path.join(photo_dir, photo_filename)
-    
-    # Save file
-    with open(photo_path, "wb") as f:
-        content = await file.read()
-        f.write(content)
+    content = await file.read()
+    photo_path = None
     
     try:
-        # Load image and get face encoding
-        image = face_recognition.load_image_file(photo_path)
-        face_encodings = face_recognition.face_encodings(image)
+        # Detect and encode the face in the worker pool
+        _, face_encodings, _ = await run_face_task(detect_and_encode, content)
         
         if len(face_encodings) == 0:
-            os.remove(photo_path)
             raise HTTPException(status_code=400, detail="No face detected in the image")
         
         if len(face_encodings) > 1:
-            os.remove(photo_path)
             raise HTTPException(status_code=400, detail="Multiple faces detected. Please upload an image with only one face")
         
-        # Store face encoding as JSON
-        face_encoding = face_encodings[0].tolist()
+        # Store face encoding as raw float32 bytes
+        face_encoding = encoding_to_bytes(face_encodings[0])
+        
+        # Save the photo once it is known to be usable; the suffix keeps same-second uploads apart
+        timestamp = int(time.time())
+        ext = os.path.splitext(file.filename)[1]
+        photo_path = await run_in_threadpool(
+            save_upload, content, os.path.join(settings.UPLOAD_DIR, "faces"), f"person_{timestamp}_{uuid.uuid4().hex[:8]}{ext}"
+        )
         
         # Create person record
         person = Person(
@@ -79,24 +318,149 @@ async def create_person(
             department=department,
             face_encoding=face_encoding,
             photo_path=photo_path,
-            is_active=True
+            is_active=True,
+            sites=parse_sites(sites)
         )
         
-        db.add(person)
-        db.commit()
-        db.refresh(person)
-        
-        return person
+        return await run_in_threadpool(_save_person, db, person)
     
     except Exception as e:
         # Clean up if error occurs
-        if os.path.exists(photo_path):
+        if photo_path and os.path.exists(photo_path):
             os.remove(photo_path)
+        if isinstance(e, HTTPException):
+            raise
         raise HTTPException(status_code=500, detail=f"Error processing face: {str(e)}")
 
 
+@router.post("/persons/bulk", response_model=EnrollmentJobSchema)
+async def bulk_enroll_persons(
+    background_tasks: BackgroundTasks,
+    archive: UploadFile = File(...),
+    manifest: UploadFile = File(...),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Register many persons from a zip of photos and a CSV manifest.
+    
+    The manifest has name, employee_id, department, photo and optional sites
+    columns, where photo is a file name inside the archive and sites lists
+    semicolon-separated locations. Rows are processed in the background; poll
+    the returned job for progress and the per-row report.
+    """
+    try:
+        rows = parse_manifest(await manifest.read())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not rows:
+        raise HTTPException(status_code=400, detail="Manifest has no rows")
+    
+    content = await archive.read()
+    if not zipfile.is_zipfile(BytesIO(content)):
+        raise HTTPException(status_code=400, detail="Invalid zip archive")
+    
+    def create_job():
+        job = EnrollmentJob(user_id=current_user.id, total=len(rows), status=TrainingStatus.PENDING)
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        return job
+    
+    job = await run_in_threadpool(create_job)
+    archive_path = await run_in_threadpool(
+        save_upload, content, os.path.join(settings.UPLOAD_DIR, "enrollment"), f"job_{job.id}.zip"
+    )
+    
+    # Start enrollment in background
+    background_tasks.add_task(run_enrollment_job, job.id, archive_path, rows)
+    return job
+
+
+@router.get("/persons/bulk/{job_id}", response_model=EnrollmentJobSchema)
+def get_enrollment_job(
+    job_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get bulk enrollment progress and the per-row report."""
+    job = db.query(EnrollmentJob).filter(
+        EnrollmentJob.id == job_id,
+        EnrollmentJob.user_id == current_user.id
+    ).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Enrollment job not found")
+    return job
+
+
+@router.post("/persons/reencode", response_model=ReencodeJobSchema)
+def start_reencode_job(
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Recompute every person's and template's face encoding from their photo, e.g. after changing encoding settings.
+    
+    Matching keeps using the current encodings until the job finishes, then
+    switches over in one step. Templates without a photo cannot be
+    re-encoded and are removed at that point.
+    """
+    if db.query(ReencodeJob.id).filter(job_active()).first():
+        raise HTTPException(status_code=409, detail="A re-encode job is already running")
+    
+    job = ReencodeJob(
+        user_id=current_user.id,
+        status=TrainingStatus.PENDING,
+        parameters=encoding_parameters(),
+        total=job_total(db),
+        processed=0,
+        failed=0,
+        last_person_id=0,
+        last_template_id=0,
+        heartbeat_at=datetime.now()
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    
+    background_tasks.add_task(run_reencode_job, job.id)
+    return job
+
+
+@router.get("/persons/reencode/{job_id}", response_model=ReencodeJobSchema)
+def get_reencode_job(
+    job_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get re-encode progress, throughput and ETA."""
+    job = db.query(ReencodeJob).filter(ReencodeJob.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Re-encode job not found")
+    return job
+
+
+@router.post("/persons/reencode/{job_id}/resume", response_model=ReencodeJobSchema)
+def resume_reencode_job(
+    job_id: int,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Continue a failed or interrupted re-encode job from its last finished chunk."""
+    job = db.query(ReencodeJob).filter(ReencodeJob.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Re-encode job not found")
+    if job.status == TrainingStatus.COMPLETED:
+        raise HTTPException(status_code=400, detail="Re-encode job already completed")
+    if db.query(ReencodeJob.id).filter(ReencodeJob.id == job.id, job_active()).first():
+        raise HTTPException(status_code=409, detail="Re-encode job is already running")
+    
+    background_tasks.add_task(run_reencode_job, job.id)
+    return job
+
+
 @router.get("/persons/", response_model=List[PersonSchema])
-async def list_persons(
+def list_persons(
     skip: int = 0,
     limit: int = 100,
     active_only: bool = True,
@@ -112,7 +476,7 @@ async def list_persons(
 
 
 @router.get("/persons/{person_id}", response_model=PersonSchema)
-async def get_person(
+def get_person(
     person_id: int,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -125,7 +489,7 @@ async def get_person(
 
 
 @router.put("/persons/{person_id}", response_model=PersonSchema)
-async def update_person(
+def update_person(
     person_id: int,
     person_update: PersonUpdate,
     current_user: User = Depends(get_current_user),
@@ -145,14 +509,18 @@ async def update_person(
         person.department = person_update.department
     if person_update.is_active is not None:
         person.is_active = person_update.is_active
+    if person_update.sites is not None:
+        # Same parsing as create_person and the enrollment manifest
+        person.sites = parse_sites(",".join(person_update.sites))
     
     db.commit()
     db.refresh(person)
+    get_face_gallery(db).upsert(person)
     return person
 
 
 @router.delete("/persons/{person_id}")
-async def delete_person(
+def delete_person(
     person_id: int,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -162,88 +530,186 @@ async def delete_person(
     if not person:
         raise HTTPException(status_code=404, detail="Person not found")
     
-    # Delete photo file if exists
+    # Delete photo files if they exist
     if person.photo_path and os.path.exists(person.photo_path):
         os.remove(person.photo_path)
+    for template in person.face_templates:
+        remove_template_photo(template)
     
     db.delete(person)
     db.commit()
+    get_face_gallery(db).remove(person_id)
     return {"message": "Person deleted successfully"}
 
 
-@router.post("/detect-faces", response_model=FaceDetectionResult)
-async def detect_faces(
+@router.post("/persons/{person_id}/templates", response_model=FaceTemplateSchema)
+async def enroll_face_template(
+    person_id: int,
     file: UploadFile = File(...),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Detect and recognize faces in an image."""
-    # Save uploaded file temporarily
-    with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[1]) as tmp_file:
-        tmp_file.write(await file.read())
-        tmp_path = tmp_file.name
+    """Add another photo of a registered person, e.g. in kiosk lighting or with glasses."""
+    person = await run_in_threadpool(lambda: db.query(Person).filter(Person.id == person_id).first())
+    if not person:
+        raise HTTPException(status_code=404, detail="Person not found")
+    
+    content = await file.read()
+    photo_path = None
     
     try:
-        start_time = time.time()
+        _, face_encodings, _ = await run_face_task(detect_and_encode, content)
         
-        # Load image
-        image = face_recognition.load_image_file(tmp_path)
+        if len(face_encodings) == 0:
+            raise HTTPException(status_code=400, detail="No face detected in the image")
         
-        # Find face locations and encodings
-        face_locations = face_recognition.face_locations(image)
-        face_encodings = face_recognition.face_encodings(image, face_locations)
+        if len(face_encodings) > 1:
+            raise HTTPException(status_code=400, detail="Multiple faces detected. Please upload an image with only one face")
         
-        # Load all registered persons
-        persons = db.query(Person).filter(Person.is_active == True).all()
-        known_encodings = []
-        known_persons = []
+        # Refuse photos that look like someone else, they would cause false matches
+        gallery = await run_in_threadpool(get_face_gallery, db)
+        match = (await run_in_threadpool(gallery.match, face_encodings))[0]
+        if match is not None and match.person_id != person_id:
+            raise HTTPException(status_code=400, detail="Face matches another registered person")
         
-        for person in persons:
-            if person.face_encoding:
-                known_encodings.append(np.array(person.face_encoding))
-                known_persons.append(person)
+        timestamp = int(time.time())
+        ext = os.path.splitext(file.filename)[1]
+        photo_path = await run_in_threadpool(
+            save_upload, content, os.path.join(settings.UPLOAD_DIR, "faces"), f"person_{person_id}_template_{timestamp}_{uuid.uuid4().hex[:8]}{ext}"
+        )
         
-        # Match faces
-        detections = []
-        for (top, right, bottom, left), face_encoding in zip(face_locations, face_encodings):
-            # Compare with known faces
-            person_id = None
-            person_name = None
-            match_confidence = None
-            
-            if known_encodings:
-                face_distances = face_recognition.face_distance(known_encodings, face_encoding)
-                best_match_index = np.argmin(face_distances)
-                
-                # If the best match is below threshold, consider it a match
-                if face_distances[best_match_index] < 0.6:  # Threshold for recognition
-                    matched_person = known_persons[best_match_index]
-                    person_id = matched_person.id
-                    person_name = matched_person.name
-                    match_confidence = 1.0 - face_distances[best_match_index]
-            
-            detections.append(FaceDetection(
-                x=left,
-                y=top,
-                width=right - left,
-                height=bottom - top,
-                confidence=1.0,
-                person_id=person_id,
-                person_name=person_name,
-                match_confidence=match_confidence
-            ))
+        template = await run_in_threadpool(
+            _save_template, db, person, encoding_to_bytes(face_encodings[0]), photo_path
+        )
+        if template is None:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Template limit of {settings.FACE_TEMPLATES_MAX} reached, delete one first"
+            )
+        return template
+    
+    except Exception as e:
+        if photo_path and os.path.exists(photo_path):
+            os.remove(photo_path)
+        if isinstance(e, HTTPException):
+            raise
+        raise HTTPException(status_code=500, detail=f"Error processing face: {str(e)}")
+
+
+@router.get("/persons/{person_id}/templates", response_model=List[FaceTemplateSchema])
+def list_face_templates(
+    person_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """List a person's additional face templates."""
+    return db.query(FaceTemplate).filter(FaceTemplate.person_id == person_id).order_by(FaceTemplate.id).all()
+
+
+@router.delete("/persons/{person_id}/templates/{template_id}")
+def delete_face_template(
+    person_id: int,
+    template_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Delete one of a person's additional face templates."""
+    template = db.query(FaceTemplate).filter(
+        FaceTemplate.id == template_id,
+        FaceTemplate.person_id == person_id
+    ).first()
+    if not template:
+        raise HTTPException(status_code=404, detail="Template not found")
+    
+    person = template.person
+    db.delete(template)
+    db.commit()
+    remove_template_photo(template)
+    get_face_gallery(db).upsert(person)
+    return {"message": "Template deleted successfully"}
+
+
+@router.post("/detect-faces", response_model=FaceDetectionResult)
+async def detect_faces(
+    request: Request,
+    file: UploadFile = File(...),
+    kiosk_id: Optional[str] = Form(None),
+    location: Optional[str] = Form(None),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Detect and recognize faces in an image.
+    
+    Polling kiosks should send a stable ``kiosk_id``: frames that barely differ
+    from that kiosk's last processed frame get its cached result back. Without
+    one, the client address stands in for it. With a ``location``, faces are
+    only matched against that location's persons.
+    """
+    content = await file.read()
+    start_time = time.time()
+    
+    signature = None
+    kiosk = kiosk_id or (request.client.host if request.client else None)
+    if kiosk and settings.FRAME_GATE_ENABLED:
+        try:
+            signature = await run_in_threadpool(frame_signature, content)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid image file")
+        cached = frame_gate.lookup((kiosk, location), signature)
+        if cached is not None:
+            return cached.model_copy(update={
+                "processing_time": time.time() - start_time,
+                "gated": True
+            })
+    
+    # Find face locations and encodings in the worker pool; low-quality faces are not encoded
+    try:
+        face_locations, face_encodings, reasons, timings = await run_face_task(detect_and_encode_checked, content)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid image file")
+    face_quality_stats.record(reasons)
+    
+    # Match all usable faces against the gallery at once
+    match_start = time.time()
+    gallery = await run_in_threadpool(get_face_gallery, db)
+    usable = await run_in_threadpool(gallery.match, [e for e in face_encodings if e is not None], None, location)
+    matches = iter(usable)
+    timings["match"] = time.time() - match_start
+    
+    detections = []
+    for (top, right, bottom, left), reason in zip(face_locations, reasons):
+        match = next(matches) if reason is None else None
+        person_id = None
+        person_name = None
+        match_confidence = None
         
-        processing_time = time.time() - start_time
+        if match:
+            person_id = match.person_id
+            person_name = match.person_name
+            match_confidence = 1.0 - match.distance
         
-        return FaceDetectionResult(
-            faces=detections,
-            processing_time=processing_time
-        )
+        detections.append(FaceDetection(
+            x=left,
+            y=top,
+            width=right - left,
+            height=bottom - top,
+            confidence=1.0,
+            person_id=person_id,
+            person_name=person_name,
+            match_confidence=match_confidence,
+            quality=reason
+        ))
     
-    finally:
-        # Clean up temporary file
-        if os.path.exists(tmp_path):
-            os.remove(tmp_path)
+    processing_time = time.time() - start_time
+    
+    result = FaceDetectionResult(
+        faces=detections,
+        processing_time=processing_time,
+        timings=timings
+    )
+    if signature is not None:
+        frame_gate.store((kiosk, location), signature, result)
+    return result
 
 
 @router.post("/check-in", response_model=AttendanceRecordSchema)
@@ -253,111 +719,250 @@ async def check_in(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Check in a person by detecting their face."""
-    # Save uploaded file temporarily
-    with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[1]) as tmp_file:
-        content = await file.read()
-        tmp_file.write(content)
-        tmp_path = tmp_file.name
+    """Check in a person by detecting their face.
+    
+    With a ``location``, the face is matched against that location's persons
+    only (see ``FACE_LOCATION_FALLBACK``).
+    """
+    content = await file.read()
     
+    # Detect faces in the worker pool; low-quality faces are rejected before encoding
     try:
-        # Load image and detect faces
-        image = face_recognition.load_image_file(tmp_path)
-        face_locations = face_recognition.face_locations(image)
-        face_encodings = face_recognition.face_encodings(image, face_locations)
-        
-        if len(face_encodings) == 0:
-            raise HTTPException(status_code=400, detail="No face detected in the image")
-        
-        if len(face_encodings) > 1:
-            raise HTTPException(status_code=400, detail="Multiple faces detected. Please ensure only one person is in the frame")
-        
-        # Load all registered persons
-        persons = db.query(Person).filter(Person.is_active == True).all()
-        known_encodings = []
-        known_persons = []
-        
-        for person in persons:
-            if person.face_encoding:
-                known_encodings.append(np.array(person.face_encoding))
-                known_persons.append(person)
-        
-        if not known_encodings:
-            raise HTTPException(status_code=400, detail="No registered persons found")
-        
-        # Match face
-        face_encoding = face_encodings[0]
-        face_distances = face_recognition.face_distance(known_encodings, face_encoding)
-        best_match_index = np.argmin(face_distances)
-        
-        if face_distances[best_match_index] >= 0.6:
-            raise HTTPException(status_code=404, detail="Face not recognized. Please register first")
-        
-        matched_person = known_persons[best_match_index]
-        confidence = 1.0 - face_distances[best_match_index]
-        
-        # Save check-in photo
-        checkin_dir = os.path.join(settings.UPLOAD_DIR, "checkin")
-        os.makedirs(checkin_dir, exist_ok=True)
-        
-        timestamp = int(time.time())
-        ext = os.path.splitext(file.filename)[1]
-        photo_filename = f"checkin_{matched_person.id}_{timestamp}{ext}"
-        photo_path = os.path.join(checkin_dir, photo_filename)
-        
-        # Copy temp file to permanent location
-        with open(photo_path, "wb") as f:
-            f.write(content)
-        
-        # Check if already checked in today
-        today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-        existing_record = db.query(AttendanceRecord).filter(
-            AttendanceRecord.person_id == matched_person.id,
-            AttendanceRecord.check_in_time >= today_start,
-            AttendanceRecord.check_out_time == None
-        ).first()
-        
-        if existing_record:
-            # Update check-out time
-            existing_record.check_out_time = datetime.now()
-            db.commit()
-            db.refresh(existing_record)
-            existing_record.person = matched_person
-            return existing_record
-        
-        # Create new attendance record
-        record = AttendanceRecord(
-            person_id=matched_person.id,
-            photo_path=photo_path,
-            confidence=confidence,
-            location=location
+        _, face_encodings, reasons, _ = await run_face_task(detect_and_encode_checked, content)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid image file")
+    face_quality_stats.record(reasons)
+    face_encodings = [encoding for encoding in face_encodings if encoding is not None]
+    
+    if len(face_encodings) == 0 and reasons:
+        raise HTTPException(
+            status_code=400,
+            detail=QUALITY_MESSAGES[reasons[0]],
+            headers={"X-Face-Quality": reasons[0]}
+        )
+    
+    if len(face_encodings) == 0:
+        raise HTTPException(status_code=400, detail="No face detected in the image")
+    
+    if len(face_encodings) > 1:
+        raise HTTPException(status_code=400, detail="Multiple faces detected. Please ensure only one person is in the frame")
+    
+    gallery = await run_in_threadpool(get_face_gallery, db)
+    if len(gallery) == 0:
+        raise HTTPException(status_code=400, detail="No registered persons found")
+    
+    # Match face against the persons of this location
+    match = (await run_in_threadpool(gallery.match, face_encodings, None, location))[0]
+    if match is None:
+        raise HTTPException(status_code=404, detail="Face not recognized. Please register first")
+    
+    record = await run_in_threadpool(_record_attendance, db, match, content, file.filename, location)
+    await run_in_threadpool(learn_templates, db, [(match, face_encodings[0])])
+    return record
+
+
+@router.post("/check-in/batch", response_model=BatchCheckInResult)
+async def batch_check_in(
+    files: List[UploadFile] = File(...),
+    location: Optional[str] = Form(None),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Check in from many images at once, e.g. several gate cameras or replayed offline captures.
+    
+    Accepts image files and zip archives of images. Faces are encoded in
+    parallel, matched against the gallery in one operation and all attendance
+    rows are written in a single transaction. A person seen in several images
+    is only checked in (or out) once.
+    """
+    start_time = time.time()
+    
+    images = []
+    for upload in files:
+        content = await upload.read()
+        if upload.filename and upload.filename.lower().endswith(".zip"):
+            try:
+                images.extend(await run_in_threadpool(
+                    read_image_archive, content, settings.CHECKIN_BATCH_MAX_IMAGES
+                ))
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+        else:
+            images.append((upload.filename, content))
+    
+    if len(images) > settings.CHECKIN_BATCH_MAX_IMAGES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many images, the limit is {settings.CHECKIN_BATCH_MAX_IMAGES}"
         )
+    
+    # Encode in parallel, but never occupy more than the pool's workers
+    semaphore = asyncio.Semaphore(settings.FACE_WORKERS)
+    
+    async def encode(content):
+        async with semaphore:
+            try:
+                return await run_face_task(detect_and_encode_checked, content)
+            except Exception as e:
+                return e
+    
+    outputs = await asyncio.gather(*(encode(content) for _, content in images))
+    
+    results = [BatchCheckInItem(filename=name, status="error") for name, _ in images]
+    encoded = []
+    for i, output in enumerate(outputs):
+        if isinstance(output, Exception):
+            results[i].detail = output.detail if isinstance(output, HTTPException) else str(output)
+            continue
+        face_quality_stats.record(output[2])
+        face_encodings = [encoding for encoding in output[1] if encoding is not None]
+        if len(face_encodings) == 0 and output[2]:
+            results[i].status = "low_quality"
+            results[i].detail = output[2][0]
+        elif len(face_encodings) == 0:
+            results[i].status = "no_face"
+        elif len(face_encodings) > 1:
+            results[i].status = "multiple_faces"
+        else:
+            encoded.append((i, face_encodings[0]))
+    
+    # One matrix operation for every encoding of the batch
+    entries = []
+    entry_images = []
+    first_image_of = {}
+    duplicates = []
+    learned = []
+    if encoded:
+        gallery = await run_in_threadpool(get_face_gallery, db)
+        matches = await run_in_threadpool(gallery.match, [encoding for _, encoding in encoded], None, location)
+        for (i, encoding), match in zip(encoded, matches):
+            if match is None:
+                results[i].status = "not_recognized"
+            elif match.person_id in first_image_of:
+                results[i].status = "duplicate"
+                duplicates.append((i, match.person_id))
+            else:
+                first_image_of[match.person_id] = i
+                name, content = images[i]
+                entries.append((match, content, name))
+                entry_images.append(i)
+                learned.append((match, encoding))
+    
+    if entries:
+        recorded = await run_in_threadpool(_record_attendances, db, entries, location)
+        for i, (record, checked_out) in zip(entry_images, recorded):
+            if record is None:
+                results[i].status = "not_recognized"
+                continue
+            results[i].status = "checked_out" if checked_out else "checked_in"
+            results[i].record = AttendanceRecordSchema.model_validate(record)
         
-        db.add(record)
-        db.commit()
-        db.refresh(record)
-        record.person = matched_person
+        # Duplicates report the record written for the same person
+        for i, person_id in duplicates:
+            results[i].record = results[first_image_of[person_id]].record
         
-        return record
+        await run_in_threadpool(learn_templates, db, learned)
     
-    finally:
-        # Clean up temporary file
-        if os.path.exists(tmp_path):
-            os.remove(tmp_path)
+    return BatchCheckInResult(results=results, processing_time=time.time() - start_time)
+
+
+@router.websocket("/stream")
+async def checkin_stream(
+    websocket: WebSocket,
+    token: str,
+    location: Optional[str] = None
+):
+    """Continuous face detection over a stream of webcam frames.
+
+    Each binary message is an encoded frame and is answered with
+    ``{"type": "faces", "result": FaceDetectionResult}``, where every face
+    carries a ``track_id``. Faces are tracked across frames and only new or
+    stale tracks are encoded and matched against the gallery. A text message
+    ``{"check_in": <track_id>}`` checks that track's person in (or out) using
+    the latest frame and is answered with ``{"type": "check_in", "record": ...}``.
+    The check-in is recorded at the connection's ``location``.
+    """
+    user = await run_in_threadpool(_authenticate, token)
+    if user is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    
+    await websocket.accept()
+    tracker = FaceTracker(identity_ttl=settings.FACE_TRACK_IDENTITY_TTL)
+    last_frame = None
+    
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            
+            try:
+                if message.get("bytes") is not None:
+                    last_frame = message["bytes"]
+                    result = await _process_stream_frame(tracker, last_frame, location)
+                    await websocket.send_text(
+                        f'{{"type": "faces", "result": {result.model_dump_json()}}}'
+                    )
+                    continue
+                
+                request = json.loads(message.get("text") or "{}")
+                if not isinstance(request, dict):
+                    raise ValueError("Control messages must be JSON objects")
+                # Tracks were matched against this connection's location partition
+                if request.get("location", location) != location:
+                    raise HTTPException(status_code=400, detail="Location is fixed for the stream's connection")
+                track = tracker.get(request.get("check_in"))
+                if track is None or track.match is None or last_frame is None:
+                    raise HTTPException(status_code=404, detail="Face not recognized. Please register first")
+                
+                record = await run_in_threadpool(
+                    _stream_check_in, track.match, last_frame, location
+                )
+                await websocket.send_text(f'{{"type": "check_in", "record": {record}}}')
+            
+            except HTTPException as e:
+                await websocket.send_json({"type": "error", "detail": e.detail})
+            except (ValueError, OSError) as e:
+                # Malformed control message or undecodable frame
+                await websocket.send_json({"type": "error", "detail": str(e)})
+    
+    except WebSocketDisconnect:
+        pass
+
+
+def _encode_cursor(record: AttendanceRecord) -> str:
+    """Opaque keyset cursor for the position after ``record``."""
+    raw = f"{record.check_in_time.isoformat()}|{record.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        check_in_time, record_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(check_in_time), int(record_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
 
 @router.get("/attendance/", response_model=List[AttendanceRecordSchema])
-async def list_attendance(
+def list_attendance(
+    response: Response,
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
     person_id: Optional[int] = None,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """List attendance records with optional filters."""
-    query = db.query(AttendanceRecord)
+    """List attendance records with optional filters, newest first.
+    
+    Pass the ``X-Next-Cursor`` response header back as ``cursor`` to fetch the
+    next page; ``skip`` is still honoured when no cursor is given.
+    """
+    query = db.query(AttendanceRecord).options(joinedload(AttendanceRecord.person))
     
     if start_date:
         start_dt = datetime.fromisoformat(start_date)
@@ -370,107 +975,165 @@ async def list_attendance(
     if person_id:
         query = query.filter(AttendanceRecord.person_id == person_id)
     
-    records = query.order_by(AttendanceRecord.check_in_time.desc()).offset(skip).limit(limit).all()
+    query = query.order_by(AttendanceRecord.check_in_time.desc(), AttendanceRecord.id.desc())
+    if cursor:
+        # Seek past the last row of the previous page instead of counting rows with OFFSET
+        query = query.filter(
+            tuple_(AttendanceRecord.check_in_time, AttendanceRecord.id) < tuple_(*_decode_cursor(cursor))
+        )
+    elif skip:
+        query = query.offset(skip)
+    
+    records = query.limit(limit).all()
     
-    # Load person information
-    for record in records:
-        record.person = db.query(Person).filter(Person.id == record.person_id).first()
+    if records and len(records) == limit:
+        response.headers["X-Next-Cursor"] = _encode_cursor(records[-1])
     
     return records
 
 
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+
+
 @router.get("/attendance/export")
-async def export_attendance(
+def export_attendance(
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    format: str = "csv",
+    current_user: User = Depends(get_current_user)
 ):
-    """Export attendance records as CSV."""
-    import csv
-    from io import StringIO
+    """Export attendance records as CSV, Parquet or an Arrow IPC stream.
+    
+    Rows are read through a server-side cursor and written out batch by
+    batch, so memory use does not grow with the size of the export.
+    """
     from fastapi.responses import StreamingResponse
     
-    query = db.query(AttendanceRecord)
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported export format: {format}")
+    if format != "csv":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise HTTPException(status_code=400, detail=f"{format} export requires pyarrow to be installed")
     
-    if start_date:
-        start_dt = datetime.fromisoformat(start_date)
-        query = query.filter(AttendanceRecord.check_in_time >= start_dt)
-    
-    if end_date:
-        end_dt = datetime.fromisoformat(end_date)
-        query = query.filter(AttendanceRecord.check_in_time <= end_dt)
+    statement = export_statement(
+        datetime.fromisoformat(start_date) if start_date else None,
+        datetime.fromisoformat(end_date) if end_date else None
+    )
     
-    records = query.order_by(AttendanceRecord.check_in_time).all()
-    
-    # Create CSV
-    output = StringIO()
-    writer = csv.writer(output)
-    
-    # Write header
-    writer.writerow([
-        'ID',
-        'Person Name',
-        'Employee ID',
-        'Department',
-        'Check In Time',
-        'Check Out Time',
-        'Duration (hours)',
-        'Confidence',
-        'Location'
-    ])
-    
-    # Write data
-    for record in records:
-        person = db.query(Person).filter(Person.id == record.person_id).first()
-        duration = ''
-        if record.check_out_time:
-            delta = record.check_out_time - record.check_in_time
-            duration = f"{delta.total_seconds() / 3600:.2f}"
-        
-        writer.writerow([
-            record.id,
-            person.name if person else '',
-            person.employee_id if person else '',
-            person.department if person else '',
-            record.check_in_time.strftime('%Y-%m-%d %H:%M:%S'),
-            record.check_out_time.strftime('%Y-%m-%d %H:%M:%S') if record.check_out_time else '',
-            duration,
-            f"{record.confidence:.2f}" if record.confidence else '',
-            record.location or ''
-        ])
-    
-    output.seek(0)
+    def stream():
+        # The response outlives the request dependencies, so it owns its session
+        db = SessionLocal()
+        try:
+            if format == "csv":
+                yield from iter_csv(db, statement)
+            else:
+                yield from iter_columnar(db, statement, format)
+        finally:
+            db.close()
     
+    media_type, extension = EXPORT_FORMATS[format]
     return StreamingResponse(
-        iter([output.getvalue()]),
-        media_type="text/csv",
-        headers={"Content-Disposition": "attachment; filename=attendance.csv"}
+        stream(),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename=attendance.{extension}"}
     )
 
 
 @router.get("/attendance/today")
-async def today_attendance(
+def today_attendance(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Get today's attendance summary."""
-    today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-    
-    # Get today's check-ins
-    records = db.query(AttendanceRecord).filter(
-        AttendanceRecord.check_in_time >= today_start
-    ).all()
+    """Get today's attendance summary from the daily rollup."""
+    today = datetime.now().date()
+    totals = daily_totals(db, today, today)
+    checked_in = int(totals[0].persons) if totals else 0
+    records = int(totals[0].check_ins) if totals else 0
     
     # Get all active persons
-    total_persons = db.query(Person).filter(Person.is_active == True).count()
-    
-    checked_in = len(set(r.person_id for r in records))
+    total_persons = db.query(func.count(Person.id)).filter(Person.is_active == True).scalar()
     
     return {
-        "date": today_start.strftime('%Y-%m-%d'),
+        "date": today.strftime('%Y-%m-%d'),
         "total_persons": total_persons,
         "checked_in": checked_in,
         "attendance_rate": f"{(checked_in / total_persons * 100):.1f}%" if total_persons > 0 else "0%",
-        "records": len(records)
+        "records": records
+    }
+
+
+@router.get("/attendance/daily", response_model=List[DailyAttendance])
+def daily_attendance(
+    start_date: date,
+    end_date: date,
+    location: Optional[str] = None,
+    department: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Per-day check-in, check-out and distinct-person counts for a date range.
+    
+    Reads the daily rollup, so the cost grows with the number of days rather
+    than the number of attendance records. Days without attendance are omitted.
+    """
+    if end_date < start_date:
+        raise HTTPException(status_code=400, detail="end_date must not be before start_date")
+    return [
+        DailyAttendance(date=row.date, check_ins=row.check_ins, check_outs=row.check_outs, persons=row.persons)
+        for row in daily_totals(db, start_date, end_date, location, department)
+    ]
+
+
+@router.get("/attendance/analytics", response_model=AttendanceAnalytics)
+def attendance_analytics(
+    start_date: date,
+    end_date: date,
+    department: Optional[str] = None,
+    location: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Hours worked, first-in/last-out and department attendance rates for a range.
+    
+    Aggregated in the database; results are cached per range and filters until
+    a check-in or check-out lands inside the range.
+    """
+    if end_date < start_date:
+        raise HTTPException(status_code=400, detail="end_date must not be before start_date")
+    
+    key = (start_date, end_date, department, location)
+    result = analytics_cache.get(key)
+    if result is None:
+        result = AttendanceAnalytics(
+            start_date=start_date,
+            end_date=end_date,
+            person_days=[
+                PersonDayStats.model_validate(row._asdict())
+                for row in person_days(db, start_date, end_date, department, location)
+            ],
+            departments=[
+                DepartmentRate(**rate)
+                for rate in department_rates(db, start_date, end_date, department, location)
+            ]
+        )
+        analytics_cache.store(key, result)
+    return result
+
+
+@router.get("/metrics")
+def checkin_metrics(
+    current_user: User = Depends(get_current_user)
+):
+    """Face processing pool and gallery statistics."""
+    return {
+        "face_pool": face_pool_stats(),
+        "frame_gate": frame_gate.stats(),
+        "analytics_cache": analytics_cache.stats(),
+        "face_quality": face_quality_stats.stats()
     }
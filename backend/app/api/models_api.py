@@ -1,11 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status, UploadFile, File
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from app.db.session import get_db
 from app.api.auth import get_current_user
 from app.models.models import User, Model
 from app.schemas.schemas import Model as ModelSchema, ModelCreate, ModelUpdate
 from app.core.config import settings
+from app.services.model_registry import model_registry
+from app.services.model_export import PYTORCH, RUNTIMES, export_model, needs_export, remove_artifact
 import os
 import shutil
 
@@ -85,6 +87,8 @@ def update_model(
     
     db.commit()
     db.refresh(model)
+    if "is_deployed" in update_data:
+        model_registry.invalidate(model_id)
     return model
 
 
@@ -105,9 +109,11 @@ def delete_model(
     # Delete model file
     if model.file_path and os.path.exists(model.file_path):
         os.remove(model.file_path)
+    remove_artifact(model.runtime_path)
     
     db.delete(model)
     db.commit()
+    model_registry.invalidate(model_id)
     
     return {"message": "Model deleted successfully"}
 
@@ -142,9 +148,13 @@ async def upload_model_file(
     with open(file_path, "wb") as buffer:
         shutil.copyfileobj(file.file, buffer)
     
-    # Update model
+    # Update model; an exported runtime belongs to the previous checkpoint
+    remove_artifact(model.runtime_path)
     model.file_path = file_path
+    model.runtime_path = None
+    model.runtime_error = None
     db.commit()
+    model_registry.invalidate(model_id)
     
     return {"message": "Model file uploaded successfully", "file_path": file_path}
 
@@ -175,10 +185,23 @@ def download_model(
 @router.post("/{model_id}/deploy")
 def deploy_model(
     model_id: int,
+    background_tasks: BackgroundTasks,
+    runtime: Optional[str] = None,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Deploy model for inference API."""
+    """Deploy model for inference API.
+    
+    ``runtime`` (onnx or openvino, default ``DEPLOY_RUNTIME``) also exports the
+    checkpoint to that CPU runtime in the background; inference serves the
+    PyTorch checkpoint until the export is ready. ``runtime=pytorch`` deploys
+    without exporting.
+    """
+    runtime = settings.DEPLOY_RUNTIME if runtime is None else runtime
+    runtime = None if runtime in ("", PYTORCH) else runtime
+    if runtime is not None and runtime not in RUNTIMES:
+        raise HTTPException(status_code=400, detail=f"Unsupported runtime: {runtime}")
+    
     model = db.query(Model).filter(Model.id == model_id).first()
     if not model:
         raise HTTPException(status_code=404, detail="Model not found")
@@ -189,12 +212,25 @@ def deploy_model(
     if not model.file_path or not os.path.exists(model.file_path):
         raise HTTPException(status_code=400, detail="Model file not found. Upload or train a model first.")
     
+    if model.runtime != runtime:
+        remove_artifact(model.runtime_path)
+        model.runtime_path = None
+        model.runtime_error = None
+    model.runtime = runtime
     model.is_deployed = True
     db.commit()
+    # A redeploy always serves the checkpoint as it is now
+    model_registry.invalidate(model_id)
+    
+    exporting = needs_export(model)
+    if exporting:
+        background_tasks.add_task(export_model, model.id, model.file_path, runtime)
     
     return {
         "message": "Model deployed successfully",
-        "inference_endpoint": f"{settings.API_V1_STR}/predictions/infer"
+        "inference_endpoint": f"{settings.API_V1_STR}/predictions/infer",
+        "runtime": runtime or PYTORCH,
+        "exporting": exporting
     }
 
 
@@ -214,5 +250,6 @@ def undeploy_model(
     
     model.is_deployed = False
     db.commit()
+    model_registry.invalidate(model_id)
     
     return {"message": "Model undeployed successfully"}
@@ -1,31 +1,28 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, UploadFile, File
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Tuple
 from app.db.session import get_db
 from app.api.auth import get_current_user
-from app.models.models import User, Model
-from app.schemas.schemas import PredictionRequest, PredictionResult, BoundingBox
+from app.models.models import User, Model, PredictionJob, TrainingStatus
+from app.schemas.schemas import PredictionResult, PredictionJob as PredictionJobSchema
 from app.core.config import settings
-from ultralytics import YOLO
+from app.services.image_io import load_image
+from app.services.model_registry import model_registry
+from app.services.inference_scheduler import inference_scheduler, batch_limits
+from app.services.model_export import serving_checkpoint
+from app.services.yolo_results import RESULT_FORMATS, prediction_result, columnar_result, encode_columnar
+from app.services.batch_inference import (
+    NDJSON_MEDIA_TYPE, DeployedModel, count_images, write_job_input, stream_predictions, run_prediction_job
+)
 import os
-import time
-from PIL import Image
-import tempfile
+import asyncio
 
 router = APIRouter()
 
 
-@router.post("/infer", response_model=PredictionResult)
-async def infer(
-    model_id: int,
-    file: UploadFile = File(...),
-    confidence: float = 0.25,
-    iou_threshold: float = 0.45,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    """Run inference on an image using a deployed model."""
-    # Get model
+def _get_deployed_model(db: Session, model_id: int, current_user: User) -> Model:
     model = db.query(Model).filter(Model.id == model_id).first()
     if not model:
         raise HTTPException(status_code=404, detail="Model not found")
@@ -38,63 +35,199 @@ async def infer(
     
     if not model.file_path or not os.path.exists(model.file_path):
         raise HTTPException(status_code=400, detail="Model file not found")
+    return model
+
+
+async def _read_images(files: List[UploadFile], max_images: int) -> Tuple[List[Tuple[str, bytes]], int]:
+    """Read uploaded images and zip archives, checking the number of images they hold."""
+    uploads = [(upload.filename or "image", await upload.read()) for upload in files]
+    try:
+        total = await run_in_threadpool(count_images, uploads)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if total == 0:
+        raise HTTPException(status_code=400, detail="No images found in the upload")
+    if total > max_images:
+        raise HTTPException(status_code=400, detail=f"Too many images, the limit is {max_images}")
+    return uploads, total
+
+
+def _check_result_format(format: str, allowed=RESULT_FORMATS):
+    if format not in allowed:
+        raise HTTPException(status_code=400, detail=f"Unsupported result format: {format}")
+    if format == "msgpack":
+        try:
+            import msgpack  # noqa: F401
+        except ImportError:
+            raise HTTPException(status_code=400, detail="msgpack results require msgpack to be installed")
+
+
+@router.post("/infer", response_model=PredictionResult)
+async def infer(
+    model_id: int,
+    file: UploadFile = File(...),
+    confidence: float = 0.25,
+    iou_threshold: float = 0.45,
+    format: str = "json",
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Run inference on an image using a deployed model.
     
-    # Save uploaded file temporarily
-    with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[1]) as tmp_file:
-        tmp_file.write(await file.read())
-        tmp_path = tmp_file.name
+    Concurrent requests for the same model are micro-batched into one forward
+    pass; ``inference_time`` is the time of that batch. ``format=columnar``
+    (JSON) or ``format=msgpack`` return ``PredictionColumns`` parallel arrays
+    instead of one object per box, which is much cheaper for dense scenes.
+    ``backend`` names the runtime that served the request: the model's
+    exported CPU runtime when it is ready, PyTorch otherwise.
+    """
+    _check_result_format(format)
+    model = _get_deployed_model(db, model_id, current_user)
+    checkpoint, backend = serving_checkpoint(model)
+    content = await file.read()
     
+    # Decode the upload in memory, off the event loop
     try:
-        # Load YOLO model
-        yolo_model = YOLO(model.file_path)
-        
-        # Run inference
-        start_time = time.time()
-        results = yolo_model.predict(
-            source=tmp_path,
-            conf=confidence,
-            iou=iou_threshold,
-            verbose=False
+        image = await run_in_threadpool(load_image, content)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid image file")
+    
+    try:
+        # Queue for the model's next batch; loaded models are cached per process
+        result, inference_time = await inference_scheduler.predict(
+            model.id,
+            checkpoint,
+            image,
+            confidence,
+            iou_threshold,
+            *batch_limits(model)
         )
-        inference_time = time.time() - start_time
-        
-        # Parse results
-        predictions = []
-        if len(results) > 0:
-            result = results[0]
-            boxes = result.boxes
-            
-            for i in range(len(boxes)):
-                box = boxes.xyxy[i].cpu().numpy()
-                class_id = int(boxes.cls[i].cpu().numpy())
-                conf = float(boxes.conf[i].cpu().numpy())
-                
-                # Get class name
-                class_name = model.class_names[class_id] if model.class_names and class_id < len(model.class_names) else f"class_{class_id}"
-                
-                predictions.append(BoundingBox(
-                    class_id=class_id,
-                    class_name=class_name,
-                    confidence=conf,
-                    x_min=float(box[0]),
-                    y_min=float(box[1]),
-                    x_max=float(box[2]),
-                    y_max=float(box[3])
-                ))
         
-        return PredictionResult(
-            image_path=file.filename,
-            predictions=predictions,
-            inference_time=inference_time
-        )
+        if format != "json":
+            columns = columnar_result(file.filename, result, inference_time, model.class_names, backend)
+            return Response(content=encode_columnar(columns, format), media_type=RESULT_FORMATS[format])
+        # Serialized here so FastAPI does not validate every box again against response_model
+        prediction = prediction_result(file.filename, result, inference_time, model.class_names, backend)
+        return Response(content=prediction.model_dump_json(), media_type=RESULT_FORMATS["json"])
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Inference failed: {str(e)}")
+
+
+@router.post("/batch")
+async def batch_infer(
+    model_id: int,
+    files: List[UploadFile] = File(...),
+    confidence: float = 0.25,
+    iou_threshold: float = 0.45,
+    format: str = "json",
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Run a deployed model over many images, streaming the results as NDJSON.
+    
+    Accepts image files and zip archives of images. Each line is the
+    ``PredictionResult`` (or ``PredictionColumns`` with ``format=columnar``)
+    of one image, or ``{"image_path", "error"}``, written as soon as the image
+    finishes. Use ``/predictions/jobs`` for more than
+    ``PREDICTION_STREAM_MAX_IMAGES`` images.
+    """
+    _check_result_format(format, ("json", "columnar"))
+    model = _get_deployed_model(db, model_id, current_user)
+    uploads, _ = await _read_images(files, settings.PREDICTION_STREAM_MAX_IMAGES)
+    return StreamingResponse(
+        stream_predictions(DeployedModel.from_model(model), uploads, confidence, iou_threshold, format == "columnar"),
+        media_type=NDJSON_MEDIA_TYPE
+    )
+
+
+@router.post("/jobs", response_model=PredictionJobSchema)
+async def create_prediction_job(
+    background_tasks: BackgroundTasks,
+    model_id: int,
+    files: List[UploadFile] = File(...),
+    confidence: float = 0.25,
+    iou_threshold: float = 0.45,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Run a deployed model over many images in the background.
+    
+    Takes the same uploads as ``/predictions/batch``. Poll the returned job for
+    progress and download the NDJSON results from ``/predictions/jobs/{id}/results``.
+    """
+    _get_deployed_model(db, model_id, current_user)
+    uploads, total = await _read_images(files, settings.PREDICTION_JOB_MAX_IMAGES)
+    
+    def create_job():
+        job = PredictionJob(
+            user_id=current_user.id,
+            model_id=model_id,
+            confidence=confidence,
+            iou_threshold=iou_threshold,
+            total=total,
+            status=TrainingStatus.PENDING
+        )
+        db.add(job)
+        db.flush()
+        job.result_path = os.path.join(settings.UPLOAD_DIR, "predictions", f"job_{job.id}.ndjson")
+        db.commit()
+        db.refresh(job)
+        return job
     
-    finally:
-        # Clean up temporary file
-        if os.path.exists(tmp_path):
-            os.remove(tmp_path)
+    job = await run_in_threadpool(create_job)
+    input_path = os.path.join(settings.UPLOAD_DIR, "predictions", f"job_{job.id}_input.zip")
+    await run_in_threadpool(write_job_input, uploads, input_path)
+    
+    # The job thread hands images to the scheduler running on this event loop
+    background_tasks.add_task(run_prediction_job, job.id, input_path, asyncio.get_running_loop())
+    return job
+
+
+def _get_prediction_job(db: Session, job_id: int, current_user: User) -> PredictionJob:
+    job = db.query(PredictionJob).filter(
+        PredictionJob.id == job_id,
+        PredictionJob.user_id == current_user.id
+    ).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Prediction job not found")
+    return job
+
+
+@router.get("/jobs/{job_id}", response_model=PredictionJobSchema)
+def get_prediction_job(
+    job_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get prediction job progress."""
+    return _get_prediction_job(db, job_id, current_user)
+
+
+@router.get("/jobs/{job_id}/results")
+def download_prediction_results(
+    job_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Download a job's NDJSON results; a running job returns the lines written so far."""
+    job = _get_prediction_job(db, job_id, current_user)
+    if not job.result_path or not os.path.exists(job.result_path):
+        raise HTTPException(status_code=404, detail="Prediction results not found")
+    return FileResponse(job.result_path, media_type=NDJSON_MEDIA_TYPE, filename=f"predictions_{job_id}.ndjson")
+
+
+@router.get("/metrics")
+def prediction_metrics(
+    current_user: User = Depends(get_current_user)
+):
+    """Loaded-model cache and batching statistics."""
+    return {
+        "model_cache": model_registry.stats(),
+        "scheduler": inference_scheduler.stats()
+    }
 
 
 @router.post("/test/{model_id}")
@@ -105,4 +238,4 @@ async def test_model(
     db: Session = Depends(get_db)
 ):
     """Test a model with an uploaded image."""
-    return await infer(model_id, file, 0.25, 0.45, current_user, db)
+    return await infer(model_id, file, 0.25, 0.45, "json", current_user, db)
@@ -29,6 +29,53 @@ class Settings(BaseSettings):
     DEFAULT_BATCH_SIZE: int = 16
     DEFAULT_IMG_SIZE: int = 640
     
+    # YOLO Inference
+    MODEL_CACHE_SIZE: int = 4  # Loaded models kept per process for /predictions
+    MODEL_CACHE_MAX_BYTES: int = 2 * 1024 * 1024 * 1024  # Budget by checkpoint size, 0 = count limit only
+    INFERENCE_MAX_BATCH_SIZE: int = 8  # Images per forward pass, unless set on the model
+    INFERENCE_MAX_BATCH_WAIT_MS: float = 10.0  # Longest a request waits for its batch to fill
+    INFERENCE_QUEUE_LIMIT: int = 64  # Requests queued per model before requests get a 503
+    PREDICTION_STREAM_MAX_IMAGES: int = 100  # Images accepted by one streamed /predictions/batch call
+    PREDICTION_JOB_MAX_IMAGES: int = 10000  # Images accepted by one background prediction job
+    DEPLOY_RUNTIME: str = ""  # CPU runtime exported on deploy (onnx, openvino), empty = PyTorch only
+    
+    # Face Check-In
+    FACE_MATCH_TOLERANCE: float = 0.6  # Max face distance considered a match
+    FACE_SEARCH_BACKEND: str = "exact"  # exact or ivf (approximate)
+    FACE_IVF_MIN_GALLERY: int = 10000  # Smaller galleries always use exact search
+    FACE_IVF_LISTS: int = 0  # Number of IVF partitions, 0 = sqrt(gallery size)
+    FACE_IVF_PROBES: int = 8  # Partitions scanned per query (higher = better recall)
+    FACE_LOCATION_FALLBACK: bool = False  # Search the whole gallery when a location's partition has no match
+    FACE_GALLERY_SNAPSHOT: bool = True  # Share the gallery between workers as a memory-mapped file under UPLOAD_DIR/gallery
+    FACE_DETECTION_SCALE: float = 1.0  # Downscale factor for detection, e.g. 0.5 for 1080p frames
+    FACE_DETECTION_UPSAMPLE: int = 1  # number_of_times_to_upsample for the detector
+    FACE_DETECTION_MODEL: str = "hog"  # hog (CPU) or cnn (GPU builds of dlib)
+    FACE_ENCODING_JITTERS: int = 1  # num_jitters for face encodings (higher = slower, steadier)
+    FACE_ENCODING_MODEL: str = "small"  # Landmark model used to align faces: small or large
+    FACE_QUALITY_FILTER: bool = True  # Reject unusable faces at check-in before encoding them
+    FACE_MIN_SIZE: int = 40  # Smallest face box side in original-image pixels
+    FACE_MIN_SHARPNESS: float = 30.0  # Laplacian variance of the normalised face crop
+    FACE_MIN_BRIGHTNESS: float = 40.0  # Mean grayscale level (0-255) of the face crop...
+    FACE_MAX_BRIGHTNESS: float = 220.0  # ...and its upper bound
+    FACE_WORKERS: int = 2  # Processes running dlib detection/encoding
+    FACE_QUEUE_LIMIT: int = 32  # Face tasks in flight before requests get a 503
+    FACE_TRACK_IDENTITY_TTL: float = 2.0  # Seconds before a tracked face is re-matched
+    FACE_TEMPLATES_MAX: int = 5  # Extra face templates per person besides the registration photo
+    FACE_AUTO_TEMPLATES: bool = False  # Keep confident check-in encodings as extra templates
+    FACE_AUTO_TEMPLATE_MAX_DISTANCE: float = 0.4  # Only learn from matches at least this close...
+    FACE_AUTO_TEMPLATE_MIN_DISTANCE: float = 0.2  # ...but not so close that a template already covers them
+    FRAME_GATE_ENABLED: bool = True  # Reuse results for unchanged frames from the same kiosk
+    FRAME_GATE_THRESHOLD: float = 2.0  # Mean abs grayscale difference (0-255) counted as unchanged
+    FRAME_GATE_MAX_AGE: float = 10.0  # Seconds a cached kiosk result stays valid
+    CHECKIN_SAVE_PHOTOS: bool = True  # Keep the photo of each check-in under UPLOAD_DIR/checkin
+    CHECKIN_BATCH_MAX_IMAGES: int = 100  # Images accepted by one batch check-in request
+    ENROLLMENT_MAX_ROWS: int = 20000  # Manifest rows accepted by one bulk enrollment
+    ENROLLMENT_BATCH_SIZE: int = 100  # Persons encoded and inserted per progress step
+    REENCODE_BATCH_SIZE: int = 200  # Persons re-encoded per chunk of a gallery re-encode job
+    REENCODE_STALE_AFTER: float = 900.0  # Seconds without progress before a re-encode job counts as interrupted
+    ANALYTICS_CACHE_SIZE: int = 256  # Cached attendance analytics results per process
+    ANALYTICS_CACHE_TTL: float = 300.0  # Seconds before a cached result is recomputed
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
@@ -5,6 +5,7 @@ from app.core.config import settings
 from app.db.session import engine
 from app.models import models
 from app.api import datasets, models_api, training, auth, predictions, checkin
+from app.services.face_worker import shutdown_face_pool
 import os
 
 # Create database tables
@@ -27,6 +28,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Face-Quality"],
 )
 
 
@@ -38,6 +40,11 @@ async def global_exception_handler(request: Request, exc: Exception):
     )
 
 
+@app.on_event("shutdown")
+def shutdown_workers():
+    shutdown_face_pool()
+
+
 @app.get("/")
 async def root():
     return {
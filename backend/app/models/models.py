@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Text, Float, JSON, Enum as SQLEnum
+from sqlalchemy import Column, Integer, String, Date, DateTime, Boolean, ForeignKey, Text, Float, JSON, LargeBinary, Index, UniqueConstraint, Enum as SQLEnum
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.session import Base
+from typing import List
 import enum
 
 
@@ -96,6 +97,11 @@ class Model(Base):
     metrics = Column(JSON)  # mAP, precision, recall, etc.
     is_public = Column(Boolean, default=False)
     is_deployed = Column(Boolean, default=False)
+    max_batch_size = Column(Integer)  # Micro-batching limits, NULL = INFERENCE_* settings
+    max_batch_wait_ms = Column(Float)
+    runtime = Column(String)  # CPU runtime exported on deploy: onnx, openvino; NULL = PyTorch only
+    runtime_path = Column(String)  # Exported artifact next to file_path, set once the export finishes
+    runtime_error = Column(Text)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
@@ -142,13 +148,52 @@ class Person(Base):
     name = Column(String, nullable=False)
     employee_id = Column(String, unique=True, index=True)
     department = Column(String)
-    face_encoding = Column(JSON)  # Store face encoding as JSON array
+    face_encoding = Column(LargeBinary)  # 128 float32 values, see app.services.face_gallery
     photo_path = Column(String)
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     attendance_records = relationship("AttendanceRecord", back_populates="person")
+    face_templates = relationship("FaceTemplate", back_populates="person", cascade="all, delete-orphan")
+    site_links = relationship("PersonSite", back_populates="person", cascade="all, delete-orphan", lazy="selectin")
+    
+    @property
+    def sites(self) -> List[str]:
+        """Locations the person checks in at; empty means every location."""
+        return sorted(link.location for link in self.site_links)
+    
+    @sites.setter
+    def sites(self, locations: List[str]):
+        # Keep unchanged links so their rows are not deleted and re-inserted
+        wanted = set(locations)
+        self.site_links = [link for link in self.site_links if link.location in wanted] + [
+            PersonSite(location=location) for location in sorted(wanted - {link.location for link in self.site_links})
+        ]
+
+
+class PersonSite(Base):
+    """Assignment of a person to a check-in location, used to partition face matching."""
+    __tablename__ = "person_sites"
+    
+    person_id = Column(Integer, ForeignKey("persons.id", ondelete="CASCADE"), primary_key=True)
+    location = Column(String, primary_key=True, index=True)
+    
+    person = relationship("Person", back_populates="site_links")
+
+
+class FaceTemplate(Base):
+    """Additional face encoding of a person, matched alongside ``Person.face_encoding``."""
+    __tablename__ = "face_templates"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    person_id = Column(Integer, ForeignKey("persons.id", ondelete="CASCADE"), nullable=False, index=True)
+    encoding = Column(LargeBinary, nullable=False)  # 128 float32 values
+    source = Column(String, nullable=False, default="enrollment")  # enrollment or check_in
+    photo_path = Column(String)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    person = relationship("Person", back_populates="face_templates")
 
 
 class AttendanceRecord(Base):
@@ -165,3 +210,131 @@ class AttendanceRecord(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     person = relationship("Person", back_populates="attendance_records")
+    
+    __table_args__ = (
+        Index("ix_attendance_person_check_in", "person_id", "check_in_time"),
+        # Keyset pagination order of the attendance listing
+        Index("ix_attendance_check_in_id", "check_in_time", "id"),
+        # Open (not yet checked out) records, used by the check-in/check-out toggle
+        Index(
+            "ix_attendance_open_person_check_in",
+            "person_id",
+            "check_in_time",
+            postgresql_where=check_out_time.is_(None),
+            sqlite_where=check_out_time.is_(None)
+        ),
+    )
+
+
+class AttendanceDaily(Base):
+    """Per-day attendance counts by location and department.
+    
+    Maintained by the check-in/check-out path. ``persons`` counts each
+    person once per day and location, so it can be summed across the
+    departments of one location. ``day_persons`` counts each person once per
+    day, under the location and department of their first check-in, so it
+    can be summed across locations.
+    """
+    __tablename__ = "attendance_daily"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    date = Column(Date, nullable=False)
+    location = Column(String, nullable=False, default="")  # "" when not given
+    department = Column(String, nullable=False, default="")
+    check_ins = Column(Integer, nullable=False, default=0)
+    check_outs = Column(Integer, nullable=False, default=0)
+    persons = Column(Integer, nullable=False, default=0)  # Distinct persons checked in at this location
+    day_persons = Column(Integer, nullable=False, default=0, server_default="0")  # ...counted at their first location only
+    
+    __table_args__ = (
+        UniqueConstraint("date", "location", "department", name="uq_attendance_daily_key"),
+    )
+
+
+class EnrollmentJob(Base):
+    """Bulk person enrollment from a photo archive and CSV manifest."""
+    __tablename__ = "enrollment_jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"))
+    status = Column(SQLEnum(TrainingStatus), default=TrainingStatus.PENDING)
+    
+    total = Column(Integer, default=0)  # Manifest rows
+    processed = Column(Integer, default=0)
+    succeeded = Column(Integer, default=0)
+    failed = Column(Integer, default=0)
+    report = Column(JSON)  # One entry per manifest row, filled in as rows finish
+    error_message = Column(Text)
+    
+    started_at = Column(DateTime(timezone=True))
+    completed_at = Column(DateTime(timezone=True))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class PredictionJob(Base):
+    """Batch inference over many images, with results written to an NDJSON file."""
+    __tablename__ = "prediction_jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"))
+    model_id = Column(Integer, ForeignKey("models.id", ondelete="CASCADE"), index=True)
+    status = Column(SQLEnum(TrainingStatus), default=TrainingStatus.PENDING)
+    confidence = Column(Float, default=0.25)
+    iou_threshold = Column(Float, default=0.45)
+    
+    total = Column(Integer, default=0)  # Images
+    processed = Column(Integer, default=0)
+    failed = Column(Integer, default=0)
+    result_path = Column(String)  # One PredictionResult (or error) JSON line per image
+    error_message = Column(Text)
+    
+    started_at = Column(DateTime(timezone=True))
+    completed_at = Column(DateTime(timezone=True))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class ReencodeJob(Base):
+    """Recomputes every person's face encoding from their registration photo, then every template's.
+
+    ``heartbeat_at`` is renewed as the job progresses; a pending or running
+    job without a renewal for ``REENCODE_STALE_AFTER`` seconds was interrupted.
+    """
+    __tablename__ = "reencode_jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"))
+    status = Column(SQLEnum(TrainingStatus), default=TrainingStatus.PENDING)
+    parameters = Column(JSON)  # Encoding settings the job ran with
+    
+    total = Column(Integer, default=0)
+    processed = Column(Integer, default=0)
+    failed = Column(Integer, default=0)
+    last_person_id = Column(Integer, default=0)  # Resume point, persons are processed in id order
+    last_template_id = Column(Integer, default=0)  # ...then templates, in id order
+    throughput = Column(Float)  # Persons and templates per second in the current run
+    eta_seconds = Column(Float)
+    failures = Column(JSON)  # [{"person_id", "template_id", "detail"}], persons keep their old encoding, templates are removed
+    error_message = Column(Text)
+    
+    heartbeat_at = Column(DateTime(timezone=True))
+    started_at = Column(DateTime(timezone=True))
+    completed_at = Column(DateTime(timezone=True))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class FaceEncodingStage(Base):
+    """New encodings computed by a re-encode job, applied to persons when it finishes."""
+    __tablename__ = "face_encoding_stage"
+    
+    job_id = Column(Integer, ForeignKey("reencode_jobs.id", ondelete="CASCADE"), primary_key=True)
+    person_id = Column(Integer, ForeignKey("persons.id", ondelete="CASCADE"), primary_key=True)
+    encoding = Column(LargeBinary, nullable=False)
+
+
+class FaceTemplateStage(Base):
+    """New template encodings computed by a re-encode job; ``NULL`` removes the template."""
+    __tablename__ = "face_template_stage"
+    
+    job_id = Column(Integer, ForeignKey("reencode_jobs.id", ondelete="CASCADE"), primary_key=True)
+    template_id = Column(Integer, ForeignKey("face_templates.id", ondelete="CASCADE"), primary_key=True)
+    encoding = Column(LargeBinary)
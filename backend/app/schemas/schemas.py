@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional, List
-from datetime import datetime
+from typing import Any, Optional, List, Dict
+from datetime import date, datetime
 from enum import Enum
 
 
@@ -128,6 +128,8 @@ class ModelUpdate(BaseModel):
     description: Optional[str] = None
     is_public: Optional[bool] = None
     is_deployed: Optional[bool] = None
+    max_batch_size: Optional[int] = Field(None, ge=1)
+    max_batch_wait_ms: Optional[float] = Field(None, ge=0)
 
 
 class Model(ModelBase):
@@ -138,6 +140,11 @@ class Model(ModelBase):
     class_names: Optional[List[str]] = None
     metrics: Optional[dict] = None
     is_deployed: bool
+    max_batch_size: Optional[int] = None
+    max_batch_wait_ms: Optional[float] = None
+    runtime: Optional[str] = None
+    runtime_path: Optional[str] = None
+    runtime_error: Optional[str] = None
     created_at: datetime
     updated_at: Optional[datetime] = None
     
@@ -208,6 +215,35 @@ class PredictionResult(BaseModel):
     image_path: str
     predictions: List[BoundingBox]
     inference_time: float
+    backend: str = "pytorch"  # pytorch, onnx or openvino
+
+
+class PredictionColumns(BaseModel):
+    image_path: str
+    boxes: List[float]  # flat [x_min, y_min, x_max, y_max, ...], four values per detection
+    class_ids: List[int]
+    confidences: List[float]
+    classes: Dict[str, str]  # class id -> name, for the ids present
+    inference_time: float
+    backend: str = "pytorch"
+
+
+class PredictionJob(BaseModel):
+    id: int
+    model_id: int
+    status: TrainingStatus
+    confidence: float
+    iou_threshold: float
+    total: int
+    processed: int
+    failed: int
+    error_message: Optional[str] = None
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+    created_at: datetime
+    
+    class Config:
+        from_attributes = True
 
 
 # Statistics Schemas
@@ -245,10 +281,12 @@ class PersonUpdate(BaseModel):
     employee_id: Optional[str] = None
     department: Optional[str] = None
     is_active: Optional[bool] = None
+    sites: Optional[List[str]] = None  # Replaces the person's locations; [] = every location
 
 
 class Person(PersonBase):
     id: int
+    sites: List[str] = []  # Check-in locations; empty means every location
     photo_path: Optional[str] = None
     created_at: datetime
     updated_at: Optional[datetime] = None
@@ -257,6 +295,70 @@ class Person(PersonBase):
         from_attributes = True
 
 
+class FaceTemplate(BaseModel):
+    id: int
+    person_id: int
+    source: str
+    photo_path: Optional[str] = None
+    created_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+
+
+class EnrollmentRowReport(BaseModel):
+    row: int  # 1-based manifest row, excluding the header
+    name: Optional[str] = None
+    employee_id: Optional[str] = None
+    status: str  # created or error
+    detail: Optional[str] = None
+    person_id: Optional[int] = None
+
+
+class ReencodeFailure(BaseModel):
+    person_id: int
+    template_id: Optional[int] = None  # Set for a failed template
+    detail: str
+
+
+class ReencodeJob(BaseModel):
+    id: int
+    status: TrainingStatus
+    parameters: Optional[Dict[str, Any]] = None
+    total: int
+    processed: int
+    failed: int
+    last_person_id: int
+    last_template_id: Optional[int] = None
+    throughput: Optional[float] = None  # Persons and templates per second
+    eta_seconds: Optional[float] = None
+    failures: Optional[List[ReencodeFailure]] = None
+    error_message: Optional[str] = None
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+    created_at: datetime
+    
+    class Config:
+        from_attributes = True
+
+
+class EnrollmentJob(BaseModel):
+    id: int
+    status: TrainingStatus
+    total: int
+    processed: int
+    succeeded: int
+    failed: int
+    report: Optional[List[EnrollmentRowReport]] = None
+    error_message: Optional[str] = None
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+    created_at: datetime
+    
+    class Config:
+        from_attributes = True
+
+
 # Attendance Record Schemas
 class AttendanceRecordBase(BaseModel):
     person_id: int
@@ -281,6 +383,51 @@ class AttendanceRecord(AttendanceRecordBase):
         from_attributes = True
 
 
+class BatchCheckInItem(BaseModel):
+    filename: str
+    status: str  # checked_in, checked_out, duplicate, no_face, low_quality, multiple_faces, not_recognized, error
+    detail: Optional[str] = None
+    record: Optional[AttendanceRecord] = None
+
+
+class BatchCheckInResult(BaseModel):
+    results: List[BatchCheckInItem]
+    processing_time: float
+
+
+class DailyAttendance(BaseModel):
+    date: date
+    check_ins: int
+    check_outs: int
+    persons: int
+
+
+class PersonDayStats(BaseModel):
+    date: date
+    week: date  # Monday of the week
+    person_id: Optional[int] = None
+    person_name: Optional[str] = None
+    department: Optional[str] = None
+    first_in: datetime
+    last_out: Optional[datetime] = None
+    hours: float
+    week_hours: float
+
+
+class DepartmentRate(BaseModel):
+    department: str
+    headcount: int
+    present_days: int
+    attendance_rate: float
+
+
+class AttendanceAnalytics(BaseModel):
+    start_date: date
+    end_date: date
+    person_days: List[PersonDayStats]
+    departments: List[DepartmentRate]
+
+
 # Face Detection Schemas
 class FaceDetection(BaseModel):
     x: int
@@ -291,8 +438,12 @@ class FaceDetection(BaseModel):
     person_id: Optional[int] = None
     person_name: Optional[str] = None
     match_confidence: Optional[float] = None
+    track_id: Optional[int] = None  # Set by the /checkin/stream WebSocket
+    quality: Optional[str] = None  # Rejection reason code when the face failed the quality pre-filter
 
 
 class FaceDetectionResult(BaseModel):
     faces: List[FaceDetection]
     processing_time: float
+    timings: Dict[str, float] = {}  # Seconds per stage: decode, detect, quality, encode, match
+    gated: bool = False  # True when a cached result was returned for an unchanged kiosk frame
@@ -0,0 +1,173 @@
+from app.core.config import settings
+from app.models.models import Person, AttendanceRecord, AttendanceDaily
+from app.services.attendance_rollup import persons_column
+from sqlalchemy import Date, cast, distinct, func, select
+from sqlalchemy.orm import Session
+from collections import OrderedDict
+from datetime import date, datetime, time as dt_time, timedelta
+from typing import Optional
+import threading
+import time
+
+
+def _day(dialect: str, column):
+    if dialect == "postgresql":
+        return cast(column, Date)
+    return func.date(column)
+
+
+def _week(dialect: str, day):
+    """Monday of the week containing ``day``."""
+    if dialect == "postgresql":
+        return cast(func.date_trunc("week", day), Date)
+    return func.date(day, "weekday 0", "-6 days")
+
+
+def _hours(dialect: str, start, end):
+    if dialect == "postgresql":
+        return func.extract("epoch", end - start) / 3600.0
+    return (func.strftime("%s", end) - func.strftime("%s", start)) / 3600.0
+
+
+def person_days(
+    db: Session,
+    start: date,
+    end: date,
+    department: Optional[str] = None,
+    location: Optional[str] = None
+):
+    """First-in, last-out and hours worked per person per day, plus week totals.
+
+    Hours only count closed records. ``week_hours`` is a window sum over the
+    person's days of the same week that fall inside the range.
+    """
+    dialect = db.get_bind().dialect.name
+    day = _day(dialect, AttendanceRecord.check_in_time)
+
+    daily = select(
+        AttendanceRecord.person_id,
+        day.label("day"),
+        func.min(AttendanceRecord.check_in_time).label("first_in"),
+        func.max(AttendanceRecord.check_out_time).label("last_out"),
+        func.coalesce(
+            func.sum(_hours(dialect, AttendanceRecord.check_in_time, AttendanceRecord.check_out_time)), 0.0
+        ).label("hours")
+    ).where(
+        AttendanceRecord.check_in_time >= datetime.combine(start, dt_time.min),
+        AttendanceRecord.check_in_time < datetime.combine(end + timedelta(days=1), dt_time.min)
+    )
+    if location is not None:
+        daily = daily.where(AttendanceRecord.location == location)
+    if department is not None:
+        daily = daily.join(Person, Person.id == AttendanceRecord.person_id).where(Person.department == department)
+    daily = daily.group_by(AttendanceRecord.person_id, day).subquery()
+
+    week = _week(dialect, daily.c.day)
+    statement = select(
+        daily.c.day.label("date"),
+        week.label("week"),
+        daily.c.person_id,
+        Person.name.label("person_name"),
+        Person.department,
+        daily.c.first_in,
+        daily.c.last_out,
+        daily.c.hours,
+        func.sum(daily.c.hours).over(partition_by=(daily.c.person_id, week)).label("week_hours")
+    ).select_from(
+        daily.outerjoin(Person, Person.id == daily.c.person_id)
+    ).order_by(daily.c.day, daily.c.person_id)
+
+    return db.execute(statement).all()
+
+
+def department_rates(
+    db: Session,
+    start: date,
+    end: date,
+    department: Optional[str] = None,
+    location: Optional[str] = None
+):
+    """Attendance rate per department over the range, from the daily rollup.
+
+    The rate is person-days present divided by active headcount times the
+    number of days in the range that had any attendance.
+    """
+    rollup_filters = [AttendanceDaily.date >= start, AttendanceDaily.date <= end]
+    if location is not None:
+        rollup_filters.append(AttendanceDaily.location == location)
+
+    days = db.query(func.count(distinct(AttendanceDaily.date))).filter(*rollup_filters).scalar() or 0
+    present = dict(
+        db.query(AttendanceDaily.department, func.sum(persons_column(location)))
+        .filter(*rollup_filters)
+        .group_by(AttendanceDaily.department)
+        .all()
+    )
+    headcount_department = func.coalesce(Person.department, "")
+    headcount = dict(
+        db.query(headcount_department, func.count(Person.id))
+        .filter(Person.is_active == True)
+        .group_by(headcount_department)
+        .all()
+    )
+
+    departments = sorted(set(present) | set(headcount))
+    if department is not None:
+        departments = [name for name in departments if name == department]
+
+    rates = []
+    for name in departments:
+        people = headcount.get(name, 0)
+        present_days = int(present.get(name) or 0)
+        possible = people * days
+        rates.append({
+            "department": name,
+            "headcount": people,
+            "present_days": present_days,
+            "attendance_rate": present_days / possible if possible else 0.0
+        })
+    return rates
+
+
+class AnalyticsCache:
+    """Per-process LRU of analytics results keyed by (range, filters).
+
+    Entries covering a day are dropped when records for that day are written
+    by this process; ``ANALYTICS_CACHE_TTL`` bounds how stale a result can get
+    from writes made by other processes.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[1] < settings.ANALYTICS_CACHE_TTL:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            return None
+
+    def store(self, key, result):
+        with self._lock:
+            self._entries[key] = (result, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > settings.ANALYTICS_CACHE_SIZE:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, day: date):
+        """Drop cached results whose range includes ``day``."""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] <= day <= key[1]]:
+                del self._entries[key]
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+analytics_cache = AnalyticsCache()
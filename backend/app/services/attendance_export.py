@@ -0,0 +1,176 @@
+from app.models.models import Person, AttendanceRecord
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from datetime import datetime
+from io import StringIO
+from typing import Iterator, Optional
+import csv
+
+EXPORT_BATCH_SIZE = 5000
+
+CSV_HEADER = [
+    'ID',
+    'Person Name',
+    'Employee ID',
+    'Department',
+    'Check In Time',
+    'Check Out Time',
+    'Duration (hours)',
+    'Confidence',
+    'Location'
+]
+
+COLUMNAR_FIELDS = [
+    "id", "person_name", "employee_id", "department",
+    "check_in_time", "check_out_time", "duration_hours", "confidence", "location"
+]
+
+
+def export_statement(start_date: Optional[datetime], end_date: Optional[datetime]):
+    """Records joined with their persons, as plain rows in check-in order."""
+    statement = select(
+        AttendanceRecord.id,
+        Person.name,
+        Person.employee_id,
+        Person.department,
+        AttendanceRecord.check_in_time,
+        AttendanceRecord.check_out_time,
+        AttendanceRecord.confidence,
+        AttendanceRecord.location
+    ).outerjoin(Person, Person.id == AttendanceRecord.person_id)
+
+    if start_date:
+        statement = statement.where(AttendanceRecord.check_in_time >= start_date)
+    if end_date:
+        statement = statement.where(AttendanceRecord.check_in_time <= end_date)
+    return statement.order_by(AttendanceRecord.check_in_time, AttendanceRecord.id)
+
+
+def _row_batches(db: Session, statement) -> Iterator[list]:
+    """Fetch rows in batches through a server-side cursor."""
+    result = db.execute(statement.execution_options(yield_per=EXPORT_BATCH_SIZE))
+    for partition in result.partitions():
+        yield partition
+
+
+def _duration_hours(check_in_time, check_out_time) -> Optional[float]:
+    if not check_out_time:
+        return None
+    return (check_out_time - check_in_time).total_seconds() / 3600
+
+
+def iter_csv(db: Session, statement) -> Iterator[str]:
+    """Yield the CSV export one batch of rows at a time."""
+    output = StringIO()
+    writer = csv.writer(output)
+    writer.writerow(CSV_HEADER)
+
+    for rows in _row_batches(db, statement):
+        for row in rows:
+            duration = _duration_hours(row.check_in_time, row.check_out_time)
+            writer.writerow([
+                row.id,
+                row.name or '',
+                row.employee_id or '',
+                row.department or '',
+                row.check_in_time.strftime('%Y-%m-%d %H:%M:%S'),
+                row.check_out_time.strftime('%Y-%m-%d %H:%M:%S') if row.check_out_time else '',
+                f"{duration:.2f}" if duration is not None else '',
+                f"{row.confidence:.2f}" if row.confidence else '',
+                row.location or ''
+            ])
+        yield output.getvalue()
+        output.seek(0)
+        output.truncate()
+
+    # Header only, for an empty export
+    if output.tell():
+        yield output.getvalue()
+
+
+class _ChunkSink:
+    """Write-only file object whose contents are drained after every batch."""
+
+    def __init__(self):
+        self.chunks = []
+        self.closed = False
+        self._position = 0
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _arrow_schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ("id", pa.int64()),
+        ("person_name", pa.string()),
+        ("employee_id", pa.string()),
+        ("department", pa.string()),
+        ("check_in_time", pa.timestamp("us")),
+        ("check_out_time", pa.timestamp("us")),
+        ("duration_hours", pa.float64()),
+        ("confidence", pa.float64()),
+        ("location", pa.string()),
+    ])
+
+
+def _arrow_batch(rows, schema):
+    import pyarrow as pa
+
+    columns = {field: [] for field in COLUMNAR_FIELDS}
+    for row in rows:
+        columns["id"].append(row.id)
+        columns["person_name"].append(row.name)
+        columns["employee_id"].append(row.employee_id)
+        columns["department"].append(row.department)
+        columns["check_in_time"].append(row.check_in_time)
+        columns["check_out_time"].append(row.check_out_time)
+        columns["duration_hours"].append(_duration_hours(row.check_in_time, row.check_out_time))
+        columns["confidence"].append(row.confidence)
+        columns["location"].append(row.location)
+    return pa.RecordBatch.from_pydict(columns, schema=schema)
+
+
+def iter_columnar(db: Session, statement, fmt: str) -> Iterator[bytes]:
+    """Yield a Parquet file (one row group per batch) or an Arrow IPC stream.
+
+    Requires ``pyarrow``; callers check for it before streaming starts.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _arrow_schema()
+    sink = _ChunkSink()
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(sink, schema)
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+
+    for rows in _row_batches(db, statement):
+        batch = _arrow_batch(rows, schema)
+        if fmt == "parquet":
+            writer.write_table(pa.Table.from_batches([batch]))
+        else:
+            writer.write_batch(batch)
+        yield sink.drain()
+
+    writer.close()
+    yield sink.drain()
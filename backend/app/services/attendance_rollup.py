@@ -0,0 +1,100 @@
+from app.models.models import AttendanceDaily
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from collections import defaultdict
+from datetime import date
+from typing import Dict, Optional, Tuple
+
+ROLLUP_COUNTS = ("check_ins", "check_outs", "persons", "day_persons")
+
+RollupKey = Tuple[date, str, str]
+
+
+def rollup_key(day: date, location: Optional[str], department: Optional[str]) -> RollupKey:
+    return day, location or "", department or ""
+
+
+def persons_column(location: Optional[str]):
+    """The distinct-person count to sum: per location when filtering by one, else per day."""
+    return AttendanceDaily.persons if location is not None else AttendanceDaily.day_persons
+
+
+def new_increments() -> Dict[RollupKey, Dict[str, int]]:
+    """Accumulator for ``increment_rollups``: key -> {count name: delta}."""
+    return defaultdict(lambda: dict.fromkeys(ROLLUP_COUNTS, 0))
+
+
+def _upsert_insert(dialect: str):
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+        return insert
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+        return insert
+    return None
+
+
+def increment_rollups(db: Session, increments: Dict[RollupKey, Dict[str, int]]):
+    """Add deltas to the daily rollup rows inside the caller's transaction.
+
+    Uses INSERT ... ON CONFLICT DO UPDATE so concurrent check-ins add to the
+    same row instead of racing to create it. Keys are applied in sorted order
+    to keep row lock order consistent between transactions.
+    """
+    if not increments:
+        return
+
+    insert = _upsert_insert(db.get_bind().dialect.name)
+    for key in sorted(increments):
+        day, location, department = key
+        counts = increments[key]
+        if insert is None:
+            row = db.query(AttendanceDaily).filter(
+                AttendanceDaily.date == day,
+                AttendanceDaily.location == location,
+                AttendanceDaily.department == department
+            ).with_for_update().first()
+            if row is None:
+                row = AttendanceDaily(date=day, location=location, department=department, **counts)
+                db.add(row)
+            else:
+                for name in ROLLUP_COUNTS:
+                    setattr(row, name, getattr(row, name) + counts[name])
+            db.flush()
+            continue
+
+        statement = insert(AttendanceDaily).values(
+            date=day, location=location, department=department, **counts
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=["date", "location", "department"],
+            set_={name: getattr(AttendanceDaily, name) + statement.excluded[name] for name in ROLLUP_COUNTS}
+        )
+        db.execute(statement)
+
+
+def daily_totals(
+    db: Session,
+    start: date,
+    end: date,
+    location: Optional[str] = None,
+    department: Optional[str] = None
+):
+    """Per-day sums of the rollup rows between ``start`` and ``end`` inclusive.
+
+    ``persons`` is the number of distinct persons checked in that day, at
+    ``location`` when given.
+    """
+    query = db.query(
+        AttendanceDaily.date,
+        func.sum(AttendanceDaily.check_ins).label("check_ins"),
+        func.sum(AttendanceDaily.check_outs).label("check_outs"),
+        func.sum(persons_column(location)).label("persons")
+    ).filter(AttendanceDaily.date >= start, AttendanceDaily.date <= end)
+
+    if location is not None:
+        query = query.filter(AttendanceDaily.location == location)
+    if department is not None:
+        query = query.filter(AttendanceDaily.department == department)
+
+    return query.group_by(AttendanceDaily.date).order_by(AttendanceDaily.date).all()
@@ -0,0 +1,212 @@
+from app.db.session import SessionLocal
+from app.models.models import Model, PredictionJob, TrainingStatus
+from app.services.image_io import IMAGE_EXTENSIONS, load_image
+from app.services.inference_scheduler import inference_scheduler, batch_limits
+from app.services.model_export import serving_checkpoint
+from app.services.yolo_results import prediction_result, columnar_result
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+from datetime import datetime
+from io import BytesIO
+from typing import AsyncIterator, List, NamedTuple, Optional, Tuple
+import asyncio
+import json
+import os
+import traceback
+import zipfile
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+# A full scheduler queue is retried rather than failing the image
+QUEUE_FULL_RETRIES = 50
+QUEUE_FULL_BACKOFF = 0.1
+
+
+class DeployedModel(NamedTuple):
+    """The model fields inference needs, detached from the request's session."""
+    id: int
+    file_path: str  # Exported runtime artifact or PyTorch checkpoint
+    backend: str
+    class_names: Optional[List[str]]
+    max_batch: int
+    max_wait: float
+
+    @classmethod
+    def from_model(cls, model: Model) -> "DeployedModel":
+        return cls(model.id, *serving_checkpoint(model), model.class_names, *batch_limits(model))
+
+
+def _is_image(name: str) -> bool:
+    return not os.path.basename(name).startswith(".") and name.lower().endswith(IMAGE_EXTENSIONS)
+
+
+def count_images(uploads: List[Tuple[str, bytes]]) -> int:
+    """Images in a list of uploaded images and zip archives. Raises ``ValueError`` for bad archives."""
+    total = 0
+    for filename, content in uploads:
+        if filename.lower().endswith(".zip"):
+            try:
+                with zipfile.ZipFile(BytesIO(content)) as archive:
+                    total += sum(1 for info in archive.infolist() if not info.is_dir() and _is_image(info.filename))
+            except zipfile.BadZipFile:
+                raise ValueError(f"Invalid zip archive: {filename}")
+        else:
+            total += 1
+    return total
+
+
+def iter_images(uploads: List[Tuple[str, bytes]]):
+    """Yield (name, bytes) for every uploaded image, expanding zip archives lazily."""
+    for filename, content in uploads:
+        if filename.lower().endswith(".zip"):
+            with zipfile.ZipFile(BytesIO(content)) as archive:
+                for info in archive.infolist():
+                    if not info.is_dir() and _is_image(info.filename):
+                        yield info.filename, archive.read(info)
+        else:
+            yield filename, content
+
+
+def write_job_input(uploads: List[Tuple[str, bytes]], path: str):
+    """Store the images of a job as one uncompressed zip, read back chunk by chunk by the job."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_STORED) as archive:
+        for i, (name, content) in enumerate(iter_images(uploads)):
+            # Prefixed so duplicate names across uploads stay separate entries
+            archive.writestr(f"{i:06d}/{name}", content)
+
+
+def _decode(content: bytes):
+    try:
+        return load_image(content)
+    except ValueError as e:
+        return e
+
+
+def error_line(image_path: str, detail: str) -> str:
+    return json.dumps({"image_path": image_path, "error": detail})
+
+
+async def _predict_line(
+    model: DeployedModel,
+    name: str,
+    image,
+    confidence: float,
+    iou_threshold: float,
+    columnar: bool = False
+) -> Tuple[str, bool]:
+    """One image's NDJSON line and whether it succeeded."""
+    if isinstance(image, Exception):
+        return error_line(name, str(image)), False
+    for attempt in range(QUEUE_FULL_RETRIES + 1):
+        try:
+            result, inference_time = await inference_scheduler.predict(
+                model.id, model.file_path, image, confidence, iou_threshold, model.max_batch, model.max_wait
+            )
+            break
+        except HTTPException as e:
+            if e.status_code != 503 or attempt == QUEUE_FULL_RETRIES:
+                return error_line(name, e.detail), False
+            await asyncio.sleep(QUEUE_FULL_BACKOFF)
+        except Exception as e:
+            return error_line(name, f"Inference failed: {str(e)}"), False
+    if columnar:
+        columns = columnar_result(name, result, inference_time, model.class_names, model.backend)
+        return json.dumps(columns, separators=(",", ":")), True
+    return prediction_result(name, result, inference_time, model.class_names, model.backend).model_dump_json(), True
+
+
+def _take(iterator, n: int) -> list:
+    chunk = []
+    for item in iterator:
+        chunk.append(item)
+        if len(chunk) == n:
+            break
+    return chunk
+
+
+async def stream_predictions(
+    model: DeployedModel,
+    uploads: List[Tuple[str, bytes]],
+    confidence: float,
+    iou_threshold: float,
+    columnar: bool = False
+) -> AsyncIterator[str]:
+    """Run every uploaded image through the model, yielding one NDJSON line per image as it finishes.
+
+    Images are decoded and queued one model batch at a time, so the scheduler
+    forms full batches while memory stays bounded by the batch size.
+    """
+    images = iter_images(uploads)
+    while True:
+        chunk = await run_in_threadpool(
+            lambda: [(name, _decode(content)) for name, content in _take(images, model.max_batch)]
+        )
+        if not chunk:
+            break
+        pending = [
+            asyncio.ensure_future(_predict_line(model, name, image, confidence, iou_threshold, columnar))
+            for name, image in chunk
+        ]
+        for finished in asyncio.as_completed(pending):
+            line, _ = await finished
+            yield line + "\n"
+
+
+def _predict_chunk(loop, model: DeployedModel, chunk, confidence: float, iou_threshold: float) -> List[Tuple[str, bool]]:
+    """Queue a chunk on the event loop's scheduler from a job thread and wait for its lines."""
+    futures = [
+        asyncio.run_coroutine_threadsafe(_predict_line(model, name, image, confidence, iou_threshold), loop)
+        for name, image in chunk
+    ]
+    return [future.result() for future in futures]
+
+
+def run_prediction_job(job_id: int, input_path: str, loop):
+    """Background task: predict every image of the job's input archive into its NDJSON result file.
+
+    Runs in a worker thread but submits images to the scheduler on ``loop``,
+    so job images are batched together with (and never run concurrently to)
+    interactive requests for the same model.
+    """
+    db = SessionLocal()
+    job = db.query(PredictionJob).filter(PredictionJob.id == job_id).first()
+
+    try:
+        job.status = TrainingStatus.RUNNING
+        job.started_at = datetime.now()
+        db.commit()
+
+        model = db.query(Model).filter(Model.id == job.model_id).first()
+        if model is None or not model.is_deployed or not model.file_path or not os.path.exists(model.file_path):
+            raise ValueError("Model is no longer deployed")
+        model = DeployedModel.from_model(model)
+
+        with zipfile.ZipFile(input_path) as archive, open(job.result_path, "w") as out:
+            names = archive.namelist()
+            for start in range(0, len(names), model.max_batch):
+                chunk = [
+                    # Drop the ordering prefix added by write_job_input
+                    (name.split("/", 1)[1], _decode(archive.read(name)))
+                    for name in names[start:start + model.max_batch]
+                ]
+                lines = _predict_chunk(loop, model, chunk, job.confidence, job.iou_threshold)
+                out.writelines(line + "\n" for line, _ in lines)
+                out.flush()
+
+                job.processed = (job.processed or 0) + len(lines)
+                job.failed = (job.failed or 0) + sum(1 for _, ok in lines if not ok)
+                db.commit()
+
+        job.status = TrainingStatus.COMPLETED
+
+    except Exception as e:
+        db.rollback()
+        job.status = TrainingStatus.FAILED
+        job.error_message = f"{str(e)}\n{traceback.format_exc()}"
+
+    finally:
+        job.completed_at = datetime.now()
+        db.commit()
+        db.close()
+        if os.path.exists(input_path):
+            os.remove(input_path)
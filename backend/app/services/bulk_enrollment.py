@@ -0,0 +1,227 @@
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.models import Person, EnrollmentJob, TrainingStatus
+from app.services.face_gallery import face_gallery, encoding_to_bytes, parse_sites
+from app.services.face_worker import map_face_pool, detect_and_encode
+from app.services.image_io import IMAGE_EXTENSIONS, save_upload
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
+from datetime import datetime
+from io import StringIO
+from typing import Dict, List, Optional
+import csv
+import os
+import traceback
+import zipfile
+
+MANIFEST_COLUMNS = ("name", "employee_id", "department", "photo", "sites")
+
+
+def parse_manifest(data: bytes) -> List[dict]:
+    """Read the enrollment CSV into row dicts keyed by ``MANIFEST_COLUMNS``.
+
+    Header names are case-insensitive; ``name`` and ``photo`` are required.
+    ``sites`` holds semicolon-separated locations.
+    Raises ``ValueError`` for unreadable or oversized manifests.
+    """
+    try:
+        text = data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise ValueError("Manifest must be UTF-8 encoded CSV")
+
+    reader = csv.DictReader(StringIO(text))
+    if reader.fieldnames is None:
+        raise ValueError("Manifest is empty")
+    headers = {name.strip().lower(): name for name in reader.fieldnames if name}
+    missing = [column for column in ("name", "photo") if column not in headers]
+    if missing:
+        raise ValueError(f"Manifest is missing columns: {', '.join(missing)}")
+
+    rows = []
+    for raw in reader:
+        row = {}
+        for column in MANIFEST_COLUMNS:
+            value = raw.get(headers[column]) if column in headers else None
+            row[column] = value.strip() if value and value.strip() else None
+        rows.append(row)
+        if len(rows) > settings.ENROLLMENT_MAX_ROWS:
+            raise ValueError(f"Manifest has more than {settings.ENROLLMENT_MAX_ROWS} rows")
+    return rows
+
+
+def _report_entry(row_number: int, row: dict, status: str, detail: Optional[str] = None, person_id=None) -> dict:
+    return {
+        "row": row_number,
+        "name": row["name"],
+        "employee_id": row["employee_id"],
+        "status": status,
+        "detail": detail,
+        "person_id": person_id
+    }
+
+
+def _validate_rows(db, rows: List[dict], report: List[Optional[dict]]) -> List[int]:
+    """Reject incomplete rows and duplicate employee ids; return the rows left to process."""
+    seen = {}
+    pending = []
+    for i, row in enumerate(rows):
+        if not row["name"] or not row["photo"]:
+            report[i] = _report_entry(i + 1, row, "error", "name and photo are required")
+        elif row["employee_id"] and row["employee_id"] in seen:
+            report[i] = _report_entry(i + 1, row, "error", f"Duplicate employee ID in manifest row {seen[row['employee_id']] + 1}")
+        else:
+            if row["employee_id"]:
+                seen[row["employee_id"]] = i
+            pending.append(i)
+
+    # One query for every employee id of the manifest
+    existing = {
+        employee_id for (employee_id,) in db.query(Person.employee_id).filter(Person.employee_id.in_(list(seen)))
+    } if seen else set()
+    for i in pending:
+        if rows[i]["employee_id"] in existing:
+            report[i] = _report_entry(i + 1, rows[i], "error", "Employee ID already exists")
+    return [i for i in pending if report[i] is None]
+
+
+def _archive_members(archive: zipfile.ZipFile) -> Dict[str, str]:
+    """Map both full paths and bare file names of archive images to their entries."""
+    members = {}
+    for info in archive.infolist():
+        if info.is_dir() or not info.filename.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        members.setdefault(os.path.basename(info.filename), info.filename)
+        members[info.filename] = info.filename
+    return members
+
+
+def _insert_persons(db, fields: List[dict]) -> List[object]:
+    """Insert a chunk of persons (``Person`` keyword arguments) in one transaction, falling back to one by one.
+
+    The fallback only happens when a concurrent registration took one of the
+    employee ids after validation. It builds new ``Person`` objects, so no
+    state from the failed flush is carried over. Returns the new id, or an
+    error message, per person.
+    """
+    persons = [Person(**person_fields) for person_fields in fields]
+    db.add_all(persons)
+    try:
+        db.flush()
+        ids = [person.id for person in persons]
+        db.commit()
+        return ids
+    except IntegrityError:
+        db.rollback()
+
+    results = []
+    for person_fields in fields:
+        person = Person(**person_fields)
+        db.add(person)
+        try:
+            db.flush()
+            person_id = person.id
+            db.commit()
+            results.append(person_id)
+        except IntegrityError:
+            db.rollback()
+            results.append("Employee ID already exists")
+    return results
+
+
+def _process_chunk(db, job_id: int, chunk: List[int], rows, archive, members, report):
+    contents = {}
+    for i in chunk:
+        member = members.get(rows[i]["photo"]) or members.get(os.path.basename(rows[i]["photo"]))
+        if member is None:
+            report[i] = _report_entry(i + 1, rows[i], "error", f"Photo {rows[i]['photo']} not found in archive")
+        else:
+            contents[i] = archive.read(member)
+
+    persons = []
+    person_rows = []
+    for i, output in sorted(map_face_pool(detect_and_encode, contents).items()):
+        if isinstance(output, Exception):
+            report[i] = _report_entry(i + 1, rows[i], "error", str(output))
+            continue
+        face_encodings = output[1]
+        if len(face_encodings) != 1:
+            detail = "No face detected in the image" if not face_encodings else "Multiple faces detected"
+            report[i] = _report_entry(i + 1, rows[i], "error", detail)
+            continue
+
+        ext = os.path.splitext(rows[i]["photo"])[1]
+        photo_path = save_upload(
+            contents[i], os.path.join(settings.UPLOAD_DIR, "faces"), f"person_bulk_{job_id}_{i + 1}{ext}"
+        )
+        persons.append(dict(
+            name=rows[i]["name"],
+            employee_id=rows[i]["employee_id"],
+            department=rows[i]["department"],
+            face_encoding=encoding_to_bytes(face_encodings[0]),
+            photo_path=photo_path,
+            is_active=True,
+            sites=parse_sites(rows[i]["sites"])
+        ))
+        person_rows.append(i)
+
+    if not persons:
+        return
+    photo_paths = [person["photo_path"] for person in persons]
+    created = []
+    for i, photo_path, result in zip(person_rows, photo_paths, _insert_persons(db, persons)):
+        if isinstance(result, str):
+            os.remove(photo_path)
+            report[i] = _report_entry(i + 1, rows[i], "error", result)
+        else:
+            created.append(result)
+            report[i] = _report_entry(i + 1, rows[i], "created", person_id=result)
+
+    if created:
+        face_gallery.upsert_many(
+            db.query(Person).options(selectinload(Person.face_templates)).filter(Person.id.in_(created)).all()
+        )
+
+
+def _update_progress(job: EnrollmentJob, report: List[Optional[dict]]):
+    """Copy finished rows into the job; rows rejected up front count as processed."""
+    done = [entry for entry in report if entry is not None]
+    job.processed = len(done)
+    job.succeeded = sum(1 for entry in done if entry["status"] == "created")
+    job.failed = job.processed - job.succeeded
+    job.report = done
+
+
+def run_enrollment_job(job_id: int, archive_path: str, rows: List[dict]):
+    """Background task: encode, validate and insert every manifest row, reporting progress."""
+    db = SessionLocal()
+    job = db.query(EnrollmentJob).filter(EnrollmentJob.id == job_id).first()
+    report: List[Optional[dict]] = [None] * len(rows)
+
+    try:
+        job.status = TrainingStatus.RUNNING
+        job.started_at = datetime.now()
+        db.commit()
+
+        pending = _validate_rows(db, rows, report)
+        with zipfile.ZipFile(archive_path) as archive:
+            members = _archive_members(archive)
+            for start in range(0, len(pending), settings.ENROLLMENT_BATCH_SIZE):
+                chunk = pending[start:start + settings.ENROLLMENT_BATCH_SIZE]
+                _process_chunk(db, job_id, chunk, rows, archive, members, report)
+                _update_progress(job, report)
+                db.commit()
+
+        job.status = TrainingStatus.COMPLETED
+
+    except Exception as e:
+        db.rollback()
+        job.status = TrainingStatus.FAILED
+        job.error_message = f"{str(e)}\n{traceback.format_exc()}"
+
+    finally:
+        _update_progress(job, report)
+        job.completed_at = datetime.now()
+        db.commit()
+        db.close()
+        if os.path.exists(archive_path):
+            os.remove(archive_path)
@@ -0,0 +1,322 @@
+from app.models.models import Person, FaceTemplate, PersonSite
+from app.core.config import settings
+from app.services import gallery_snapshot
+from app.services.face_search import build_index, needs_rebuild
+from contextlib import nullcontext
+from typing import List, NamedTuple, Optional
+import threading
+import numpy as np
+
+
+ENCODING_DTYPE = np.float32
+
+
+def encoding_to_bytes(face_encoding) -> bytes:
+    """Serialize a face encoding for the ``Person.face_encoding`` column."""
+    return np.asarray(face_encoding, dtype=ENCODING_DTYPE).tobytes()
+
+
+def encoding_from_bytes(data) -> np.ndarray:
+    """View a stored face encoding as a float32 array without copying."""
+    return np.frombuffer(data, dtype=ENCODING_DTYPE)
+
+
+SITE_SEPARATOR = "\n"
+
+
+def parse_sites(value: Optional[str]) -> List[str]:
+    """Split a comma- or semicolon-separated list of locations, dropping blanks and repeats."""
+    if not value:
+        return []
+    return sorted({site.strip() for site in value.replace(";", ",").split(",") if site.strip()})
+
+
+def sites_key(sites) -> str:
+    """Encode a person's sites as one string per gallery row; "" means every location."""
+    return SITE_SEPARATOR.join(sorted(sites))
+
+
+class FaceMatch(NamedTuple):
+    person_id: int
+    person_name: str
+    distance: float
+
+
+class FaceGallery:
+    """In-process index of active person face encodings.
+
+    Encodings are held in one contiguous float32 matrix alongside parallel
+    id and name arrays, one row per template: a person's registration
+    encoding plus any ``FaceTemplate`` rows, so ids repeat. The nearest row
+    of a query is the nearest template of the nearest person, so a single
+    search yields the per-person minimum distance over all templates.
+    Mutations build new arrays and swap them in under a lock, so readers can
+    match against a consistent snapshot without locking.
+    Nearest-neighbour lookups go through the search index configured by
+    ``FACE_SEARCH_BACKEND`` (see app.services.face_search).
+
+    With ``FACE_GALLERY_SNAPSHOT`` every change is published as a new version
+    of a memory-mapped snapshot (see app.services.gallery_snapshot). Other
+    worker processes switch to it on their next lookup, and a starting worker
+    maps the current version instead of reading every encoding from the
+    database.
+
+    A parallel sites array records the locations each row's person is
+    enrolled at. ``match`` with a ``location`` only searches that location's
+    partition: its persons plus those without sites. Partitions are built
+    on first use per snapshot by restricting the gallery's index to their
+    rows, and fall back to the whole gallery when
+    ``FACE_LOCATION_FALLBACK`` is set.
+    """
+
+    def __init__(self, dim: int = 128):
+        self.dim = dim
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._version = None  # Snapshot version currently mapped
+        encodings = np.empty((0, dim), dtype=ENCODING_DTYPE)
+        empty = np.empty(0, dtype=object)
+        self._set_arrays(encodings, np.empty(0, dtype=np.int64), empty, empty)
+
+    @staticmethod
+    def _index(encodings, index=None):
+        if index is None or needs_rebuild(index, len(encodings)):
+            index = build_index(encodings)
+        return index
+
+    def _set_arrays(self, encodings, ids, names, sites, index=None, norms=None):
+        # Squared norms are cached so matching is a single matrix product
+        if norms is None:
+            norms = np.einsum("ij,ij->i", encodings, encodings)
+        index = self._index(encodings, index)
+        # The partition cache lives in the snapshot, so it is replaced with it
+        self._snapshot = (encodings, norms, ids, names, index, sites, {})
+
+    def _publish(self, encodings, ids, names, sites, index=None, shared: bool = True):
+        """Install new arrays, first writing them as a new snapshot version when ``shared``.
+
+        The written version is mapped back, so the process keeps no private
+        copy. The search index is published with it, so other workers do not
+        retrain it. Call with the locks of ``_writing`` held.
+        """
+        norms = np.einsum("ij,ij->i", encodings, encodings)
+        index = self._index(encodings, index)
+        if shared and settings.FACE_GALLERY_SNAPSHOT:
+            self._version = gallery_snapshot.write(encodings, norms, ids, names, sites, index)
+            encodings, norms, ids, names, sites = gallery_snapshot.read(self._version)
+            index = gallery_snapshot.read_index(self._version) or index
+        self._set_arrays(encodings, ids, names, sites, index, norms)
+
+    def _writing(self):
+        return gallery_snapshot.writer_lock() if settings.FACE_GALLERY_SNAPSHOT else nullcontext()
+
+    def _sync(self) -> bool:
+        """Map the published snapshot if it is newer than ours; return whether one exists."""
+        if not settings.FACE_GALLERY_SNAPSHOT:
+            return False
+        version = gallery_snapshot.current_version()
+        if version is None:
+            return False
+        if version != self._version:
+            try:
+                encodings, norms, ids, names, sites = gallery_snapshot.read(version)
+                index = gallery_snapshot.read_index(version)
+            except OSError:
+                # Pruned meanwhile, or written in an older layout; rebuild instead
+                return False
+            self._set_arrays(encodings, ids, names, sites, index, norms)
+            self._version = version
+        return True
+
+    def __len__(self) -> int:
+        """Number of templates (rows), not persons."""
+        return len(self._snapshot[2])
+
+    @staticmethod
+    def _template_rows(db):
+        return db.query(
+            FaceTemplate.person_id.label("id"),
+            Person.name,
+            FaceTemplate.encoding.label("face_encoding")
+        ).join(
+            Person, Person.id == FaceTemplate.person_id
+        ).filter(
+            Person.is_active == True,
+            Person.face_encoding != None
+        )
+
+    @staticmethod
+    def _person_rows(db):
+        return db.query(Person.id, Person.name, Person.face_encoding).filter(
+            Person.is_active == True,
+            Person.face_encoding != None
+        )
+
+    def load(self, db):
+        """(Re)build the gallery from all active persons in the database."""
+        rows = self._person_rows(db).all() + self._template_rows(db).all()
+        person_sites = {}
+        for person_id, location in db.query(PersonSite.person_id, PersonSite.location):
+            person_sites.setdefault(person_id, []).append(location)
+
+        # Join the raw column bytes and view them as one (n, dim) matrix
+        encodings = encoding_from_bytes(b"".join(row.face_encoding for row in rows))
+        encodings = encodings.reshape(len(rows), self.dim)
+        ids = np.fromiter((row.id for row in rows), dtype=np.int64, count=len(rows))
+        names = np.empty(len(rows), dtype=object)
+        names[:] = [row.name for row in rows]
+        sites = np.empty(len(rows), dtype=object)
+        sites[:] = [sites_key(person_sites.get(row.id, ())) for row in rows]
+
+        with self._lock, self._writing():
+            self._publish(encodings, ids, names, sites)
+            self._loaded = True
+
+    def ensure_loaded(self, db):
+        """Load the gallery on first use; with snapshots, also follow newer published versions.
+
+        A snapshot is only adopted at startup when its row count agrees with
+        the database, so a snapshot left over from another database is rebuilt.
+        """
+        if not settings.FACE_GALLERY_SNAPSHOT:
+            if not self._loaded:
+                self.load(db)
+            return
+
+        version = gallery_snapshot.current_version()
+        if self._loaded and version == self._version:
+            return
+        with self._lock:
+            if self._sync() and (
+                self._loaded or len(self) == self._person_rows(db).count() + self._template_rows(db).count()
+            ):
+                self._loaded = True
+                return
+        self.load(db)
+
+    def upsert(self, person: Person):
+        """Add, replace or drop a person's rows to mirror its database rows and templates."""
+        self.upsert_many([person])
+
+    def upsert_many(self, persons: List[Person]):
+        """``upsert`` for many persons with a single array rebuild."""
+        person_ids = np.array([person.id for person in persons], dtype=np.int64)
+        rows, row_ids, row_names, row_sites = [], [], [], []
+        for person in persons:
+            if not person.is_active or not person.face_encoding:
+                continue
+            templates = [person.face_encoding] + [template.encoding for template in person.face_templates]
+            rows.extend(templates)
+            row_ids.extend([person.id] * len(templates))
+            row_names.extend([person.name] * len(templates))
+            row_sites.extend([sites_key(person.sites)] * len(templates))
+
+        encoding = encoding_from_bytes(b"".join(rows)).reshape(len(rows), self.dim)
+        with self._lock, self._writing():
+            # Apply the change on top of the latest version; before any version
+            # exists (gallery never loaded) the change stays local
+            shared = self._sync()
+            encodings, _, ids, names, index, sites, _ = self._snapshot
+            keep = ~np.isin(ids, person_ids)
+            if keep.all() and not rows:
+                return
+            self._publish(
+                np.concatenate([encodings[keep], encoding]),
+                np.append(ids[keep], np.array(row_ids, dtype=np.int64)),
+                np.append(names[keep], np.array(row_names, dtype=object)),
+                np.append(sites[keep], np.array(row_sites, dtype=object)),
+                index.subset(keep).extend(encoding),
+                shared
+            )
+
+    def remove(self, person_id: int):
+        """Drop a person's entry if present."""
+        with self._lock, self._writing():
+            shared = self._sync()
+            encodings, _, ids, names, index, sites, _ = self._snapshot
+            keep = ids != person_id
+            if keep.all():
+                return
+            self._publish(encodings[keep], ids[keep], names[keep], sites[keep], index.subset(keep), shared)
+
+    @staticmethod
+    def _partition(snapshot, location: str):
+        """The (encodings, norms, ids, names, index) rows searched at ``location``."""
+        encodings, norms, ids, names, index, sites, cache = snapshot
+        if "sites" not in cache:
+            cache["sites"] = {site for row in set(sites) if row for site in row.split(SITE_SEPARATOR)}
+            cache["views"] = {}
+        # Unknown locations share one partition of the persons without sites,
+        # so the cache is bounded by the number of enrolled sites
+        key = location if location in cache["sites"] else None
+        view = cache["views"].get(key)
+        if view is None:
+            mask = np.fromiter(
+                (not row or (key is not None and key in row.split(SITE_SEPARATOR)) for row in sites),
+                dtype=bool,
+                count=len(sites)
+            )
+            if mask.all():
+                view = (encodings, norms, ids, names, index)
+            else:
+                # The parent index restricted to the partition's rows, so nothing is retrained
+                subset = np.ascontiguousarray(encodings[mask])
+                view = (subset, norms[mask], ids[mask], names[mask], index.subset(mask))
+            cache["views"][key] = view
+        return view
+
+    @staticmethod
+    def _search(view, queries, tolerance: float) -> List[Optional[FaceMatch]]:
+        encodings, norms, ids, names, index = view
+        if len(ids) == 0:
+            return [None] * len(queries)
+
+        best, squared = index.search(encodings, norms, queries)
+        best_distances = np.sqrt(np.maximum(squared, 0.0))
+
+        matches = []
+        for row, distance in zip(best, best_distances):
+            if row >= 0 and distance < tolerance:
+                matches.append(FaceMatch(int(ids[row]), str(names[row]), float(distance)))
+            else:
+                matches.append(None)
+        return matches
+
+    def match(
+        self,
+        face_encodings,
+        tolerance: Optional[float] = None,
+        location: Optional[str] = None
+    ) -> List[Optional[FaceMatch]]:
+        """Match every face of a frame against the gallery in one batched computation.
+
+        Returns one entry per input encoding: the closest person when their
+        distance is below ``tolerance``, otherwise ``None``. With a
+        ``location``, only that location's partition is searched.
+        """
+        if tolerance is None:
+            tolerance = settings.FACE_MATCH_TOLERANCE
+
+        snapshot = self._snapshot
+        if len(face_encodings) == 0:
+            return []
+        queries = np.asarray(face_encodings, dtype=ENCODING_DTYPE).reshape(-1, self.dim)
+        location = location.strip() if location else None
+        if not location:
+            return self._search(snapshot[:5], queries, tolerance)
+
+        matches = self._search(self._partition(snapshot, location), queries, tolerance)
+        missed = [i for i, match in enumerate(matches) if match is None]
+        if missed and settings.FACE_LOCATION_FALLBACK:
+            for i, match in zip(missed, self._search(snapshot[:5], queries[missed], tolerance)):
+                matches[i] = match
+        return matches
+
+
+face_gallery = FaceGallery()
+
+
+def get_face_gallery(db) -> FaceGallery:
+    """Return the process-wide gallery, loading it on first use."""
+    face_gallery.ensure_loaded(db)
+    return face_gallery
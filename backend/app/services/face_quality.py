@@ -0,0 +1,80 @@
+from app.core.config import settings
+from typing import List, Optional
+import threading
+
+# Reason codes, in the order the checks run (cheapest first)
+TOO_SMALL = "too_small"
+TOO_DARK = "too_dark"
+TOO_BRIGHT = "too_bright"
+BLURRY = "blurry"
+
+QUALITY_MESSAGES = {
+    TOO_SMALL: "Face too small, please move closer to the camera",
+    TOO_DARK: "Face too dark, please improve the lighting",
+    TOO_BRIGHT: "Face overexposed, please avoid direct light",
+    BLURRY: "Face too blurry, please hold still",
+}
+
+# Crops are resized to this side before measuring sharpness, so the score
+# does not depend on how large the face is in the frame
+CROP_SIZE = 96
+
+
+def assess_faces(image, face_locations) -> List[Optional[str]]:
+    """Return a rejection reason code per face box, or ``None`` for usable faces.
+
+    Runs in pool workers before encoding: box size, then mean brightness,
+    then Laplacian variance (blur) of the grayscale face crop.
+    """
+    import cv2
+
+    reasons = []
+    for top, right, bottom, left in face_locations:
+        if min(bottom - top, right - left) < settings.FACE_MIN_SIZE:
+            reasons.append(TOO_SMALL)
+            continue
+
+        crop = cv2.cvtColor(image[top:bottom, left:right], cv2.COLOR_RGB2GRAY)
+        brightness = float(crop.mean())
+        if brightness < settings.FACE_MIN_BRIGHTNESS:
+            reasons.append(TOO_DARK)
+            continue
+        if brightness > settings.FACE_MAX_BRIGHTNESS:
+            reasons.append(TOO_BRIGHT)
+            continue
+
+        crop = cv2.resize(crop, (CROP_SIZE, CROP_SIZE), interpolation=cv2.INTER_AREA)
+        if cv2.Laplacian(crop, cv2.CV_64F).var() < settings.FACE_MIN_SHARPNESS:
+            reasons.append(BLURRY)
+            continue
+
+        reasons.append(None)
+    return reasons
+
+
+class FaceQualityStats:
+    """Faces checked by the pre-filter and rejections per reason, for tuning thresholds."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checked = 0
+        self.rejected = dict.fromkeys(QUALITY_MESSAGES, 0)
+
+    def record(self, reasons: List[Optional[str]]):
+        with self._lock:
+            self.checked += len(reasons)
+            for reason in reasons:
+                if reason is not None:
+                    self.rejected[reason] += 1
+
+    def stats(self) -> dict:
+        rejected = sum(self.rejected.values())
+        return {
+            "checked": self.checked,
+            "passed": self.checked - rejected,
+            "rejected": dict(self.rejected),
+            "rejected_ratio": rejected / self.checked if self.checked else 0.0
+        }
+
+
+face_quality_stats = FaceQualityStats()
@@ -0,0 +1,138 @@
+from app.core.config import settings
+from typing import Optional, Tuple
+import numpy as np
+
+
+def _squared_distances(queries, norms_q, encodings, norms):
+    # ||q - g||^2 = ||q||^2 + ||g||^2 - 2 q.g for every (query, row) pair
+    return norms_q[:, None] + norms[None, :] - 2.0 * (queries @ encodings.T)
+
+
+def _row_norms(matrix):
+    return np.einsum("ij,ij->i", matrix, matrix)
+
+
+class ExactIndex:
+    """Brute-force search: every query is compared with every gallery row."""
+
+    name = "exact"
+
+    def subset(self, keep) -> "ExactIndex":
+        return self
+
+    def extend(self, encodings) -> "ExactIndex":
+        return self
+
+    def search(self, encodings, norms, queries) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the nearest row and its squared distance for every query."""
+        squared = _squared_distances(queries, _row_norms(queries), encodings, norms)
+        best = np.argmin(squared, axis=1)
+        return best, squared[np.arange(len(queries)), best]
+
+
+class IVFIndex:
+    """Inverted-file approximate search.
+
+    Gallery rows are partitioned by a k-means coarse quantizer. A query is
+    only compared with the rows of its ``n_probe`` closest partitions, so
+    latency scales with ``n_probe / n_lists`` of the gallery. Raising
+    ``n_probe`` trades latency for recall; ``n_probe == n_lists`` is exact.
+    """
+
+    name = "ivf"
+
+    def __init__(self, centroids, assignments, n_probe: int, trained_size: int):
+        self.centroids = centroids
+        self.centroid_norms = _row_norms(centroids)
+        self.assignments = assignments
+        self.n_probe = min(n_probe, len(centroids))
+        self.trained_size = trained_size
+        # Rows grouped by partition: rows of list l are order[offsets[l]:offsets[l + 1]]
+        self.order = np.argsort(assignments, kind="stable")
+        self.offsets = np.searchsorted(assignments[self.order], np.arange(len(centroids) + 1))
+
+    @classmethod
+    def train(cls, encodings, n_lists: int, n_probe: int, iterations: int = 10, seed: int = 0) -> "IVFIndex":
+        """Fit the coarse quantizer with k-means on a sample of the gallery."""
+        rng = np.random.default_rng(seed)
+        n_lists = max(1, min(n_lists, len(encodings)))
+        sample_size = min(len(encodings), n_lists * 64)
+        sample = encodings[rng.choice(len(encodings), sample_size, replace=False)]
+        centroids = sample[rng.choice(sample_size, n_lists, replace=False)].copy()
+
+        for _ in range(iterations):
+            labels = cls._nearest_centroid(centroids, sample)
+            counts = np.bincount(labels, minlength=n_lists)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            filled = counts > 0
+            # Empty partitions keep their previous centroid
+            centroids[filled] = sums[filled] / counts[filled, None]
+
+        assignments = cls._nearest_centroid(centroids, encodings)
+        return cls(centroids, assignments, n_probe, len(encodings))
+
+    @staticmethod
+    def _nearest_centroid(centroids, encodings, chunk_size: int = 8192):
+        norms = _row_norms(centroids)
+        labels = np.empty(len(encodings), dtype=np.int32)
+        for start in range(0, len(encodings), chunk_size):
+            chunk = encodings[start:start + chunk_size]
+            squared = _squared_distances(chunk, _row_norms(chunk), centroids, norms)
+            labels[start:start + chunk_size] = np.argmin(squared, axis=1)
+        return labels
+
+    def subset(self, keep) -> "IVFIndex":
+        return IVFIndex(self.centroids, self.assignments[keep], self.n_probe, self.trained_size)
+
+    def extend(self, encodings) -> "IVFIndex":
+        labels = self._nearest_centroid(self.centroids, encodings)
+        return IVFIndex(
+            self.centroids,
+            np.concatenate([self.assignments, labels]),
+            self.n_probe,
+            self.trained_size
+        )
+
+    def search(self, encodings, norms, queries) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the nearest probed row (or -1) and its squared distance for every query."""
+        norms_q = _row_norms(queries)
+        to_centroids = _squared_distances(queries, norms_q, self.centroids, self.centroid_norms)
+        probes = np.argpartition(to_centroids, self.n_probe - 1, axis=1)[:, :self.n_probe]
+
+        best = np.full(len(queries), -1, dtype=np.int64)
+        best_squared = np.full(len(queries), np.inf, dtype=np.float32)
+        for i, lists in enumerate(probes):
+            rows = np.concatenate([
+                self.order[self.offsets[l]:self.offsets[l + 1]] for l in lists
+            ])
+            if len(rows) == 0:
+                continue
+            squared = _squared_distances(queries[i:i + 1], norms_q[i:i + 1], encodings[rows], norms[rows])[0]
+            nearest = np.argmin(squared)
+            best[i] = rows[nearest]
+            best_squared[i] = squared[nearest]
+        return best, best_squared
+
+
+def build_index(encodings, backend: Optional[str] = None):
+    """Build the configured search index for a gallery matrix.
+
+    The IVF backend falls back to exact search for galleries smaller than
+    ``FACE_IVF_MIN_GALLERY``, where brute force is already fast.
+    """
+    backend = backend or settings.FACE_SEARCH_BACKEND
+    if backend == ExactIndex.name or len(encodings) < settings.FACE_IVF_MIN_GALLERY:
+        return ExactIndex()
+    if backend == IVFIndex.name:
+        n_lists = settings.FACE_IVF_LISTS or int(np.sqrt(len(encodings)))
+        return IVFIndex.train(encodings, n_lists, settings.FACE_IVF_PROBES)
+    raise ValueError(f"Unknown face search backend: {backend}")
+
+
+def needs_rebuild(index, size: int, backend: Optional[str] = None) -> bool:
+    """Whether incremental updates have drifted far enough to retrain the index."""
+    backend = backend or settings.FACE_SEARCH_BACKEND
+    if isinstance(index, IVFIndex):
+        return backend != IVFIndex.name or size > 2 * index.trained_size
+    return backend == IVFIndex.name and size >= settings.FACE_IVF_MIN_GALLERY
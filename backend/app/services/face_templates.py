@@ -0,0 +1,82 @@
+from app.core.config import settings
+from app.models.models import Person, FaceTemplate
+from app.services.face_gallery import face_gallery, encoding_to_bytes, FaceMatch
+from sqlalchemy.orm import Session, selectinload
+from typing import List, Optional, Tuple
+import os
+
+SOURCE_ENROLLMENT = "enrollment"
+SOURCE_CHECK_IN = "check_in"
+
+
+def remove_template_photo(template: FaceTemplate):
+    if template.photo_path and os.path.exists(template.photo_path):
+        os.remove(template.photo_path)
+
+
+def add_template(
+    person: Person,
+    encoding: bytes,
+    source: str = SOURCE_ENROLLMENT,
+    photo_path: Optional[str] = None
+) -> Tuple[Optional[FaceTemplate], Optional[FaceTemplate]]:
+    """Attach a template to ``person`` within ``FACE_TEMPLATES_MAX``; returns (template, evicted).
+
+    At the cap, the oldest template learned from a check-in is evicted to make
+    room. Enrolled templates are never evicted automatically, so the template
+    is ``None`` when all of them are enrolled. Does not commit: remove the
+    evicted template's photo only once the change is committed.
+    """
+    evicted = None
+    if len(person.face_templates) >= settings.FACE_TEMPLATES_MAX:
+        learned = [t for t in person.face_templates if t.source == SOURCE_CHECK_IN]
+        if not learned:
+            return None, None
+        evicted = min(learned, key=lambda t: t.id)
+        person.face_templates.remove(evicted)
+
+    template = FaceTemplate(encoding=encoding, source=source, photo_path=photo_path)
+    person.face_templates.append(template)
+    return template, evicted
+
+
+def learn_templates(db: Session, candidates: List[Tuple[FaceMatch, object]]):
+    """Keep confident check-in encodings as extra templates (runs in the threadpool).
+
+    ``candidates`` holds (match, encoding) pairs. Only matches between
+    ``FACE_AUTO_TEMPLATE_MIN_DISTANCE`` and ``FACE_AUTO_TEMPLATE_MAX_DISTANCE``
+    are kept: close enough to be trusted, far enough from every existing
+    template to add a new appearance.
+    """
+    if not settings.FACE_AUTO_TEMPLATES or settings.FACE_TEMPLATES_MAX <= 0:
+        return
+
+    candidates = [
+        (match, encoding) for match, encoding in candidates
+        if settings.FACE_AUTO_TEMPLATE_MIN_DISTANCE <= match.distance <= settings.FACE_AUTO_TEMPLATE_MAX_DISTANCE
+    ]
+    if not candidates:
+        return
+
+    persons = {
+        p.id: p for p in db.query(Person).options(selectinload(Person.face_templates)).filter(
+            Person.id.in_([match.person_id for match, _ in candidates])
+        )
+    }
+    changed = {}
+    evicted = []
+    for match, encoding in candidates:
+        person = persons.get(match.person_id)
+        if person is not None and person.is_active:
+            template, replaced = add_template(person, encoding_to_bytes(encoding), SOURCE_CHECK_IN)
+            if template is not None:
+                changed[person.id] = person
+            if replaced is not None:
+                evicted.append(replaced)
+
+    if changed:
+        db.commit()
+        for template in evicted:
+            remove_template_photo(template)
+        # One gallery rebuild (and snapshot version) for the whole batch
+        face_gallery.upsert_many(list(changed.values()))
@@ -0,0 +1,112 @@
+from app.services.face_gallery import FaceMatch
+from typing import List, Optional, Tuple
+import time
+
+
+def box_iou(a, b) -> float:
+    """Intersection over union of two (top, right, bottom, left) boxes."""
+    top, bottom = max(a[0], b[0]), min(a[2], b[2])
+    left, right = max(a[3], b[3]), min(a[1], b[1])
+    intersection = max(0, bottom - top) * max(0, right - left)
+    if intersection == 0:
+        return 0.0
+    area_a = (a[2] - a[0]) * (a[1] - a[3])
+    area_b = (b[2] - b[0]) * (b[1] - b[3])
+    return intersection / float(area_a + area_b - intersection)
+
+
+def _centroid_distance(a, b) -> float:
+    """Centroid distance of two boxes relative to the size of ``a``."""
+    dy = (a[0] + a[2]) / 2.0 - (b[0] + b[2]) / 2.0
+    dx = (a[1] + a[3]) / 2.0 - (b[1] + b[3]) / 2.0
+    size = max(a[2] - a[0], a[1] - a[3], 1)
+    return (dx * dx + dy * dy) ** 0.5 / size
+
+
+class Track:
+    def __init__(self, track_id: int, box):
+        self.id = track_id
+        self.box = box
+        self.missed = 0
+        self.match: Optional[FaceMatch] = None
+        self.matched_at: Optional[float] = None
+
+
+class FaceTracker:
+    """Associates face boxes across the frames of one stream.
+
+    Detections are matched to existing tracks greedily by IoU, falling back to
+    centroid distance for fast movement. A track only needs encoding and
+    gallery matching when it is new or its identity is older than
+    ``identity_ttl`` seconds; otherwise its previous identity is reused.
+    """
+
+    def __init__(
+        self,
+        iou_threshold: float = 0.3,
+        max_centroid_distance: float = 0.5,
+        max_missed: int = 5,
+        identity_ttl: float = 2.0
+    ):
+        self.iou_threshold = iou_threshold
+        self.max_centroid_distance = max_centroid_distance
+        self.max_missed = max_missed
+        self.identity_ttl = identity_ttl
+        self.tracks: List[Track] = []
+        self._next_id = 1
+
+    def update(self, face_locations) -> Tuple[List[Track], List[int]]:
+        """Assign this frame's boxes to tracks.
+
+        Returns the track for each box and the indexes of the boxes that
+        need encoding and matching.
+        """
+        pairs = []
+        for i, box in enumerate(face_locations):
+            for track in self.tracks:
+                iou = box_iou(track.box, box)
+                if iou >= self.iou_threshold:
+                    pairs.append((iou, i, track))
+                elif _centroid_distance(track.box, box) <= self.max_centroid_distance:
+                    # Ranked below every IoU match
+                    pairs.append((-_centroid_distance(track.box, box), i, track))
+        pairs.sort(key=lambda pair: pair[0], reverse=True)
+
+        assigned = {}
+        used = set()
+        for _, i, track in pairs:
+            if i in assigned or track.id in used:
+                continue
+            assigned[i] = track
+            used.add(track.id)
+
+        for track in self.tracks:
+            track.missed = 0 if track.id in used else track.missed + 1
+        self.tracks = [track for track in self.tracks if track.missed <= self.max_missed]
+
+        frame_tracks = []
+        for i, box in enumerate(face_locations):
+            track = assigned.get(i)
+            if track is None:
+                track = Track(self._next_id, box)
+                self._next_id += 1
+                self.tracks.append(track)
+            track.box = box
+            frame_tracks.append(track)
+
+        now = time.monotonic()
+        stale = [
+            i for i, track in enumerate(frame_tracks)
+            if track.matched_at is None or now - track.matched_at > self.identity_ttl
+        ]
+        return frame_tracks, stale
+
+    def set_identity(self, track: Track, match: Optional[FaceMatch]):
+        track.match = match
+        track.matched_at = time.monotonic()
+
+    def get(self, track_id: int) -> Optional[Track]:
+        for track in self.tracks:
+            if track.id == track_id:
+                return track
+        return None
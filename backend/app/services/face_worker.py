@@ -0,0 +1,263 @@
+from app.core.config import settings
+from app.services.face_quality import assess_faces
+from app.services.image_io import decode_image
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from fastapi import HTTPException
+import asyncio
+import multiprocessing
+import threading
+import time
+from typing import Dict
+
+_pool = None
+_pool_lock = threading.Lock()
+_in_flight = 0  # Tasks submitted to the pool and not yet finished, from requests and background jobs
+_in_flight_lock = threading.Lock()
+
+
+def locate_faces(image):
+    """Run the face detector on a downscaled copy of ``image``.
+
+    Detection runs at ``FACE_DETECTION_SCALE`` of the original resolution with
+    the configured detector model and upsampling; the boxes are mapped back to
+    original-image (top, right, bottom, left) coordinates.
+    """
+    import cv2
+    import face_recognition
+
+    scale = settings.FACE_DETECTION_SCALE
+    small = image
+    if scale < 1.0:
+        small = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+    face_locations = face_recognition.face_locations(
+        small,
+        number_of_times_to_upsample=settings.FACE_DETECTION_UPSAMPLE,
+        model=settings.FACE_DETECTION_MODEL
+    )
+    if small is image:
+        return face_locations
+
+    height, width = image.shape[:2]
+    return [
+        (
+            max(0, int(round(top / scale))),
+            min(width, int(round(right / scale))),
+            min(height, int(round(bottom / scale))),
+            max(0, int(round(left / scale)))
+        )
+        for top, right, bottom, left in face_locations
+    ]
+
+
+def detect_and_encode(image_data: bytes):
+    """Locate and encode every face in an uploaded image (runs in a pool worker).
+
+    The encoded upload bytes are sent to the worker rather than the decoded
+    pixels, which keeps the inter-process payload small. Encodings are always
+    computed on the full-resolution image. Returns the face locations, their
+    encodings and the time spent in each stage.
+    """
+    import face_recognition
+
+    timings = {}
+    start = time.perf_counter()
+    image = decode_image(image_data)
+    timings["decode"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    face_locations = locate_faces(image)
+    timings["detect"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    face_encodings = face_recognition.face_encodings(
+        image,
+        face_locations,
+        num_jitters=settings.FACE_ENCODING_JITTERS,
+        model=settings.FACE_ENCODING_MODEL
+    )
+    timings["encode"] = time.perf_counter() - start
+    return face_locations, face_encodings, timings
+
+
+def detect_and_encode_checked(image_data: bytes):
+    """``detect_and_encode`` with the quality pre-filter of check-in paths (runs in a pool worker).
+
+    Faces rejected by ``assess_faces`` are not encoded: their encoding is
+    ``None`` and their reason code is set. Returns the face locations, the
+    encodings, the reasons (``None`` when usable) and the stage timings.
+    """
+    import face_recognition
+
+    timings = {}
+    start = time.perf_counter()
+    image = decode_image(image_data)
+    timings["decode"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    face_locations = locate_faces(image)
+    timings["detect"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if settings.FACE_QUALITY_FILTER:
+        reasons = assess_faces(image, face_locations)
+    else:
+        reasons = [None] * len(face_locations)
+    timings["quality"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    usable = [location for location, reason in zip(face_locations, reasons) if reason is None]
+    encodings = iter(face_recognition.face_encodings(
+        image,
+        usable,
+        num_jitters=settings.FACE_ENCODING_JITTERS,
+        model=settings.FACE_ENCODING_MODEL
+    ) if usable else [])
+    face_encodings = [next(encodings) if reason is None else None for reason in reasons]
+    timings["encode"] = time.perf_counter() - start
+    return face_locations, face_encodings, reasons, timings
+
+
+def detect_only(image_data: bytes):
+    """Locate faces without encoding them, for tracked streams (runs in a pool worker)."""
+    timings = {}
+    start = time.perf_counter()
+    image = decode_image(image_data)
+    timings["decode"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    face_locations = locate_faces(image)
+    timings["detect"] = time.perf_counter() - start
+    return face_locations, timings
+
+
+def encode_only(image_data: bytes, face_locations):
+    """Encode the given face boxes of an uploaded image (runs in a pool worker)."""
+    import face_recognition
+
+    image = decode_image(image_data)
+    return face_recognition.face_encodings(
+        image,
+        face_locations,
+        num_jitters=settings.FACE_ENCODING_JITTERS,
+        model=settings.FACE_ENCODING_MODEL
+    )
+
+
+def get_face_pool() -> ProcessPoolExecutor:
+    """Return the process pool used for dlib work, starting it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn, not fork: the API process is multi-threaded by the time we get here
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.FACE_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pool
+
+
+def _discard_face_pool(pool: ProcessPoolExecutor):
+    """Forget a broken pool so the next task starts a new one.
+
+    A worker killed by a crash in dlib or by the OOM killer breaks the whole
+    executor; every later submit would fail until it is replaced.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _track(delta: int):
+    global _in_flight
+    with _in_flight_lock:
+        _in_flight += delta
+
+
+def shutdown_face_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+async def run_face_task(fn, *args):
+    """Run CPU-heavy face work in the process pool without blocking the event loop.
+
+    Requests beyond ``FACE_QUEUE_LIMIT`` tasks in flight are rejected with a
+    503 instead of queueing unboundedly behind the workers. When a worker
+    dies the pool is replaced and the task retried once; a second failure
+    is a 503.
+    """
+    if _in_flight >= settings.FACE_QUEUE_LIMIT:
+        raise HTTPException(status_code=503, detail="Face processing queue is full, please retry")
+
+    _track(1)
+    try:
+        loop = asyncio.get_running_loop()
+        for attempt in range(2):
+            pool = get_face_pool()
+            try:
+                return await loop.run_in_executor(pool, fn, *args)
+            except BrokenProcessPool:
+                _discard_face_pool(pool)
+        raise HTTPException(status_code=503, detail="Face processing worker crashed, please retry")
+    finally:
+        _track(-1)
+
+
+def map_face_pool(fn, items: Dict[object, bytes]) -> Dict[object, object]:
+    """Apply ``fn`` to every value in the pool from a background thread.
+
+    At most one task per worker is in flight, which leaves room in the pool
+    queue for kiosk requests arriving during a long job. Tasks lost to a
+    dead worker are retried once on a new pool. Returns results by key, with
+    failures as the raised exception.
+    """
+    results = {}
+    queue = list(items.items())
+    retried = set()
+    running = {}  # future -> (key, value, pool it runs on)
+    while queue or running:
+        pool = get_face_pool()
+        try:
+            while queue and len(running) < settings.FACE_WORKERS:
+                key, value = queue[0]
+                running[pool.submit(fn, value)] = (key, value, pool)
+                queue.pop(0)
+                _track(1)
+        except (BrokenProcessPool, RuntimeError):
+            # Broken, or shut down by another thread that found it broken
+            _discard_face_pool(pool)
+            continue
+
+        done, _ = wait(running, return_when=FIRST_COMPLETED)
+        for future in done:
+            key, value, future_pool = running.pop(future)
+            _track(-1)
+            try:
+                results[key] = future.result()
+            except BrokenProcessPool as e:
+                _discard_face_pool(future_pool)
+                if key in retried:
+                    results[key] = e
+                else:
+                    retried.add(key)
+                    queue.append((key, value))
+            except Exception as e:
+                results[key] = e
+    return results
+
+
+def face_pool_stats() -> dict:
+    """Current pool size and queue depth."""
+    return {
+        "workers": settings.FACE_WORKERS,
+        "in_flight": _in_flight,
+        "queued": max(0, _in_flight - settings.FACE_WORKERS),
+        "queue_limit": settings.FACE_QUEUE_LIMIT
+    }
@@ -0,0 +1,78 @@
+from app.core.config import settings
+from collections import OrderedDict
+from io import BytesIO
+from PIL import Image
+import threading
+import time
+import numpy as np
+
+SIGNATURE_SIZE = (32, 24)
+
+
+def frame_signature(data: bytes) -> np.ndarray:
+    """Tiny grayscale thumbnail used to tell whether a kiosk's scene changed.
+
+    JPEG frames are decoded in draft mode, which scales during DCT decoding
+    and is much cheaper than a full decode.
+    """
+    try:
+        image = Image.open(BytesIO(data))
+        image.draft("L", (SIGNATURE_SIZE[0] * 4, SIGNATURE_SIZE[1] * 4))
+        image = image.convert("L").resize(SIGNATURE_SIZE, Image.BILINEAR)
+    except OSError:
+        # Unidentified or truncated image data
+        raise ValueError("Invalid image file")
+    return np.asarray(image, dtype=np.float32)
+
+
+class FrameGate:
+    """Per-kiosk duplicate-frame gate for polled detection.
+
+    Keeps the signature and result of the last processed frame of each kiosk,
+    keyed by ``(kiosk, location)`` since a result is only valid for the
+    location partition it was matched against. The kiosk is the client's
+    ``kiosk_id``, or its address when it sends none.
+    A new frame whose mean absolute pixel difference from it is below
+    ``FRAME_GATE_THRESHOLD`` gets the cached result instead of a dlib pass.
+    Cached results expire after ``FRAME_GATE_MAX_AGE`` seconds so gallery
+    changes still show up on an idle kiosk.
+    """
+
+    def __init__(self, max_kiosks: int = 1024):
+        self.max_kiosks = max_kiosks
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.gated = 0
+        self.processed = 0
+
+    def lookup(self, key, signature: np.ndarray):
+        """Return the cached result for an unchanged scene, or ``None``."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                previous, result, stored_at = entry
+                fresh = time.monotonic() - stored_at < settings.FRAME_GATE_MAX_AGE
+                if fresh and np.mean(np.abs(signature - previous)) < settings.FRAME_GATE_THRESHOLD:
+                    self.gated += 1
+                    return result
+            self.processed += 1
+            return None
+
+    def store(self, key, signature: np.ndarray, result):
+        with self._lock:
+            self._entries[key] = (signature, result, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_kiosks:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        total = self.gated + self.processed
+        return {
+            "kiosks": len(self._entries),
+            "gated": self.gated,
+            "processed": self.processed,
+            "gated_ratio": self.gated / total if total else 0.0
+        }
+
+
+frame_gate = FrameGate()
@@ -0,0 +1,237 @@
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.models import Person, FaceTemplate, ReencodeJob, FaceEncodingStage, FaceTemplateStage, TrainingStatus
+from app.services.face_gallery import face_gallery, encoding_to_bytes
+from app.services.face_worker import map_face_pool, detect_and_encode
+from sqlalchemy import and_, delete, insert, or_, select, update
+from datetime import datetime, timedelta
+import os
+import time
+import traceback
+
+
+def encoding_parameters() -> dict:
+    """The settings that determine encodings, recorded on each job."""
+    return {
+        "num_jitters": settings.FACE_ENCODING_JITTERS,
+        "model": settings.FACE_ENCODING_MODEL,
+        "detection_model": settings.FACE_DETECTION_MODEL,
+        "detection_upsample": settings.FACE_DETECTION_UPSAMPLE,
+        "detection_scale": settings.FACE_DETECTION_SCALE,
+    }
+
+
+def job_total(db) -> int:
+    """Persons with a photo plus templates, the items a job goes through."""
+    return db.query(Person).filter(Person.photo_path != None).count() + db.query(FaceTemplate).count()
+
+
+def _stale_before() -> datetime:
+    return datetime.now() - timedelta(seconds=settings.REENCODE_STALE_AFTER)
+
+
+def job_active():
+    """Filter for jobs some worker holds or is about to start: pending or running with a recent heartbeat."""
+    return and_(
+        ReencodeJob.status.in_([TrainingStatus.PENDING, TrainingStatus.RUNNING]),
+        ReencodeJob.heartbeat_at > _stale_before()
+    )
+
+
+def _claim(db, job_id: int) -> bool:
+    """Mark the job running in the database; ``False`` when another worker holds it.
+
+    The conditional UPDATE is atomic, so of several workers starting the same
+    job only one claims it. A running job whose heartbeat went stale was
+    interrupted and can be claimed again.
+    """
+    claimed = db.execute(
+        update(ReencodeJob)
+        .where(
+            ReencodeJob.id == job_id,
+            or_(
+                ReencodeJob.status.in_([TrainingStatus.PENDING, TrainingStatus.FAILED]),
+                and_(
+                    ReencodeJob.status == TrainingStatus.RUNNING,
+                    or_(ReencodeJob.heartbeat_at == None, ReencodeJob.heartbeat_at <= _stale_before())
+                )
+            )
+        )
+        .values(status=TrainingStatus.RUNNING, heartbeat_at=datetime.now())
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return claimed == 1
+
+
+def _read_photos(rows, failures, failure) -> dict:
+    contents = {}
+    for row in rows:
+        try:
+            with open(row.photo_path, "rb") as f:
+                contents[row.id] = f.read()
+        except OSError as e:
+            failures.append({**failure(row), "detail": f"Cannot read photo: {e.strerror}"})
+    return contents
+
+
+def _encode(rows, failures, failure) -> dict:
+    """Encode the photo of every row in the pool; returns {row id: encoding bytes} for single-face photos."""
+    by_id = {row.id: row for row in rows}
+    encoded = {}
+    for row_id, output in map_face_pool(detect_and_encode, _read_photos(rows, failures, failure)).items():
+        if isinstance(output, Exception):
+            failures.append({**failure(by_id[row_id]), "detail": str(output)})
+        elif len(output[1]) != 1:
+            detail = "No face detected in the image" if not output[1] else "Multiple faces detected"
+            failures.append({**failure(by_id[row_id]), "detail": detail})
+        else:
+            encoded[row_id] = encoding_to_bytes(output[1][0])
+    return encoded
+
+
+def _stage_persons(db, job: ReencodeJob, persons, failures):
+    """Encode one chunk of persons and bulk-insert the results into the stage table."""
+    encoded = _encode(persons, failures, lambda person: {"person_id": person.id})
+    if encoded:
+        db.execute(insert(FaceEncodingStage), [
+            {"job_id": job.id, "person_id": person_id, "encoding": encoding}
+            for person_id, encoding in encoded.items()
+        ])
+
+
+def _stage_templates(db, job: ReencodeJob, templates, failures):
+    """Encode one chunk of templates; those without a usable photo are staged for removal."""
+    encoded = _encode(
+        [template for template in templates if template.photo_path],
+        failures,
+        lambda template: {"person_id": template.person_id, "template_id": template.id}
+    )
+    db.execute(insert(FaceTemplateStage), [
+        {"job_id": job.id, "template_id": template.id, "encoding": encoded.get(template.id)}
+        for template in templates
+    ])
+
+
+def _apply_stage(db, job: ReencodeJob):
+    """Copy every staged encoding onto its person or template, in one transaction.
+
+    Templates staged without an encoding are deleted along with their photos.
+    """
+    staged = select(FaceEncodingStage.person_id).where(FaceEncodingStage.job_id == job.id)
+    encoding = select(FaceEncodingStage.encoding).where(
+        FaceEncodingStage.job_id == job.id,
+        FaceEncodingStage.person_id == Person.id
+    ).scalar_subquery()
+    db.execute(
+        update(Person).where(Person.id.in_(staged)).values(face_encoding=encoding)
+        .execution_options(synchronize_session=False)
+    )
+
+    staged_templates = select(FaceTemplateStage.template_id).where(
+        FaceTemplateStage.job_id == job.id,
+        FaceTemplateStage.encoding != None
+    )
+    template_encoding = select(FaceTemplateStage.encoding).where(
+        FaceTemplateStage.job_id == job.id,
+        FaceTemplateStage.template_id == FaceTemplate.id
+    ).scalar_subquery()
+    db.execute(
+        update(FaceTemplate).where(FaceTemplate.id.in_(staged_templates)).values(encoding=template_encoding)
+        .execution_options(synchronize_session=False)
+    )
+    removed = FaceTemplate.id.in_(
+        select(FaceTemplateStage.template_id).where(
+            FaceTemplateStage.job_id == job.id,
+            FaceTemplateStage.encoding == None
+        )
+    )
+    removed_photos = [path for path, in db.query(FaceTemplate.photo_path).filter(removed, FaceTemplate.photo_path != None)]
+    db.execute(delete(FaceTemplate).where(removed).execution_options(synchronize_session=False))
+
+    db.execute(delete(FaceEncodingStage).where(FaceEncodingStage.job_id == job.id))
+    db.execute(delete(FaceTemplateStage).where(FaceTemplateStage.job_id == job.id))
+    db.commit()
+    for path in removed_photos:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def run_reencode_job(job_id: int):
+    """Background task: re-encode all persons with a photo, then all templates, resuming where it stopped.
+
+    The job is claimed in the database first, so with several workers only
+    one runs it. Each chunk's staged encodings and the advanced resume point
+    are committed together, so an interrupted job continues where it stopped.
+    Persons, templates and the live gallery only switch to the new encodings
+    once every chunk is done; templates without a photo to re-encode from
+    are removed then.
+    """
+    db = SessionLocal()
+    if not _claim(db, job_id):
+        db.close()
+        return
+    job = db.query(ReencodeJob).filter(ReencodeJob.id == job_id).first()
+
+    try:
+        job.started_at = job.started_at or datetime.now()
+        job.completed_at = None
+        job.error_message = None
+        job.total = job_total(db)
+        db.commit()
+
+        run_start = time.monotonic()
+        run_processed = 0
+
+        def progress(chunk: int, failures):
+            nonlocal run_processed
+            run_processed += chunk
+            job.processed = (job.processed or 0) + chunk
+            job.failures = failures
+            job.failed = len(failures)
+            job.throughput = run_processed / max(time.monotonic() - run_start, 1e-6)
+            job.eta_seconds = max(job.total - job.processed, 0) / job.throughput
+            job.heartbeat_at = datetime.now()
+            db.commit()
+
+        while True:
+            persons = db.query(Person.id, Person.photo_path).filter(
+                Person.id > job.last_person_id,
+                Person.photo_path != None
+            ).order_by(Person.id).limit(settings.REENCODE_BATCH_SIZE).all()
+            if not persons:
+                break
+
+            failures = list(job.failures or [])
+            _stage_persons(db, job, persons, failures)
+            job.last_person_id = persons[-1].id
+            progress(len(persons), failures)
+
+        while True:
+            templates = db.query(FaceTemplate.id, FaceTemplate.person_id, FaceTemplate.photo_path).filter(
+                FaceTemplate.id > (job.last_template_id or 0)
+            ).order_by(FaceTemplate.id).limit(settings.REENCODE_BATCH_SIZE).all()
+            if not templates:
+                break
+
+            failures = list(job.failures or [])
+            _stage_templates(db, job, templates, failures)
+            job.last_template_id = templates[-1].id
+            progress(len(templates), failures)
+
+        _apply_stage(db, job)
+        # Build the new gallery arrays, then swap them in under the gallery lock
+        face_gallery.load(db)
+
+        job.status = TrainingStatus.COMPLETED
+        job.eta_seconds = 0.0
+        job.completed_at = datetime.now()
+
+    except Exception as e:
+        db.rollback()
+        job.status = TrainingStatus.FAILED
+        job.error_message = f"{str(e)}\n{traceback.format_exc()}"
+
+    finally:
+        db.commit()
+        db.close()
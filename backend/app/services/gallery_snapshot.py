@@ -0,0 +1,127 @@
+from app.core.config import settings
+from app.services.face_search import IVFIndex
+from contextlib import contextmanager
+from typing import Optional, Tuple
+import fcntl
+import json
+import os
+import shutil
+import time
+import numpy as np
+
+# Each gallery version is a directory of .npy files (encodings, squared norms,
+# ids, names and sites, plus the IVF centroids and list assignments when the
+# search index is IVF) under UPLOAD_DIR/gallery. CURRENT names the latest version
+# and is replaced atomically. Workers map the arrays read-only, so the page
+# cache holds one copy of the gallery per host however many workers there are.
+CURRENT_FILE = "CURRENT"
+LOCK_FILE = ".lock"
+IVF_FILE = "ivf.json"
+# Older versions kept on disk; workers that still map them keep working
+# either way, since unlinked files stay mapped until released
+KEEP_VERSIONS = 2
+
+_pointer = (None, None)  # (stat key of CURRENT, version it names)
+
+
+def snapshot_dir() -> str:
+    return os.path.join(settings.UPLOAD_DIR, "gallery")
+
+
+def _version_dir(version: int) -> str:
+    return os.path.join(snapshot_dir(), f"v{version:010d}")
+
+
+@contextmanager
+def writer_lock():
+    """Serialize snapshot writers across processes with an advisory file lock."""
+    os.makedirs(snapshot_dir(), exist_ok=True)
+    with open(os.path.join(snapshot_dir(), LOCK_FILE), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def current_version() -> Optional[int]:
+    """The published version, re-read only when ``CURRENT`` was replaced (one stat call)."""
+    global _pointer
+    path = os.path.join(snapshot_dir(), CURRENT_FILE)
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    key = (st.st_ino, st.st_mtime_ns)
+    if _pointer[0] != key:
+        with open(path) as f:
+            _pointer = (key, json.load(f)["version"])
+    return _pointer[1]
+
+
+def read(version: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Map a version read-only as (encodings, norms, ids, names, sites)."""
+    directory = _version_dir(version)
+    return tuple(
+        np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+        for name in ("encodings", "norms", "ids", "names", "sites")
+    )
+
+
+def read_index(version: int) -> Optional[IVFIndex]:
+    """The IVF index published with a version, or ``None`` when it was written without one."""
+    directory = _version_dir(version)
+    try:
+        with open(os.path.join(directory, IVF_FILE)) as f:
+            params = json.load(f)
+    except FileNotFoundError:
+        if not os.path.isdir(directory):
+            raise
+        return None
+    return IVFIndex(
+        np.load(os.path.join(directory, "ivf_centroids.npy"), mmap_mode="r"),
+        np.load(os.path.join(directory, "ivf_assignments.npy"), mmap_mode="r"),
+        params["n_probe"],
+        params["trained_size"]
+    )
+
+
+def write(encodings, norms, ids, names, sites, index=None) -> int:
+    """Publish the arrays as a new version and return it. Call under ``writer_lock``.
+
+    An IVF ``index`` is saved with them, so workers switching to the version
+    reuse its quantizer instead of retraining it. Files are written to a temporary directory that is renamed into place
+    before ``CURRENT`` is switched, so readers never see a partial version.
+    """
+    version = (current_version() or 0) + 1
+    directory = _version_dir(version)
+    staging = f"{directory}.tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    np.save(os.path.join(staging, "encodings.npy"), np.ascontiguousarray(encodings))
+    np.save(os.path.join(staging, "norms.npy"), np.ascontiguousarray(norms))
+    np.save(os.path.join(staging, "ids.npy"), np.ascontiguousarray(ids))
+    np.save(os.path.join(staging, "names.npy"), np.asarray(names).astype(str))
+    np.save(os.path.join(staging, "sites.npy"), np.asarray(sites).astype(str))
+    if isinstance(index, IVFIndex):
+        np.save(os.path.join(staging, "ivf_centroids.npy"), np.ascontiguousarray(index.centroids))
+        np.save(os.path.join(staging, "ivf_assignments.npy"), np.ascontiguousarray(index.assignments))
+        with open(os.path.join(staging, IVF_FILE), "w") as f:
+            json.dump({"n_probe": index.n_probe, "trained_size": index.trained_size}, f)
+    # Left over when a writer died before switching CURRENT
+    shutil.rmtree(directory, ignore_errors=True)
+    os.rename(staging, directory)
+
+    pointer = os.path.join(snapshot_dir(), f"{CURRENT_FILE}.tmp")
+    with open(pointer, "w") as f:
+        json.dump({"version": version, "rows": len(ids), "created_at": time.time()}, f)
+    os.replace(pointer, os.path.join(snapshot_dir(), CURRENT_FILE))
+
+    _prune(version)
+    return version
+
+
+def _prune(version: int):
+    for entry in os.listdir(snapshot_dir()):
+        if entry.startswith("v") and entry[1:].isdigit() and int(entry[1:]) <= version - KEEP_VERSIONS:
+            shutil.rmtree(os.path.join(snapshot_dir(), entry), ignore_errors=True)
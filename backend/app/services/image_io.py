@@ -0,0 +1,73 @@
+from PIL import Image, ImageOps, UnidentifiedImageError
+from io import BytesIO
+from typing import List, Tuple
+import numpy as np
+import os
+import zipfile
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+
+def load_image(data: bytes) -> Image.Image:
+    """Decode uploaded image bytes into an upright RGB PIL image.
+
+    EXIF orientation is applied so phone photos are not processed sideways.
+    Raises ``ValueError`` for unreadable or truncated images.
+    """
+    try:
+        image = Image.open(BytesIO(data))
+        # Image.open only reads the header; decode now so truncated data fails here
+        image.load()
+        image = ImageOps.exif_transpose(image)
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+    except OSError:
+        raise ValueError("Invalid image file")
+    return image
+
+
+def image_extension(data: bytes, default: str = ".jpg") -> str:
+    """File extension for the format of encoded image bytes, read from the header only."""
+    try:
+        image_format = Image.open(BytesIO(data)).format
+    except UnidentifiedImageError:
+        return default
+    if not image_format:
+        return default
+    return ".jpg" if image_format == "JPEG" else f".{image_format.lower()}"
+
+
+def decode_image(data: bytes) -> np.ndarray:
+    """Decode uploaded image bytes straight into an RGB ``uint8`` array."""
+    return np.asarray(load_image(data))
+
+
+def read_image_archive(data: bytes, max_images: int) -> List[Tuple[str, bytes]]:
+    """Extract the images of a zip archive as (filename, bytes) pairs.
+
+    Directories, hidden files and non-image entries are skipped. Raises
+    ``ValueError`` for invalid archives or more than ``max_images`` images.
+    """
+    try:
+        archive = zipfile.ZipFile(BytesIO(data))
+    except zipfile.BadZipFile:
+        raise ValueError("Invalid zip archive")
+
+    names = [
+        info.filename for info in archive.infolist()
+        if not info.is_dir()
+        and not os.path.basename(info.filename).startswith(".")
+        and info.filename.lower().endswith(IMAGE_EXTENSIONS)
+    ]
+    if len(names) > max_images:
+        raise ValueError(f"Archive contains more than {max_images} images")
+    return [(name, archive.read(name)) for name in names]
+
+
+def save_upload(data: bytes, directory: str, filename: str) -> str:
+    """Persist uploaded bytes under ``directory`` and return the file path."""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, filename)
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
@@ -0,0 +1,145 @@
+from app.core.config import settings
+from app.services.model_registry import model_registry
+from collections import deque
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+from typing import Dict, Optional, Tuple
+import asyncio
+import time
+
+
+def batch_limits(model) -> Tuple[int, float]:
+    """A model's micro-batching limits as (max images, max wait in seconds)."""
+    max_batch = model.max_batch_size or settings.INFERENCE_MAX_BATCH_SIZE
+    wait_ms = model.max_batch_wait_ms if model.max_batch_wait_ms is not None else settings.INFERENCE_MAX_BATCH_WAIT_MS
+    return max_batch, wait_ms / 1000.0
+
+
+class _Request:
+    __slots__ = ("image", "params", "future", "enqueued_at")
+
+    def __init__(self, image, params, future, enqueued_at):
+        self.image = image
+        self.params = params  # (file_path, conf, iou): requests batch only with equal params
+        self.future = future
+        self.enqueued_at = enqueued_at
+
+
+class _ModelQueue:
+    def __init__(self):
+        self.items = deque()
+        self.wakeup = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+
+class InferenceScheduler:
+    """Dynamic micro-batching of inference requests, one queue per model.
+
+    A request waits at most ``max_wait`` seconds for others with the same
+    checkpoint, confidence and IoU threshold; up to ``max_batch`` of them run
+    in a single ``predict`` call in the threadpool and every waiting request
+    gets its own result back. Batches of one model run one after another, so
+    a loaded model is never used by two threads at once. A queue's drain
+    task only lives while it has requests.
+    """
+
+    def __init__(self):
+        self._queues: Dict[int, _ModelQueue] = {}
+        self.requests = 0
+        self.batches = 0
+        self.images = 0
+        self.rejected = 0
+        self.batch_time = 0.0
+
+    async def predict(
+        self,
+        model_id: int,
+        file_path: str,
+        image,
+        conf: float,
+        iou: float,
+        max_batch: int,
+        max_wait: float
+    ):
+        """Queue one image and return its Ultralytics result and the batch's forward time."""
+        queue = self._queues.setdefault(model_id, _ModelQueue())
+        if len(queue.items) >= settings.INFERENCE_QUEUE_LIMIT:
+            self.rejected += 1
+            raise HTTPException(status_code=503, detail="Inference queue is full, please retry")
+
+        loop = asyncio.get_running_loop()
+        request = _Request(image, (file_path, conf, iou), loop.create_future(), loop.time())
+        queue.items.append(request)
+        queue.wakeup.set()
+        self.requests += 1
+        if queue.task is None or queue.task.done():
+            queue.task = loop.create_task(self._drain(model_id, queue, max(max_batch, 1), max_wait))
+        return await request.future
+
+    def _take_batch(self, queue: _ModelQueue, params, max_batch: int):
+        batch, rest = [], deque()
+        while queue.items:
+            request = queue.items.popleft()
+            if request.params == params and len(batch) < max_batch:
+                batch.append(request)
+            else:
+                rest.append(request)
+        queue.items = rest
+        return batch
+
+    async def _drain(self, model_id: int, queue: _ModelQueue, max_batch: int, max_wait: float):
+        loop = asyncio.get_running_loop()
+        while queue.items:
+            head = queue.items[0]
+            deadline = head.enqueued_at + max_wait
+            # Wait for the batch to fill up or the oldest request's deadline
+            while sum(1 for r in queue.items if r.params == head.params) < max_batch:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                queue.wakeup.clear()
+                try:
+                    await asyncio.wait_for(queue.wakeup.wait(), remaining)
+                except asyncio.TimeoutError:
+                    break
+
+            batch = self._take_batch(queue, head.params, max_batch)
+            batch = [request for request in batch if not request.future.cancelled()]
+            if not batch:
+                continue
+            file_path, conf, iou = head.params
+            try:
+                results, elapsed = await run_in_threadpool(
+                    self._run_batch, model_id, file_path, [request.image for request in batch], conf, iou
+                )
+            except Exception as e:
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+                continue
+            for request, result in zip(batch, results):
+                if not request.future.done():
+                    request.future.set_result((result, elapsed))
+
+    def _run_batch(self, model_id: int, file_path: str, images, conf: float, iou: float):
+        yolo_model = model_registry.get(model_id, file_path)
+        start = time.perf_counter()
+        results = yolo_model.predict(source=images, conf=conf, iou=iou, verbose=False)
+        elapsed = time.perf_counter() - start
+        self.batches += 1
+        self.images += len(images)
+        self.batch_time += elapsed
+        return results, elapsed
+
+    def stats(self) -> dict:
+        return {
+            "queued": sum(len(queue.items) for queue in self._queues.values()),
+            "requests": self.requests,
+            "rejected": self.rejected,
+            "batches": self.batches,
+            "avg_batch_size": self.images / self.batches if self.batches else 0.0,
+            "avg_batch_time": self.batch_time / self.batches if self.batches else 0.0
+        }
+
+
+inference_scheduler = InferenceScheduler()
@@ -0,0 +1,81 @@
+from app.db.session import SessionLocal
+from app.models.models import Model
+from app.services.model_registry import model_registry
+from typing import Optional, Tuple
+from ultralytics import YOLO
+import os
+import shutil
+import traceback
+
+PYTORCH = "pytorch"
+# CPU runtimes a deployed model can be exported to, as Ultralytics export formats
+RUNTIMES = ("onnx", "openvino")
+
+
+def _artifact_ready(model: Model) -> bool:
+    # An artifact older than the checkpoint was exported from a previous upload
+    return bool(
+        model.runtime_path
+        and os.path.exists(model.runtime_path)
+        and model.file_path
+        and os.path.exists(model.file_path)
+        and os.stat(model.runtime_path).st_mtime_ns >= os.stat(model.file_path).st_mtime_ns
+    )
+
+
+def serving_checkpoint(model: Model) -> Tuple[str, str]:
+    """The path inference loads for a model and its backend name.
+
+    The exported runtime artifact when it is present and current, otherwise
+    the PyTorch checkpoint.
+    """
+    if model.runtime and _artifact_ready(model):
+        return model.runtime_path, model.runtime
+    return model.file_path, PYTORCH
+
+
+def needs_export(model: Model) -> bool:
+    return bool(model.runtime) and not _artifact_ready(model)
+
+
+def remove_artifact(path: Optional[str]):
+    if not path or not os.path.exists(path):
+        return
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        os.remove(path)
+
+
+def export_model(model_id: int, file_path: str, runtime: str):
+    """Background task: export a deployed checkpoint to ``runtime`` next to it.
+
+    Inference keeps serving the PyTorch checkpoint until the export finishes;
+    a failed export is recorded in ``runtime_error`` and inference stays on
+    PyTorch.
+    """
+    try:
+        # Dynamic input shapes so micro-batches of any size fit the graph
+        artifact = YOLO(file_path).export(format=runtime, dynamic=True)
+        error = None
+    except Exception as e:
+        artifact = None
+        error = f"{str(e)}\n{traceback.format_exc()}"
+
+    db = SessionLocal()
+    try:
+        model = db.query(Model).filter(Model.id == model_id).first()
+        # The model was deleted, re-uploaded or redeployed with another runtime meanwhile
+        if model is None or model.file_path != file_path or model.runtime != runtime:
+            if artifact and (model is None or artifact != model.runtime_path):
+                remove_artifact(str(artifact))
+            return
+        if artifact:
+            if model.runtime_path and model.runtime_path != str(artifact):
+                remove_artifact(model.runtime_path)
+            model.runtime_path = str(artifact)
+        model.runtime_error = error
+        db.commit()
+    finally:
+        db.close()
+    model_registry.invalidate(model_id)
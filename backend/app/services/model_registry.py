@@ -0,0 +1,114 @@
+from app.core.config import settings
+from collections import OrderedDict
+from ultralytics import YOLO
+import os
+import threading
+import time
+
+
+def _disk_size(path: str, st: os.stat_result) -> int:
+    # OpenVINO exports are directories of graph and weight files
+    if not os.path.isdir(path):
+        return st.st_size
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(path)
+        for name in names
+    )
+
+
+class ModelRegistry:
+    """Process-wide LRU of loaded YOLO models for the inference endpoints.
+
+    Entries are keyed by ``(model_id, file_path, mtime)``, so a checkpoint
+    replaced on disk is loaded afresh even without an explicit invalidation.
+    The cache holds at most ``MODEL_CACHE_SIZE`` models and, when
+    ``MODEL_CACHE_MAX_BYTES`` is set, at most that many bytes of checkpoint
+    files, evicting the least recently used model first. Loads of the same
+    key are serialized so concurrent requests wait for one load instead of
+    each deserializing the checkpoint.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._models = OrderedDict()  # key -> (model, size in bytes)
+        self._loading = {}  # key -> lock held while the key is loaded
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.load_time = 0.0
+
+    def get(self, model_id: int, file_path: str) -> YOLO:
+        """Return the loaded model for a checkpoint or exported runtime, loading it on a miss."""
+        st = os.stat(file_path)
+        key = (model_id, file_path, st.st_mtime_ns)
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is not None:
+                self._models.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            loading = self._loading.setdefault(key, threading.Lock())
+
+        with loading:
+            with self._lock:
+                entry = self._models.get(key)
+                if entry is not None:
+                    self._models.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                self.misses += 1
+
+            start = time.perf_counter()
+            try:
+                model = YOLO(file_path)
+            except Exception:
+                with self._lock:
+                    self._loading.pop(key, None)
+                raise
+            elapsed = time.perf_counter() - start
+
+            with self._lock:
+                self.load_time += elapsed
+                # Older checkpoints of the same model are never requested again
+                for stale in [k for k in self._models if k[0] == model_id]:
+                    del self._models[stale]
+                self._models[key] = (model, _disk_size(file_path, st))
+                self._evict()
+                self._loading.pop(key, None)
+            return model
+
+    def _evict(self):
+        # The newest entry is kept even when it alone exceeds the byte budget
+        while len(self._models) > 1 and (
+            len(self._models) > settings.MODEL_CACHE_SIZE
+            or (settings.MODEL_CACHE_MAX_BYTES and self._size() > settings.MODEL_CACHE_MAX_BYTES)
+        ):
+            self._models.popitem(last=False)
+            self.evictions += 1
+
+    def _size(self) -> int:
+        return sum(size for _, size in self._models.values())
+
+    def invalidate(self, model_id: int):
+        """Drop every cached checkpoint of a model."""
+        with self._lock:
+            for key in [k for k in self._models if k[0] == model_id]:
+                del self._models[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "models": len(self._models),
+                "bytes": self._size(),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / total if total else 0.0,
+                "evictions": self.evictions,
+                "load_time": self.load_time,
+                "avg_load_time": self.load_time / self.misses if self.misses else 0.0
+            }
+
+
+model_registry = ModelRegistry()
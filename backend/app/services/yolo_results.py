@@ -0,0 +1,93 @@
+from app.schemas.schemas import PredictionResult, BoundingBox
+from typing import List, Optional, Tuple
+import json
+import numpy as np
+
+# format -> media type of a prediction response; "columnar" and "msgpack" hold parallel arrays
+RESULT_FORMATS = {
+    "json": "application/json",
+    "columnar": "application/json",
+    "msgpack": "application/x-msgpack",
+}
+
+
+def class_name(class_names: Optional[List[str]], class_id: int) -> str:
+    return class_names[class_id] if class_names and class_id < len(class_names) else f"class_{class_id}"
+
+
+def host_arrays(result) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """A result's boxes as host arrays ``(xyxy (N, 4), class ids (N,), scores (N,))``.
+
+    Each tensor is copied off the device once as a whole instead of per box.
+    """
+    if result is None or result.boxes is None or len(result.boxes) == 0:
+        return np.zeros((0, 4), dtype=np.float32), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+    boxes = result.boxes
+    xyxy = np.asarray(boxes.xyxy.cpu().numpy(), dtype=np.float32).reshape(-1, 4)
+    class_ids = np.asarray(boxes.cls.cpu().numpy()).astype(np.int64)
+    scores = np.asarray(boxes.conf.cpu().numpy(), dtype=np.float32)
+    return xyxy, class_ids, scores
+
+
+def prediction_result(
+    image_path: str,
+    result,
+    inference_time: float,
+    class_names: Optional[List[str]],
+    backend: str = "pytorch"
+) -> PredictionResult:
+    """Convert one Ultralytics result into the API's ``PredictionResult``."""
+    xyxy, class_ids, scores = host_arrays(result)
+    # Plain Python values in one pass. The boxes are already valid, so validation is
+    # skipped; callers serialize the result directly rather than through a response_model
+    predictions = [
+        BoundingBox.model_construct(
+            class_id=class_id,
+            class_name=class_name(class_names, class_id),
+            confidence=conf,
+            x_min=box[0],
+            y_min=box[1],
+            x_max=box[2],
+            y_max=box[3]
+        )
+        for box, class_id, conf in zip(xyxy.tolist(), class_ids.tolist(), scores.tolist())
+    ]
+
+    return PredictionResult.model_construct(
+        image_path=image_path,
+        predictions=predictions,
+        inference_time=inference_time,
+        backend=backend
+    )
+
+
+def columnar_result(
+    image_path: str,
+    result,
+    inference_time: float,
+    class_names: Optional[List[str]],
+    backend: str = "pytorch"
+) -> dict:
+    """One result as parallel arrays (``PredictionColumns``), without per-box objects.
+
+    ``boxes`` is a flat ``[x_min, y_min, x_max, y_max, ...]`` list and
+    ``classes`` names only the class ids present in the result.
+    """
+    xyxy, class_ids, scores = host_arrays(result)
+    return {
+        "image_path": image_path,
+        "boxes": xyxy.ravel().tolist(),
+        "class_ids": class_ids.tolist(),
+        "confidences": scores.tolist(),
+        "classes": {str(i): class_name(class_names, i) for i in np.unique(class_ids).tolist()},
+        "inference_time": inference_time,
+        "backend": backend
+    }
+
+
+def encode_columnar(columns: dict, format: str) -> bytes:
+    """Serialize a ``columnar_result`` as JSON or msgpack."""
+    if format == "msgpack":
+        import msgpack
+        return msgpack.packb(columns, use_bin_type=True)
+    return json.dumps(columns, separators=(",", ":")).encode()
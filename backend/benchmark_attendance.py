@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Open-record lookup and check-in toggle benchmark for attendance_records.
+
+Fills a scratch copy of the attendance table (attendance_benchmark, dropped
+afterwards unless --keep) with synthetic history, then times the per-scan
+open-record lookup and the check-out toggle without indexes, and again with
+the composite and partial indexes from migration 0002. Intended for the
+production database engine with tens of millions of rows:
+
+    python benchmark_attendance.py --rows 20000000 --persons 50000
+"""
+
+import argparse
+import sys
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import (
+    create_engine, MetaData, Table, Column, Integer, DateTime, Index, select, update, insert, text
+)
+
+from app.core.config import settings
+
+metadata = MetaData()
+records = Table(
+    "attendance_benchmark",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("person_id", Integer),
+    Column("check_in_time", DateTime(timezone=True)),
+    Column("check_out_time", DateTime(timezone=True)),
+)
+INDEXES = [
+    Index("ix_attendance_benchmark_person_check_in", records.c.person_id, records.c.check_in_time),
+    Index(
+        "ix_attendance_benchmark_open",
+        records.c.person_id,
+        records.c.check_in_time,
+        postgresql_where=records.c.check_out_time.is_(None),
+        sqlite_where=records.c.check_out_time.is_(None)
+    ),
+]
+# Declared for create/drop only; keep them out of the initial create_all
+for index in INDEXES:
+    records.indexes.discard(index)
+
+
+def populate(engine, rows, persons, days, batch_size=50000):
+    """Insert ``rows`` closed records spread over ``days`` days of history."""
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as conn:
+            conn.execute(text(
+                "INSERT INTO attendance_benchmark (person_id, check_in_time, check_out_time) "
+                "SELECT 1 + (random() * (:persons - 1))::int, t, t + interval '8 hours' "
+                "FROM (SELECT now() - interval '1 day' - random() * (:days * interval '1 day') AS t "
+                "      FROM generate_series(1, :rows)) s"
+            ), {"persons": persons, "days": days, "rows": rows})
+        return
+
+    rng = random.Random(0)
+    start = datetime.now() - timedelta(days=1)
+    with engine.begin() as conn:
+        for offset in range(0, rows, batch_size):
+            batch = []
+            for _ in range(min(batch_size, rows - offset)):
+                check_in = start - timedelta(seconds=rng.random() * days * 86400)
+                batch.append({
+                    "person_id": rng.randint(1, persons),
+                    "check_in_time": check_in,
+                    "check_out_time": check_in + timedelta(hours=8),
+                })
+            conn.execute(insert(records), batch)
+
+
+def open_today(engine, person_ids):
+    """Check in ``person_ids`` today so the toggle has open records to close."""
+    now = datetime.now()
+    with engine.begin() as conn:
+        conn.execute(insert(records), [{"person_id": p, "check_in_time": now} for p in person_ids])
+
+
+def time_lookup(engine, person_ids, today_start):
+    """Mean milliseconds for the open-record lookup done on every scan."""
+    with engine.connect() as conn:
+        start = time.perf_counter()
+        for person_id in person_ids:
+            conn.execute(
+                select(records.c.id).where(
+                    records.c.person_id == person_id,
+                    records.c.check_in_time >= today_start,
+                    records.c.check_out_time == None
+                ).limit(1)
+            ).first()
+        return (time.perf_counter() - start) * 1000 / len(person_ids)
+
+
+def time_toggle(engine, person_ids, today_start):
+    """Mean milliseconds for the single-statement check-out (rolled back)."""
+    with engine.connect() as conn:
+        trans = conn.begin()
+        start = time.perf_counter()
+        for person_id in person_ids:
+            conn.execute(
+                update(records)
+                .where(
+                    records.c.person_id == person_id,
+                    records.c.check_in_time >= today_start,
+                    records.c.check_out_time == None
+                )
+                .values(check_out_time=datetime.now())
+                .returning(records.c.id)
+            ).all()
+        elapsed = time.perf_counter() - start
+        trans.rollback()
+        return elapsed * 1000 / len(person_ids)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=settings.DATABASE_URL)
+    parser.add_argument("--rows", type=int, default=10000000)
+    parser.add_argument("--persons", type=int, default=20000)
+    parser.add_argument("--days", type=int, default=730, help="Days of history to spread rows over")
+    parser.add_argument("--lookups", type=int, default=1000)
+    parser.add_argument("--keep", action="store_true", help="Keep the benchmark table afterwards")
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    records.drop(engine, checkfirst=True)
+    records.create(engine)
+
+    print("=" * 72)
+    print(f"Attendance benchmark: {args.rows} rows, {args.persons} persons, {engine.dialect.name}")
+    print("=" * 72)
+
+    try:
+        start = time.perf_counter()
+        populate(engine, args.rows, args.persons, args.days)
+        print(f"Populate: {time.perf_counter() - start:.1f}s")
+
+        rng = random.Random(1)
+        person_ids = [rng.randint(1, args.persons) for _ in range(args.lookups)]
+        open_today(engine, person_ids[::2])
+        today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        if engine.dialect.name == "postgresql":
+            with engine.begin() as conn:
+                conn.execute(text("ANALYZE attendance_benchmark"))
+
+        print(f"\n{'indexes':<10}{'lookup ms':>14}{'toggle ms':>14}")
+        lookup_ms = time_lookup(engine, person_ids, today_start)
+        toggle_ms = time_toggle(engine, person_ids, today_start)
+        print(f"{'none':<10}{lookup_ms:>14.3f}{toggle_ms:>14.3f}")
+
+        start = time.perf_counter()
+        for index in INDEXES:
+            index.create(engine)
+        build_s = time.perf_counter() - start
+        if engine.dialect.name == "postgresql":
+            with engine.begin() as conn:
+                conn.execute(text("ANALYZE attendance_benchmark"))
+
+        lookup_ms = time_lookup(engine, person_ids, today_start)
+        toggle_ms = time_toggle(engine, person_ids, today_start)
+        print(f"{'0002':<10}{lookup_ms:>14.3f}{toggle_ms:>14.3f}")
+        print(f"\nIndex build: {build_s:.1f}s")
+    finally:
+        if not args.keep:
+            records.drop(engine)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
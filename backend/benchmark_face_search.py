@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Recall vs latency report for the face search backends.
+
+Compares the approximate IVF index against exact brute-force search over the
+same gallery, for a range of FACE_IVF_PROBES values, so the setting can be
+chosen with known recall. Uses a synthetic gallery by default, or the live
+persons table with --from-db.
+
+    python benchmark_face_search.py --gallery-size 200000 --probes 1 4 8 16 32
+"""
+
+import argparse
+import sys
+import os
+import time
+
+import numpy as np
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.core.config import settings
+from app.services.face_search import ExactIndex, IVFIndex
+
+
+def synthetic_gallery(size, dim, rng):
+    """Random identities with roughly the spread of dlib face encodings."""
+    return rng.normal(0.0, 0.09, size=(size, dim)).astype(np.float32)
+
+
+def database_gallery():
+    """Load active encodings from the configured database."""
+    from app.db.session import SessionLocal
+    from app.models.models import Person
+    from app.services.face_gallery import encoding_from_bytes
+
+    rows = SessionLocal().query(Person.face_encoding).filter(
+        Person.is_active == True,
+        Person.face_encoding != None
+    ).all()
+    return encoding_from_bytes(b"".join(row.face_encoding for row in rows)).reshape(len(rows), 128)
+
+
+def make_queries(gallery, count, rng):
+    """Half genuine (noisy copies of gallery rows), half unknown faces.
+
+    Returns the queries and a mask of which ones are genuine.
+    """
+    genuine = gallery[rng.choice(len(gallery), count - count // 2)]
+    genuine = genuine + rng.normal(0.0, 0.03, size=genuine.shape).astype(np.float32)
+    impostors = synthetic_gallery(count // 2, gallery.shape[1], rng)
+    is_genuine = np.arange(count) < len(genuine)
+    return np.concatenate([genuine, impostors]).astype(np.float32), is_genuine
+
+
+def timed_search(index, gallery, norms, queries, batch_size):
+    best = np.empty(len(queries), dtype=np.int64)
+    squared = np.empty(len(queries), dtype=np.float32)
+    start = time.perf_counter()
+    for i in range(0, len(queries), batch_size):
+        best[i:i + batch_size], squared[i:i + batch_size] = index.search(
+            gallery, norms, queries[i:i + batch_size]
+        )
+    elapsed = time.perf_counter() - start
+    return best, np.sqrt(np.maximum(squared, 0.0)), elapsed * 1000 / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--gallery-size", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=1, help="Faces matched per call (faces per frame)")
+    parser.add_argument("--lists", type=int, default=0, help="IVF partitions, 0 = sqrt(gallery size)")
+    parser.add_argument("--probes", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--tolerance", type=float, default=settings.FACE_MATCH_TOLERANCE)
+    parser.add_argument("--from-db", action="store_true", help="Use the persons table instead of synthetic data")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    gallery = database_gallery() if args.from_db else synthetic_gallery(args.gallery_size, 128, rng)
+    if len(gallery) == 0:
+        print("Gallery is empty")
+        return 1
+    norms = np.einsum("ij,ij->i", gallery, gallery)
+    queries, is_genuine = make_queries(gallery, args.queries, rng)
+    n_lists = args.lists or int(np.sqrt(len(gallery)))
+
+    print("=" * 72)
+    print(f"Face search benchmark: {len(gallery)} gallery rows, {len(queries)} queries, {n_lists} IVF lists")
+    print("=" * 72)
+
+    exact_best, exact_distances, exact_ms = timed_search(ExactIndex(), gallery, norms, queries, args.batch_size)
+    exact_matched = exact_distances < args.tolerance
+
+    start = time.perf_counter()
+    ivf = IVFIndex.train(gallery, n_lists, n_probe=1, iterations=10, seed=args.seed)
+    print(f"IVF training: {time.perf_counter() - start:.2f}s\n")
+
+    print(f"{'backend':<10}{'probes':>8}{'recall@1':>12}{'match agree':>14}{'ms/query':>12}{'speedup':>10}")
+    print(f"{'exact':<10}{'-':>8}{1.0:>12.4f}{1.0:>14.4f}{exact_ms:>12.3f}{1.0:>10.1f}")
+
+    for n_probe in args.probes:
+        ivf.n_probe = min(n_probe, n_lists)
+        best, distances, ms = timed_search(ivf, gallery, norms, queries, args.batch_size)
+        # recall@1: genuine queries that find the same nearest row as exact search
+        recall = np.mean(best[is_genuine] == exact_best[is_genuine])
+        # match agreement: same accept/reject decision and same person when accepted
+        matched = (best >= 0) & (distances < args.tolerance)
+        agree = np.mean((matched == exact_matched) & (~exact_matched | (best == exact_best)))
+        print(f"{'ivf':<10}{ivf.n_probe:>8}{recall:>12.4f}{agree:>14.4f}{ms:>12.3f}{exact_ms / ms:>10.1f}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+import os
+import tempfile
+
+# Point the app at a throwaway SQLite database and storage before it is imported
+_root = tempfile.mkdtemp(prefix="yolo-checkin-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_root, 'test.db')}"
+os.environ["UPLOAD_DIR"] = os.path.join(_root, "uploads")
+os.environ["MODEL_DIR"] = os.path.join(_root, "models")
+os.environ["DATASET_DIR"] = os.path.join(_root, "datasets")
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.core.config import settings
+from app.db.session import SessionLocal, engine
+from app.models.models import Base, User
+
+
+@pytest.fixture
+def upload_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path / "uploads"))
+    os.makedirs(settings.UPLOAD_DIR)
+    return settings.UPLOAD_DIR
+
+
+@pytest.fixture
+def db(upload_dir):
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def user(db):
+    user = User(email="kiosk@example.com", username="kiosk", hashed_password="x")
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user
+
+
+@pytest.fixture
+def checkin_client(db, user, monkeypatch):
+    """Client for the check-in router, authenticated as ``user``, with a fresh gallery."""
+    from app.api import checkin
+    from app.api.auth import get_current_user
+    from app.services import face_gallery
+
+    monkeypatch.setattr(face_gallery, "face_gallery", face_gallery.FaceGallery())
+
+    app = FastAPI()
+    app.include_router(checkin.router, prefix=f"{settings.API_V1_STR}/checkin")
+    app.dependency_overrides[get_current_user] = lambda: user
+    with TestClient(app) as client:
+        yield client
@@ -0,0 +1,17 @@
+from datetime import datetime
+from types import SimpleNamespace
+import pytest
+from fastapi import HTTPException
+from app.api.checkin import _decode_cursor, _encode_cursor
+
+
+def test_cursor_round_trip():
+    record = SimpleNamespace(check_in_time=datetime(2026, 10, 16, 8, 30, 5, 120), id=42)
+    assert _decode_cursor(_encode_cursor(record)) == (record.check_in_time, 42)
+
+
+@pytest.mark.parametrize("cursor", ["garbage", "bm90LWEtY3Vyc29y"])
+def test_invalid_cursor_is_a_400(cursor):
+    with pytest.raises(HTTPException) as error:
+        _decode_cursor(cursor)
+    assert error.value.status_code == 400
@@ -0,0 +1,52 @@
+from datetime import date, datetime
+from app.api.checkin import _record_attendances
+from app.models.models import Person
+from app.services.attendance_rollup import daily_totals, increment_rollups, new_increments, rollup_key
+from app.services.face_gallery import FaceMatch
+
+DAY = date(2026, 10, 16)
+
+
+def test_increments_accumulate_in_one_row_per_key(db):
+    increments = new_increments()
+    increments[rollup_key(DAY, "hq", "R&D")]["check_ins"] += 2
+    increments[rollup_key(DAY, "hq", "R&D")]["persons"] += 1
+    increments[rollup_key(DAY, "hq", "R&D")]["day_persons"] += 1
+    increments[rollup_key(DAY, None, None)]["check_ins"] += 1
+    increment_rollups(db, increments)
+    db.commit()
+
+    again = new_increments()
+    again[rollup_key(DAY, "hq", "R&D")]["check_outs"] += 1
+    increment_rollups(db, again)
+    db.commit()
+
+    totals = daily_totals(db, DAY, DAY)
+    assert [(row.date, row.check_ins, row.check_outs, row.persons) for row in totals] == [(DAY, 3, 1, 1)]
+    assert daily_totals(db, DAY, DAY, location="hq")[0].check_ins == 2
+    assert daily_totals(db, DAY, DAY, location="")[0].check_ins == 1
+    assert daily_totals(db, DAY, DAY, department="Sales") == []
+
+
+def test_rollup_key_maps_missing_values_to_empty_strings():
+    assert rollup_key(DAY, None, None) == (DAY, "", "")
+
+
+def test_persons_are_counted_at_every_location_they_check_in(db):
+    ada, bob = Person(name="Ada", department="R&D"), Person(name="Bob", department="R&D")
+    db.add_all([ada, bob])
+    db.commit()
+
+    def scan(person, location):
+        _record_attendances(db, [(FaceMatch(person.id, person.name, 0.3), b"jpeg", "scan.jpg")], location)
+
+    scan(ada, "hq")
+    scan(ada, "hq")  # Check-out
+    scan(ada, "lab")
+    scan(bob, "lab")
+
+    today = datetime.now().date()
+    assert daily_totals(db, today, today, location="lab")[0].persons == 2
+    assert daily_totals(db, today, today, location="hq")[0].persons == 1
+    assert daily_totals(db, today, today, department="R&D")[0].persons == 2
+    assert daily_totals(db, today, today)[0].persons == 2
@@ -0,0 +1,48 @@
+import pytest
+from app.core.config import settings
+from app.models.models import Person, PersonSite
+from app.services.bulk_enrollment import _insert_persons, parse_manifest
+
+
+def test_parse_manifest_normalizes_headers_and_blanks():
+    rows = parse_manifest(
+        "﻿Name,Employee_ID,Photo,Sites\n"
+        " Ada , E1 ,ada.jpg,hq;lab\n"
+        "Bob,,bob.png,\n".encode()
+    )
+    assert rows == [
+        {"name": "Ada", "employee_id": "E1", "department": None, "photo": "ada.jpg", "sites": "hq;lab"},
+        {"name": "Bob", "employee_id": None, "department": None, "photo": "bob.png", "sites": None},
+    ]
+
+
+@pytest.mark.parametrize("data, message", [
+    (b"", "empty"),
+    (b"name,department\nAda,R&D\n", "missing columns: photo"),
+    ("name,photo\nAd\xe9,a.jpg\n".encode("latin-1"), "UTF-8"),
+])
+def test_parse_manifest_rejects_bad_manifests(data, message):
+    with pytest.raises(ValueError, match=message):
+        parse_manifest(data)
+
+
+def test_parse_manifest_row_limit(monkeypatch):
+    monkeypatch.setattr(settings, "ENROLLMENT_MAX_ROWS", 2)
+    with pytest.raises(ValueError, match="more than 2 rows"):
+        parse_manifest(b"name,photo\na,1.jpg\nb,2.jpg\nc,3.jpg\n")
+
+
+def test_insert_persons_falls_back_to_one_by_one_on_conflict(db):
+    db.add(Person(name="Taken", employee_id="E2"))
+    db.commit()
+
+    results = _insert_persons(db, [
+        dict(name="Ada", employee_id="E1", sites=["hq"]),
+        dict(name="Bob", employee_id="E2", sites=["lab"]),
+        dict(name="Cy", employee_id="E3"),
+    ])
+
+    assert results[1] == "Employee ID already exists"
+    assert all(isinstance(result, int) for result in (results[0], results[2]))
+    assert sorted(name for (name,) in db.query(Person.name)) == ["Ada", "Cy", "Taken"]
+    assert db.query(PersonSite.person_id, PersonSite.location).all() == [(results[0], "hq")]
@@ -0,0 +1,134 @@
+from io import BytesIO
+import json
+import pytest
+from PIL import Image
+from app.api import checkin
+from app.core.config import settings
+from app.models.models import FaceTemplate, Person
+from app.services.face_gallery import FaceMatch
+from app.services.frame_gate import FrameGate
+from app.services.image_io import image_extension, load_image
+
+CHECKIN = f"{settings.API_V1_STR}/checkin"
+
+
+def test_update_person_parses_sites_like_create(checkin_client, db):
+    person = Person(name="Ada")
+    db.add(person)
+    db.commit()
+
+    response = checkin_client.put(f"{CHECKIN}/persons/{person.id}", json={"sites": ["lab; hq", " hq ", ""]})
+    assert response.status_code == 200
+    assert response.json()["sites"] == ["hq", "lab"]
+
+
+def test_corrupt_kiosk_frame_is_a_400(checkin_client):
+    # Rejected by the frame gate before any face work
+    response = checkin_client.post(
+        f"{CHECKIN}/detect-faces",
+        files={"file": ("frame.jpg", b"not an image", "image/jpeg")},
+        data={"kiosk_id": "gate-1"}
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid image file"
+
+
+def _truncated_jpeg():
+    buffer = BytesIO()
+    Image.new("RGB", (64, 48), (90, 90, 90)).save(buffer, "JPEG")
+    return buffer.getvalue()[:300]
+
+
+@pytest.mark.parametrize("data", [b"not an image", _truncated_jpeg()])
+def test_load_image_rejects_unreadable_data(data):
+    with pytest.raises(ValueError, match="Invalid image file"):
+        load_image(data)
+
+
+def test_truncated_kiosk_frame_is_a_400(checkin_client):
+    response = checkin_client.post(
+        f"{CHECKIN}/detect-faces",
+        files={"file": ("frame.jpg", _truncated_jpeg(), "image/jpeg")},
+        data={"kiosk_id": "gate-1"}
+    )
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("path", ["check-in", "detect-faces"])
+@pytest.mark.parametrize("data", [b"not an image", _truncated_jpeg()])
+def test_corrupt_upload_is_a_400(checkin_client, path, data):
+    pytest.importorskip("face_recognition")
+    response = checkin_client.post(f"{CHECKIN}/{path}", files={"file": ("photo.jpg", data, "image/jpeg")})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid image file"
+
+
+@pytest.mark.parametrize("message", ["[1, 2]", "5", '"check_in"', "null", "{not json"])
+def test_stream_answers_malformed_control_messages_with_an_error(checkin_client, user, monkeypatch, message):
+    monkeypatch.setattr(checkin, "_authenticate", lambda token: user)
+    with checkin_client.websocket_connect(f"{CHECKIN}/stream?token=t") as websocket:
+        websocket.send_text(message)
+        assert websocket.receive_json()["type"] == "error"
+        # The socket stays usable
+        websocket.send_text('{"check_in": 1}')
+        assert websocket.receive_json() == {"type": "error", "detail": "Face not recognized. Please register first"}
+
+
+def test_stream_rejects_a_check_in_at_another_location(checkin_client, user, monkeypatch):
+    monkeypatch.setattr(checkin, "_authenticate", lambda token: user)
+    with checkin_client.websocket_connect(f"{CHECKIN}/stream?token=t&location=hq") as websocket:
+        websocket.send_text('{"check_in": 1, "location": "lab"}')
+        assert websocket.receive_json() == {"type": "error", "detail": "Location is fixed for the stream's connection"}
+
+
+def test_stream_check_in_photo_keeps_the_frame_format(db, monkeypatch):
+    monkeypatch.setattr(settings, "CHECKIN_SAVE_PHOTOS", True)
+    person = Person(name="Ada")
+    db.add(person)
+    db.commit()
+    buffer = BytesIO()
+    Image.new("RGB", (8, 8)).save(buffer, "PNG")
+
+    record = json.loads(checkin._stream_check_in(FaceMatch(person.id, "Ada", 0.2), buffer.getvalue(), None))
+
+    assert record["photo_path"].endswith(".png")
+
+
+def test_image_extension():
+    buffer = BytesIO()
+    Image.new("RGB", (8, 8)).save(buffer, "WEBP")
+    assert image_extension(buffer.getvalue()) == ".webp"
+    assert image_extension(b"not an image") == ".jpg"
+
+
+def test_frame_gate_results_are_not_shared_between_locations(checkin_client, monkeypatch):
+    async def no_faces(fn, *args):
+        return [], [], [], {}
+    monkeypatch.setattr(checkin, "run_face_task", no_faces)
+    monkeypatch.setattr(checkin, "frame_gate", FrameGate())
+    buffer = BytesIO()
+    Image.new("RGB", (64, 48), (90, 90, 90)).save(buffer, "JPEG")
+
+    def detect(location, kiosk_id="gate-1"):
+        return checkin_client.post(
+            f"{CHECKIN}/detect-faces",
+            files={"file": ("frame.jpg", buffer.getvalue(), "image/jpeg")},
+            data={"kiosk_id": kiosk_id, "location": location}
+        ).json()["gated"]
+
+    assert [detect("hq"), detect("hq"), detect("lab"), detect("lab")] == [False, True, False, True]
+    # Without a kiosk id the client address keys the gate
+    assert [detect("hq", None), detect("hq", None)] == [False, True]
+
+
+def test_deleting_a_template_removes_its_photo(checkin_client, db, tmp_path):
+    photo = tmp_path / "template.jpg"
+    photo.write_bytes(b"jpeg")
+    person = Person(name="Ada")
+    person.face_templates = [FaceTemplate(encoding=bytes(512), photo_path=str(photo))]
+    db.add(person)
+    db.commit()
+
+    response = checkin_client.delete(f"{CHECKIN}/persons/{person.id}/templates/{person.face_templates[0].id}")
+    assert response.status_code == 200
+    assert not photo.exists()
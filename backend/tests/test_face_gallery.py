@@ -0,0 +1,158 @@
+from types import SimpleNamespace
+import numpy as np
+import pytest
+from app.core.config import settings
+from app.models.models import Person, PersonSite
+from app.services import face_search, gallery_snapshot
+from app.services.face_gallery import FaceGallery, encoding_to_bytes, parse_sites, sites_key
+
+
+def _encoding(seed):
+    return np.random.default_rng(seed).normal(size=128).astype(np.float32)
+
+
+def _person(person_id, seed, sites=(), templates=(), is_active=True):
+    return SimpleNamespace(
+        id=person_id,
+        name=f"person {person_id}",
+        is_active=is_active,
+        face_encoding=encoding_to_bytes(_encoding(seed)),
+        face_templates=[SimpleNamespace(encoding=encoding_to_bytes(_encoding(t))) for t in templates],
+        sites=list(sites)
+    )
+
+
+@pytest.fixture
+def gallery(monkeypatch):
+    monkeypatch.setattr(settings, "FACE_GALLERY_SNAPSHOT", False)
+    return FaceGallery()
+
+
+def _matched_ids(gallery, seeds, location=None):
+    matches = gallery.match([_encoding(seed) for seed in seeds], tolerance=0.5, location=location)
+    return [match.person_id if match else None for match in matches]
+
+
+def test_parse_sites_splits_and_deduplicates():
+    assert parse_sites(" hq; lab ,hq,, ") == ["hq", "lab"]
+    assert parse_sites(None) == []
+    assert sites_key(["lab", "hq"]) == "hq\nlab"
+
+
+def test_match_returns_nearest_person_per_face(gallery):
+    gallery.upsert_many([_person(1, 1), _person(2, 2)])
+    assert _matched_ids(gallery, [2, 1, 99]) == [2, 1, None]
+
+
+def test_templates_match_their_person(gallery):
+    gallery.upsert(_person(1, 1, templates=[10, 11]))
+    assert len(gallery) == 3
+    assert _matched_ids(gallery, [11]) == [1]
+
+
+def test_upsert_replaces_and_deactivation_removes(gallery):
+    gallery.upsert_many([_person(1, 1), _person(2, 2)])
+    gallery.upsert(_person(1, 5))
+    assert _matched_ids(gallery, [1, 5]) == [None, 1]
+    gallery.upsert(_person(2, 2, is_active=False))
+    assert _matched_ids(gallery, [2]) == [None]
+    gallery.remove(1)
+    assert len(gallery) == 0
+
+
+def test_location_partitions(gallery, monkeypatch):
+    gallery.upsert_many([
+        _person(1, 1, sites=["hq"]),
+        _person(2, 2, sites=["lab"]),
+        _person(3, 3)
+    ])
+    assert _matched_ids(gallery, [1, 2, 3], location="hq") == [1, None, 3]
+    assert _matched_ids(gallery, [1, 2, 3], location="lab") == [None, 2, 3]
+    # Unknown locations only see persons without sites
+    assert _matched_ids(gallery, [1, 2, 3], location="annex") == [None, None, 3]
+    assert _matched_ids(gallery, [1, 2, 3]) == [1, 2, 3]
+
+    monkeypatch.setattr(settings, "FACE_LOCATION_FALLBACK", True)
+    assert _matched_ids(gallery, [2], location="hq") == [2]
+
+
+def test_partition_cache_follows_upserts(gallery):
+    gallery.upsert(_person(1, 1, sites=["hq"]))
+    assert _matched_ids(gallery, [1], location="lab") == [None]
+    gallery.upsert(_person(1, 1, sites=["hq", "lab"]))
+    assert _matched_ids(gallery, [1], location="lab") == [1]
+
+
+def test_snapshot_write_read_and_prune(upload_dir):
+    encodings = np.stack([_encoding(1), _encoding(2)])
+    norms = np.einsum("ij,ij->i", encodings, encodings)
+    ids = np.array([1, 2])
+    names = np.array(["a", "b"], dtype=object)
+    sites = np.array(["hq", ""], dtype=object)
+    with gallery_snapshot.writer_lock():
+        versions = [gallery_snapshot.write(encodings, norms, ids, names, sites) for _ in range(3)]
+
+    assert versions == [1, 2, 3]
+    assert gallery_snapshot.current_version() == 3
+    read = gallery_snapshot.read(3)
+    np.testing.assert_array_equal(read[0], encodings)
+    assert read[3].tolist() == ["a", "b"] and read[4].tolist() == ["hq", ""]
+    with pytest.raises(OSError):
+        gallery_snapshot.read(1)
+
+
+def test_workers_share_gallery_through_snapshot(db, monkeypatch):
+    monkeypatch.setattr(settings, "FACE_GALLERY_SNAPSHOT", True)
+    person = Person(name="Ada", face_encoding=encoding_to_bytes(_encoding(1)))
+    person.site_links = [PersonSite(location="hq")]
+    db.add(person)
+    db.commit()
+
+    first, second = FaceGallery(), FaceGallery()
+    first.ensure_loaded(db)
+    second.ensure_loaded(db)
+    assert second._version == first._version
+    assert _matched_ids(second, [1], location="hq") == [person.id]
+
+    # A change published by one worker is picked up by the other's next lookup
+    first.upsert(_person(99, 7))
+    second.ensure_loaded(db)
+    assert _matched_ids(second, [7]) == [99]
+
+
+def test_workers_adopt_the_published_ivf_index(db, monkeypatch):
+    monkeypatch.setattr(settings, "FACE_GALLERY_SNAPSHOT", True)
+    monkeypatch.setattr(settings, "FACE_SEARCH_BACKEND", "ivf")
+    monkeypatch.setattr(settings, "FACE_IVF_MIN_GALLERY", 4)
+    monkeypatch.setattr(settings, "FACE_IVF_LISTS", 2)
+    db.add_all([Person(name=f"p{seed}", face_encoding=encoding_to_bytes(_encoding(seed))) for seed in range(8)])
+    db.commit()
+    first = FaceGallery()
+    first.ensure_loaded(db)
+
+    trained = []
+    monkeypatch.setattr(face_search.IVFIndex, "train", classmethod(lambda cls, *args, **kwargs: trained.append(args)))
+    second = FaceGallery()
+    second.ensure_loaded(db)
+    first.upsert(_person(99, 99))
+    second.ensure_loaded(db)
+
+    assert trained == []
+    assert isinstance(second._snapshot[4], face_search.IVFIndex)
+    np.testing.assert_array_equal(second._snapshot[4].centroids, first._snapshot[4].centroids)
+    assert _matched_ids(second, [3, 99]) == [4, 99]
+
+
+def test_partitions_restrict_the_gallery_index(gallery, monkeypatch):
+    monkeypatch.setattr(settings, "FACE_SEARCH_BACKEND", "ivf")
+    monkeypatch.setattr(settings, "FACE_IVF_MIN_GALLERY", 4)
+    monkeypatch.setattr(settings, "FACE_IVF_LISTS", 2)
+    gallery.upsert_many([_person(seed, seed, sites=["hq"] if seed % 2 else ["lab"]) for seed in range(1, 9)])
+    index = gallery._snapshot[4]
+
+    monkeypatch.setattr("app.services.face_gallery.build_index", None)
+    monkeypatch.setattr(face_search.IVFIndex, "train", None)
+    assert _matched_ids(gallery, [1, 2, 3], location="hq") == [1, None, 3]
+    hq = gallery._snapshot[6]["views"]["hq"][4]
+    assert hq.centroids is index.centroids
+    assert hq.assignments.tolist() == index.assignments[::2].tolist()
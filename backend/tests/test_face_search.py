@@ -0,0 +1,66 @@
+import numpy as np
+from app.core.config import settings
+from app.services.face_search import ExactIndex, IVFIndex, build_index, needs_rebuild
+
+
+def _clustered(n_clusters=16, per_cluster=50, dim=128, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(n_clusters, dim)).astype(np.float32)
+    encodings = centers.repeat(per_cluster, axis=0) + rng.normal(scale=0.05, size=(n_clusters * per_cluster, dim))
+    return encodings.astype(np.float32)
+
+
+def _norms(encodings):
+    return np.einsum("ij,ij->i", encodings, encodings)
+
+
+def test_exact_search_returns_nearest_row():
+    encodings = _clustered()
+    queries = encodings[[3, 400, 799]] + 0.001
+    best, squared = ExactIndex().search(encodings, _norms(encodings), queries)
+    assert best.tolist() == [3, 400, 799]
+    assert np.all(squared < 0.01)
+
+
+def test_ivf_probing_every_list_matches_exact():
+    encodings = _clustered()
+    queries = _clustered(seed=1)[:40]
+    ivf = IVFIndex.train(encodings, n_lists=16, n_probe=16)
+    exact_best, exact_squared = ExactIndex().search(encodings, _norms(encodings), queries)
+    ivf_best, ivf_squared = ivf.search(encodings, _norms(encodings), queries)
+    assert ivf_best.tolist() == exact_best.tolist()
+    np.testing.assert_allclose(ivf_squared, exact_squared, rtol=1e-4, atol=1e-4)
+
+
+def test_ivf_recall_on_clustered_gallery():
+    encodings = _clustered()
+    rng = np.random.default_rng(2)
+    rows = rng.choice(len(encodings), 100, replace=False)
+    queries = encodings[rows] + rng.normal(scale=0.01, size=(100, 128)).astype(np.float32)
+    ivf = IVFIndex.train(encodings, n_lists=16, n_probe=2)
+    best, _ = ivf.search(encodings, _norms(encodings), queries)
+    assert np.mean(best == rows) >= 0.95
+
+
+def test_ivf_subset_and_extend_keep_rows_searchable():
+    encodings = _clustered()
+    ivf = IVFIndex.train(encodings, n_lists=16, n_probe=16)
+    keep = np.arange(len(encodings)) % 2 == 0
+    added = _clustered(seed=3)[:10]
+    gallery = np.concatenate([encodings[keep], added])
+    index = ivf.subset(keep).extend(added)
+    best, _ = index.search(gallery, _norms(gallery), added)
+    assert best.tolist() == list(range(keep.sum(), keep.sum() + 10))
+
+
+def test_build_index_uses_exact_search_below_min_gallery(monkeypatch):
+    monkeypatch.setattr(settings, "FACE_IVF_MIN_GALLERY", 1000)
+    assert isinstance(build_index(_clustered(per_cluster=10), "ivf"), ExactIndex)
+    assert isinstance(build_index(_clustered(per_cluster=100), "ivf"), IVFIndex)
+
+
+def test_needs_rebuild_after_gallery_doubles(monkeypatch):
+    monkeypatch.setattr(settings, "FACE_SEARCH_BACKEND", "ivf")
+    ivf = IVFIndex.train(_clustered(), n_lists=16, n_probe=4)
+    assert not needs_rebuild(ivf, 1200)
+    assert needs_rebuild(ivf, 1601)
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+from app.core.config import settings
+from app.models.models import FaceTemplate, Person
+from app.services import face_templates
+from app.services.face_gallery import FaceMatch, encoding_to_bytes
+
+ENCODING = encoding_to_bytes(np.zeros(128))
+
+
+@pytest.fixture
+def learning(monkeypatch):
+    monkeypatch.setattr(settings, "FACE_AUTO_TEMPLATES", True)
+    monkeypatch.setattr(settings, "FACE_TEMPLATES_MAX", 1)
+    upserts = []
+    monkeypatch.setattr(face_templates.face_gallery, "upsert_many", upserts.append)
+    return upserts
+
+
+def _person_with_learned_template(db, name, photo):
+    photo.write_bytes(b"jpeg")
+    person = Person(name=name, face_encoding=ENCODING)
+    person.face_templates = [FaceTemplate(encoding=ENCODING, source="check_in", photo_path=str(photo))]
+    db.add(person)
+    db.commit()
+    return person
+
+
+def _candidate(person):
+    return FaceMatch(person.id, person.name, 0.3), np.ones(128)
+
+
+def test_learned_templates_are_published_in_one_gallery_update(db, tmp_path, learning):
+    ada = _person_with_learned_template(db, "Ada", tmp_path / "ada.jpg")
+    bob = _person_with_learned_template(db, "Bob", tmp_path / "bob.jpg")
+
+    face_templates.learn_templates(db, [_candidate(ada), _candidate(bob)])
+
+    assert [[person.id for person in persons] for persons in learning] == [[ada.id, bob.id]]
+    assert [len(person.face_templates) for person in (ada, bob)] == [1, 1]
+    assert not (tmp_path / "ada.jpg").exists() and not (tmp_path / "bob.jpg").exists()
+
+
+def test_evicted_photo_is_kept_when_the_commit_fails(db, tmp_path, learning, monkeypatch):
+    ada = _person_with_learned_template(db, "Ada", tmp_path / "ada.jpg")
+
+    def fail():
+        raise RuntimeError("database is locked")
+    monkeypatch.setattr(db, "commit", fail)
+    with pytest.raises(RuntimeError):
+        face_templates.learn_templates(db, [_candidate(ada)])
+
+    assert (tmp_path / "ada.jpg").exists()
+    assert learning == []
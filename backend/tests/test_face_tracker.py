@@ -0,0 +1,61 @@
+from app.services.face_gallery import FaceMatch
+from app.services.face_tracker import FaceTracker, box_iou
+
+# Boxes are (top, right, bottom, left)
+BOX = (10, 60, 60, 10)
+
+
+def _shift(box, dx, dy=0):
+    top, right, bottom, left = box
+    return (top + dy, right + dx, bottom + dy, left + dx)
+
+
+def test_box_iou():
+    assert box_iou(BOX, BOX) == 1.0
+    assert box_iou(BOX, _shift(BOX, 100)) == 0.0
+    assert 0.0 < box_iou(BOX, _shift(BOX, 10)) < 1.0
+
+
+def test_moving_face_keeps_its_track_and_identity():
+    tracker = FaceTracker(identity_ttl=60)
+    tracks, stale = tracker.update([BOX])
+    assert stale == [0]
+    tracker.set_identity(tracks[0], FaceMatch(7, "Ada", 0.3))
+
+    moved, stale = tracker.update([_shift(BOX, 8)])
+    assert moved[0].id == tracks[0].id
+    assert moved[0].match.person_id == 7
+    assert stale == []
+
+
+def test_fast_movement_falls_back_to_centroid_distance():
+    tracker = FaceTracker(iou_threshold=0.9, max_centroid_distance=0.5)
+    first, _ = tracker.update([BOX])
+    second, _ = tracker.update([_shift(BOX, 20)])
+    assert second[0].id == first[0].id
+
+
+def test_new_face_gets_new_track_and_needs_matching():
+    tracker = FaceTracker(identity_ttl=60)
+    tracks, _ = tracker.update([BOX])
+    tracker.set_identity(tracks[0], None)
+    tracks, stale = tracker.update([BOX, _shift(BOX, 300)])
+    assert tracks[0].id != tracks[1].id
+    assert stale == [1]
+
+
+def test_identity_expires_after_ttl():
+    tracker = FaceTracker(identity_ttl=0)
+    tracks, _ = tracker.update([BOX])
+    tracker.set_identity(tracks[0], FaceMatch(7, "Ada", 0.3))
+    _, stale = tracker.update([BOX])
+    assert stale == [0]
+
+
+def test_lost_tracks_are_dropped_after_max_missed():
+    tracker = FaceTracker(max_missed=1)
+    tracks, _ = tracker.update([BOX])
+    tracker.update([])
+    assert tracker.get(tracks[0].id) is not None
+    tracker.update([])
+    assert tracker.get(tracks[0].id) is None
@@ -0,0 +1,66 @@
+import asyncio
+import os
+import threading
+import time
+import pytest
+from fastapi import HTTPException
+from app.core.config import settings
+from app.services import face_worker
+
+
+def _square(value):
+    return value * value
+
+
+def _crash(value=None):
+    # Simulates a worker killed by a segfault in dlib or by the OOM killer
+    os._exit(1)
+
+
+def _square_unless_negative(value):
+    if value < 0:
+        _crash()
+    return _square(value)
+
+
+def _slow(value):
+    time.sleep(0.5)
+    return value
+
+
+@pytest.fixture(autouse=True)
+def face_pool(monkeypatch):
+    monkeypatch.setattr(settings, "FACE_WORKERS", 1)
+    face_worker.shutdown_face_pool()
+    yield
+    face_worker.shutdown_face_pool()
+
+
+def test_run_face_task_recovers_from_a_dead_worker():
+    async def main():
+        with pytest.raises(HTTPException) as error:
+            await face_worker.run_face_task(_crash)
+        assert error.value.status_code == 503
+        return await face_worker.run_face_task(_square, 3)
+
+    assert asyncio.run(main()) == 9
+    assert face_worker.face_pool_stats()["in_flight"] == 0
+
+
+def test_map_face_pool_retries_tasks_lost_to_a_dead_worker():
+    results = face_worker.map_face_pool(_square_unless_negative, {"a": 2, "b": -1, "c": 3})
+    assert results["a"] == 4 and results["c"] == 9
+    assert isinstance(results["b"], Exception)
+    assert face_worker.map_face_pool(_square, {"d": 5}) == {"d": 25}
+
+
+def test_map_face_pool_counts_its_tasks_in_flight():
+    thread = threading.Thread(target=face_worker.map_face_pool, args=(_slow, {"a": 1, "b": 2}))
+    thread.start()
+    seen = 0
+    while thread.is_alive():
+        seen = max(seen, face_worker.face_pool_stats()["in_flight"])
+        time.sleep(0.01)
+    thread.join()
+    assert seen == 1
+    assert face_worker.face_pool_stats()["in_flight"] == 0
@@ -0,0 +1,51 @@
+from io import BytesIO
+import numpy as np
+import pytest
+from PIL import Image
+from app.core.config import settings
+from app.services.frame_gate import FrameGate, frame_signature
+
+
+def _jpeg(brightness):
+    buffer = BytesIO()
+    Image.new("RGB", (320, 240), (brightness,) * 3).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+def test_frame_signature_is_small_grayscale():
+    signature = frame_signature(_jpeg(100))
+    assert signature.shape == (24, 32)
+    assert abs(float(signature.mean()) - 100) < 2
+
+
+def test_frame_signature_rejects_non_images():
+    with pytest.raises(ValueError):
+        frame_signature(b"not an image")
+
+
+def test_unchanged_frame_reuses_result():
+    gate = FrameGate()
+    signature = frame_signature(_jpeg(100))
+    assert gate.lookup("kiosk", signature) is None
+    gate.store("kiosk", signature, "result")
+    assert gate.lookup("kiosk", frame_signature(_jpeg(101))) == "result"
+    assert gate.lookup("kiosk", frame_signature(_jpeg(160))) is None
+    assert gate.lookup("other", signature) is None
+    assert gate.stats()["gated"] == 1
+
+
+def test_cached_result_expires(monkeypatch):
+    monkeypatch.setattr(settings, "FRAME_GATE_MAX_AGE", 0.0)
+    gate = FrameGate()
+    signature = frame_signature(_jpeg(100))
+    gate.store("kiosk", signature, "result")
+    assert gate.lookup("kiosk", signature) is None
+
+
+def test_least_recent_kiosks_are_evicted():
+    gate = FrameGate(max_kiosks=2)
+    signature = np.zeros((24, 32), dtype=np.float32)
+    for kiosk in ("a", "b", "c"):
+        gate.store(kiosk, signature, kiosk)
+    assert gate.lookup("a", signature) is None
+    assert gate.lookup("c", signature) == "c"
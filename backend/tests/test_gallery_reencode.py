@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta
+import numpy as np
+import pytest
+from app.models.models import FaceTemplate, Person, ReencodeJob, TrainingStatus
+from app.services import gallery_reencode
+from app.services.face_gallery import FaceGallery, encoding_from_bytes, encoding_to_bytes
+
+OLD = encoding_to_bytes(np.zeros(128))
+
+
+def _job(db, status=TrainingStatus.PENDING, heartbeat_at=None):
+    job = ReencodeJob(status=status, processed=0, failed=0, last_person_id=0, heartbeat_at=heartbeat_at or datetime.now())
+    db.add(job)
+    db.commit()
+    return job
+
+
+@pytest.fixture
+def encoder(monkeypatch):
+    """Encodes each photo as 128 copies of its byte length."""
+    def map_face_pool(fn, items):
+        return {key: ([(0, 1, 1, 0)], [np.full(128, len(data))]) for key, data in items.items()}
+    monkeypatch.setattr(gallery_reencode, "map_face_pool", map_face_pool)
+    monkeypatch.setattr(gallery_reencode, "face_gallery", FaceGallery())
+
+
+def test_a_job_is_claimed_once(db):
+    job = _job(db)
+    assert gallery_reencode._claim(db, job.id)
+    assert not gallery_reencode._claim(db, job.id)
+
+
+def test_stale_running_job_can_be_claimed_again(db):
+    job = _job(db, TrainingStatus.RUNNING, datetime.now() - timedelta(hours=1))
+    assert gallery_reencode._claim(db, job.id)
+
+
+def test_job_held_by_another_worker_is_left_alone(db, encoder):
+    job = _job(db, TrainingStatus.RUNNING)
+    gallery_reencode.run_reencode_job(job.id)
+    db.refresh(job)
+    assert (job.status, job.processed, job.started_at) == (TrainingStatus.RUNNING, 0, None)
+
+
+def test_persons_and_templates_are_reencoded(db, upload_dir, tmp_path, encoder):
+    photo = tmp_path / "ada.jpg"
+    photo.write_bytes(b"x" * 3)
+    template_photo = tmp_path / "template.jpg"
+    template_photo.write_bytes(b"x" * 5)
+    ada = Person(name="Ada", photo_path=str(photo), face_encoding=OLD)
+    ada.face_templates = [
+        FaceTemplate(encoding=OLD, photo_path=str(template_photo)),
+        FaceTemplate(encoding=OLD, source="check_in"),
+        FaceTemplate(encoding=OLD, photo_path=str(tmp_path / "missing.jpg")),
+    ]
+    db.add(ada)
+    job = _job(db)
+    with_photo, without_photo, missing_photo = [template.id for template in ada.face_templates]
+
+    gallery_reencode.run_reencode_job(job.id)
+
+    db.expire_all()
+    assert job.status == TrainingStatus.COMPLETED, job.error_message
+    assert (job.total, job.processed) == (4, 4)
+    assert [failure["template_id"] for failure in job.failures] == [missing_photo]
+    assert encoding_from_bytes(ada.face_encoding)[0] == 3
+    assert [template.id for template in ada.face_templates] == [with_photo]
+    assert encoding_from_bytes(ada.face_templates[0].encoding)[0] == 5
+    assert without_photo not in {template.id for template in db.query(FaceTemplate)}
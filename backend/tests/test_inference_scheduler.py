@@ -0,0 +1,61 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from app.core.config import settings
+
+pytest.importorskip("ultralytics")
+from app.services.inference_scheduler import InferenceScheduler  # noqa: E402
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = InferenceScheduler()
+    scheduler.batch_sizes = []
+
+    def run_batch(model_id, file_path, images, conf, iou):
+        scheduler.batch_sizes.append(len(images))
+        return [(model_id, image, conf) for image in images], 0.01
+
+    scheduler._run_batch = run_batch
+    return scheduler
+
+
+def _predict_all(scheduler, requests, max_batch=8, max_wait=0.05):
+    async def main():
+        return await asyncio.gather(*(
+            scheduler.predict(model_id, "w.pt", image, conf, 0.45, max_batch, max_wait)
+            for model_id, image, conf in requests
+        ), return_exceptions=True)
+    return asyncio.run(main())
+
+
+def test_concurrent_requests_share_one_batch(scheduler):
+    results = _predict_all(scheduler, [(1, i, 0.25) for i in range(5)])
+    assert scheduler.batch_sizes == [5]
+    assert [result for result, _ in results] == [(1, i, 0.25) for i in range(5)]
+
+
+def test_batches_are_capped_at_max_batch(scheduler):
+    _predict_all(scheduler, [(1, i, 0.25) for i in range(5)], max_batch=2)
+    assert scheduler.batch_sizes == [2, 2, 1]
+
+
+def test_different_parameters_and_models_are_not_mixed(scheduler):
+    results = _predict_all(scheduler, [(1, 0, 0.25), (1, 1, 0.5), (2, 2, 0.25), (1, 3, 0.25)])
+    assert sorted(scheduler.batch_sizes) == [1, 1, 2]
+    assert [result for result, _ in results] == [(1, 0, 0.25), (1, 1, 0.5), (2, 2, 0.25), (1, 3, 0.25)]
+
+
+def test_full_queue_is_rejected_with_503(scheduler, monkeypatch):
+    monkeypatch.setattr(settings, "INFERENCE_QUEUE_LIMIT", 2)
+    results = _predict_all(scheduler, [(1, i, 0.25) for i in range(3)])
+    assert isinstance(results[2], HTTPException) and results[2].status_code == 503
+    assert scheduler.stats()["rejected"] == 1
+
+
+def test_batch_failure_reaches_every_request(scheduler):
+    def fail(*args):
+        raise RuntimeError("out of memory")
+    scheduler._run_batch = fail
+    results = _predict_all(scheduler, [(1, i, 0.25) for i in range(3)])
+    assert all(isinstance(result, RuntimeError) for result in results)
@@ -0,0 +1,75 @@
+import os
+from datetime import datetime
+import pytest
+import sqlalchemy as sa
+from alembic import command
+from alembic.config import Config
+from app.db.session import engine
+from app.models.models import AttendanceDaily, AttendanceRecord, Person
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def alembic_config(db, monkeypatch):
+    # The db fixture recreates the app tables but not alembic's version table
+    with engine.begin() as connection:
+        connection.execute(sa.text("DROP TABLE IF EXISTS alembic_version"))
+    # script_location and prepend_sys_path in alembic.ini are relative to backend/
+    monkeypatch.chdir(BACKEND_DIR)
+    return Config(os.path.join(BACKEND_DIR, "alembic.ini"))
+
+
+def test_rollup_migration_backfills_database_created_by_create_all(db, alembic_config):
+    person = Person(name="Ada", department="R&D")
+    db.add(person)
+    db.flush()
+    db.add_all([
+        AttendanceRecord(person_id=person.id, check_in_time=datetime(2026, 10, 16, 8), location="hq"),
+        AttendanceRecord(
+            person_id=person.id,
+            check_in_time=datetime(2026, 10, 16, 13),
+            check_out_time=datetime(2026, 10, 16, 17),
+            location="hq"
+        ),
+    ])
+    db.commit()
+
+    command.upgrade(alembic_config, "0004")
+
+    row = db.query(AttendanceDaily).one()
+    assert (row.location, row.department, row.check_ins, row.check_outs, row.persons) == ("hq", "R&D", 2, 1, 1)
+
+
+def test_database_created_by_create_all_upgrades_to_head(db, alembic_config):
+    command.upgrade(alembic_config, "head")
+
+    with engine.connect() as connection:
+        assert connection.execute(sa.text("SELECT version_num FROM alembic_version")).scalar() == "0013"
+    columns = {column["name"] for column in sa.inspect(engine).get_columns("models")}
+    assert {"max_batch_size", "runtime", "runtime_path", "runtime_error"} <= columns
+
+
+def test_rollup_counts_persons_per_location_after_upgrade(db, alembic_config):
+    ada, bob = Person(name="Ada", department="R&D"), Person(name="Bob", department="R&D")
+    db.add_all([ada, bob])
+    db.flush()
+    db.add_all([
+        AttendanceRecord(
+            person_id=ada.id,
+            check_in_time=datetime(2026, 10, 16, 8),
+            check_out_time=datetime(2026, 10, 16, 12),
+            location="hq"
+        ),
+        AttendanceRecord(person_id=ada.id, check_in_time=datetime(2026, 10, 16, 13), location="lab"),
+        AttendanceRecord(person_id=bob.id, check_in_time=datetime(2026, 10, 16, 9), location="lab"),
+    ])
+    db.commit()
+
+    command.upgrade(alembic_config, "head")
+
+    rows = db.query(AttendanceDaily).order_by(AttendanceDaily.location).all()
+    assert [(row.location, row.check_ins, row.check_outs, row.persons, row.day_persons) for row in rows] == [
+        ("hq", 1, 1, 1, 1),
+        ("lab", 2, 0, 2, 1),
+    ]
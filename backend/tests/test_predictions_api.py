@@ -0,0 +1,63 @@
+from io import BytesIO
+from types import SimpleNamespace
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from PIL import Image
+from app.core.config import settings
+from app.models.models import Model
+
+pytest.importorskip("ultralytics")
+from app.api import predictions  # noqa: E402
+from app.api.auth import get_current_user  # noqa: E402
+from test_yolo_results import _result  # noqa: E402
+
+PREDICTIONS = f"{settings.API_V1_STR}/predictions"
+
+
+@pytest.fixture
+def client(db, user, tmp_path, monkeypatch):
+    checkpoint = tmp_path / "w.pt"
+    checkpoint.write_bytes(b"weights")
+    db.add(Model(name="m", owner_id=user.id, file_path=str(checkpoint), is_deployed=True, class_names=["cat", "dog"]))
+    db.commit()
+
+    async def predict(model_id, file_path, image, conf, iou, max_batch, max_wait):
+        return _result(3), 0.01
+    monkeypatch.setattr(predictions, "inference_scheduler", SimpleNamespace(predict=predict))
+
+    app = FastAPI()
+    app.include_router(predictions.router, prefix=PREDICTIONS)
+    app.dependency_overrides[get_current_user] = lambda: user
+    with TestClient(app) as client:
+        yield client
+
+
+def _image():
+    buffer = BytesIO()
+    Image.new("RGB", (32, 32)).save(buffer, "PNG")
+    return {"file": ("a.png", buffer.getvalue(), "image/png")}
+
+
+def test_infer_returns_prediction_result(client):
+    response = client.post(f"{PREDICTIONS}/infer?model_id=1", files=_image())
+    assert response.status_code == 200
+    body = response.json()
+    assert [box["class_name"] for box in body["predictions"]] == ["cat", "dog", "cat"]
+    assert body["backend"] == "pytorch"
+
+
+def test_infer_columnar_format(client):
+    body = client.post(f"{PREDICTIONS}/infer?model_id=1&format=columnar", files=_image()).json()
+    assert body["class_ids"] == [0, 1, 0]
+    assert len(body["boxes"]) == 12
+
+
+def test_infer_rejects_unknown_format(client):
+    assert client.post(f"{PREDICTIONS}/infer?model_id=1&format=xml", files=_image()).status_code == 400
+
+
+def test_infer_rejects_corrupt_upload(client):
+    response = client.post(f"{PREDICTIONS}/infer?model_id=1", files={"file": ("a.jpg", b"not an image", "image/jpeg")})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid image file"
@@ -0,0 +1,71 @@
+from types import SimpleNamespace
+import json
+import numpy as np
+from app.services.yolo_results import class_name, columnar_result, encode_columnar, prediction_result
+
+
+class _Tensor:
+    """Stands in for a device tensor; counts host transfers."""
+
+    transfers = 0
+
+    def __init__(self, values):
+        self.values = np.asarray(values)
+
+    def cpu(self):
+        _Tensor.transfers += 1
+        return self
+
+    def numpy(self):
+        return self.values
+
+    def __len__(self):
+        return len(self.values)
+
+
+class _Boxes:
+    def __init__(self, n):
+        self.xyxy = _Tensor(np.arange(n * 4, dtype=np.float32).reshape(n, 4))
+        self.cls = _Tensor(np.arange(n) % 2 * 1.0)
+        self.conf = _Tensor(np.full(n, 0.5, dtype=np.float32))
+
+    def __len__(self):
+        return len(self.conf)
+
+
+def _result(n):
+    return SimpleNamespace(boxes=_Boxes(n))
+
+
+def test_class_name_falls_back_to_index():
+    assert class_name(["cat"], 0) == "cat"
+    assert class_name(["cat"], 3) == "class_3"
+    assert class_name(None, 1) == "class_1"
+
+
+def test_prediction_result_copies_each_tensor_once():
+    _Tensor.transfers = 0
+    result = prediction_result("a.jpg", _result(300), 0.01, ["cat", "dog"], "onnx")
+    assert _Tensor.transfers == 3
+    assert len(result.predictions) == 300
+    box = result.predictions[1]
+    assert (box.class_id, box.class_name, box.confidence) == (1, "dog", 0.5)
+    assert (box.x_min, box.y_min, box.x_max, box.y_max) == (4.0, 5.0, 6.0, 7.0)
+    assert result.backend == "onnx"
+    assert json.loads(result.model_dump_json())["predictions"][1]["class_name"] == "dog"
+
+
+def test_columnar_result_holds_parallel_arrays():
+    columns = columnar_result("a.jpg", _result(3), 0.01, ["cat"])
+    assert columns["boxes"] == [float(v) for v in range(12)]
+    assert columns["class_ids"] == [0, 1, 0]
+    assert columns["confidences"] == [0.5, 0.5, 0.5]
+    assert columns["classes"] == {"0": "cat", "1": "class_1"}
+    assert columns["backend"] == "pytorch"
+    assert json.loads(encode_columnar(columns, "columnar")) == columns
+
+
+def test_empty_and_missing_results():
+    assert prediction_result("a.jpg", None, 0.0, None).predictions == []
+    columns = columnar_result("a.jpg", _result(0), 0.0, None)
+    assert columns["boxes"] == [] and columns["classes"] == {}
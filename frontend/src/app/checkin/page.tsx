@@ -10,6 +10,16 @@ import { checkinApi } from '@/lib/api';
 import { Person, AttendanceRecord, FaceDetection } from '@/types';
 import { Camera, UserPlus, Users, Clock, Download, CheckCircle } from 'lucide-react';
 
+// Stable per-browser kiosk id, so the server can reuse its result for unchanged frames
+const getKioskId = () => {
+  let kioskId = localStorage.getItem('kioskId');
+  if (!kioskId) {
+    kioskId = `kiosk-${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 10)}`;
+    localStorage.setItem('kioskId', kioskId);
+  }
+  return kioskId;
+};
+
 export default function CheckInPage() {
   const { user, loading: authLoading } = useAuth();
   const router = useRouter();
@@ -106,7 +116,7 @@ export default function CheckInPage() {
     try {
       // Detect faces
       const file = new File([blob], 'capture.jpg', { type: 'image/jpeg' });
-      const result = await checkinApi.detectFaces(file);
+      const result = await checkinApi.detectFaces(file, getKioskId());
       
       setDetectedFaces(result.faces);
       
@@ -129,7 +139,7 @@ export default function CheckInPage() {
           context.fillRect(face.x, face.y - 25, 100, 25);
           context.fillStyle = '#ffffff';
           context.font = '16px Arial';
-          context.fillText('Unknown', face.x + 5, face.y - 7);
+          context.fillText(face.quality || 'Unknown', face.x + 5, face.y - 7);
         }
       });
     } catch (err: any) {
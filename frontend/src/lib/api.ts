@@ -7,9 +7,16 @@ import type {
   Model, 
   TrainingJob,
   PredictionResult,
+  PredictionColumns,
+  PredictionJob,
   DatasetStatistics,
   Person,
   AttendanceRecord,
+  FaceTemplate,
+  EnrollmentJob,
+  ReencodeJob,
+  DailyAttendance,
+  AttendanceAnalytics,
   FaceDetectionResult
 } from '@/types';
 
@@ -174,8 +181,11 @@ export const modelsApi = {
     return response.data;
   },
   
-  deploy: async (id: number): Promise<{ message: string; inference_endpoint: string }> => {
-    const response = await apiClient.post(`/models/${id}/deploy`);
+  deploy: async (
+    id: number,
+    runtime?: 'pytorch' | 'onnx' | 'openvino'
+  ): Promise<{ message: string; inference_endpoint: string; runtime: string; exporting: boolean }> => {
+    const response = await apiClient.post(`/models/${id}/deploy`, null, { params: { runtime } });
     return response.data;
   },
   
@@ -235,6 +245,55 @@ export const predictionsApi = {
     });
     return response.data;
   },
+
+  inferColumnar: async (file: File, modelId: number, confidence?: number): Promise<PredictionColumns> => {
+    const formData = new FormData();
+    formData.append('file', file);
+    const response = await apiClient.post('/predictions/infer', formData, {
+      params: { model_id: modelId, confidence, format: 'columnar' },
+      headers: { 'Content-Type': 'multipart/form-data' },
+    });
+    return response.data;
+  },
+
+  // Many images or zip archives; results are returned as NDJSON text, one line per image
+  batchPredict: async (
+    files: File[],
+    modelId: number,
+    confidence?: number,
+    format: 'json' | 'columnar' = 'json'
+  ): Promise<string> => {
+    const formData = new FormData();
+    files.forEach((file) => formData.append('files', file));
+    const response = await apiClient.post('/predictions/batch', formData, {
+      params: { model_id: modelId, confidence, format },
+      headers: { 'Content-Type': 'multipart/form-data' },
+      responseType: 'text',
+    });
+    return response.data;
+  },
+
+  createPredictionJob: async (files: File[], modelId: number, confidence?: number): Promise<PredictionJob> => {
+    const formData = new FormData();
+    files.forEach((file) => formData.append('files', file));
+    const response = await apiClient.post('/predictions/jobs', formData, {
+      params: { model_id: modelId, confidence },
+      headers: { 'Content-Type': 'multipart/form-data' },
+    });
+    return response.data;
+  },
+
+  getPredictionJob: async (jobId: number): Promise<PredictionJob> => {
+    const response = await apiClient.get(`/predictions/jobs/${jobId}`);
+    return response.data;
+  },
+
+  downloadPredictionResults: async (jobId: number): Promise<Blob> => {
+    const response = await apiClient.get(`/predictions/jobs/${jobId}/results`, {
+      responseType: 'blob'
+    });
+    return response.data;
+  },
 };
 
 // Check-in API
@@ -252,12 +311,13 @@ export const checkinApi = {
     return response.data;
   },
 
-  createPerson: async (name: string, file: File, employeeId?: string, department?: string): Promise<Person> => {
+  createPerson: async (name: string, file: File, employeeId?: string, department?: string, sites?: string[]): Promise<Person> => {
     const formData = new FormData();
     formData.append('name', name);
     formData.append('file', file);
     if (employeeId) formData.append('employee_id', employeeId);
     if (department) formData.append('department', department);
+    if (sites?.length) formData.append('sites', sites.join(','));
     
     const response = await apiClient.post('/checkin/persons/', formData, {
       headers: { 'Content-Type': 'multipart/form-data' },
@@ -275,10 +335,61 @@ export const checkinApi = {
     return response.data;
   },
 
+  bulkEnrollPersons: async (archive: File, manifest: File): Promise<EnrollmentJob> => {
+    const formData = new FormData();
+    formData.append('archive', archive);
+    formData.append('manifest', manifest);
+    const response = await apiClient.post('/checkin/persons/bulk', formData, {
+      headers: { 'Content-Type': 'multipart/form-data' },
+    });
+    return response.data;
+  },
+
+  getEnrollmentJob: async (jobId: number): Promise<EnrollmentJob> => {
+    const response = await apiClient.get(`/checkin/persons/bulk/${jobId}`);
+    return response.data;
+  },
+
+  startReencode: async (): Promise<ReencodeJob> => {
+    const response = await apiClient.post('/checkin/persons/reencode');
+    return response.data;
+  },
+
+  getReencodeJob: async (jobId: number): Promise<ReencodeJob> => {
+    const response = await apiClient.get(`/checkin/persons/reencode/${jobId}`);
+    return response.data;
+  },
+
+  resumeReencodeJob: async (jobId: number): Promise<ReencodeJob> => {
+    const response = await apiClient.post(`/checkin/persons/reencode/${jobId}/resume`);
+    return response.data;
+  },
+
+  enrollFaceTemplate: async (personId: number, file: File): Promise<FaceTemplate> => {
+    const formData = new FormData();
+    formData.append('file', file);
+    const response = await apiClient.post(`/checkin/persons/${personId}/templates`, formData, {
+      headers: { 'Content-Type': 'multipart/form-data' },
+    });
+    return response.data;
+  },
+
+  listFaceTemplates: async (personId: number): Promise<FaceTemplate[]> => {
+    const response = await apiClient.get(`/checkin/persons/${personId}/templates`);
+    return response.data;
+  },
+
+  deleteFaceTemplate: async (personId: number, templateId: number): Promise<{ message: string }> => {
+    const response = await apiClient.delete(`/checkin/persons/${personId}/templates/${templateId}`);
+    return response.data;
+  },
+
   // Face detection
-  detectFaces: async (file: File): Promise<FaceDetectionResult> => {
+  detectFaces: async (file: File, kioskId?: string, location?: string): Promise<FaceDetectionResult> => {
     const formData = new FormData();
     formData.append('file', file);
+    if (kioskId) formData.append('kiosk_id', kioskId);
+    if (location) formData.append('location', location);
     
     const response = await apiClient.post('/checkin/detect-faces', formData, {
       headers: { 'Content-Type': 'multipart/form-data' },
@@ -286,6 +397,15 @@ export const checkinApi = {
     return response.data;
   },
 
+  // Streaming detection with face tracking; send frames as binary messages
+  openStream: (location?: string): WebSocket => {
+    const token = localStorage.getItem('token') || '';
+    const url = new URL(`${API_BASE_URL.replace(/^http/, 'ws')}/checkin/stream`);
+    url.searchParams.set('token', token);
+    if (location) url.searchParams.set('location', location);
+    return new WebSocket(url.toString());
+  },
+
   // Check-in
   checkIn: async (file: File, location?: string): Promise<AttendanceRecord> => {
     const formData = new FormData();
@@ -310,11 +430,35 @@ export const checkinApi = {
     return response.data;
   },
 
-  exportAttendance: async (startDate?: string, endDate?: string): Promise<Blob> => {
+  listAttendancePage: async (
+    cursor?: string,
+    limit: number = 100,
+    startDate?: string,
+    endDate?: string,
+    personId?: number
+  ): Promise<{ records: AttendanceRecord[]; nextCursor: string | null }> => {
+    const response = await apiClient.get('/checkin/attendance/', {
+      params: {
+        cursor,
+        limit,
+        start_date: startDate,
+        end_date: endDate,
+        person_id: personId
+      }
+    });
+    return { records: response.data, nextCursor: response.headers['x-next-cursor'] ?? null };
+  },
+
+  exportAttendance: async (
+    startDate?: string,
+    endDate?: string,
+    format: 'csv' | 'parquet' | 'arrow' = 'csv'
+  ): Promise<Blob> => {
     const response = await apiClient.get('/checkin/attendance/export', {
       params: {
         start_date: startDate,
-        end_date: endDate
+        end_date: endDate,
+        format
       },
       responseType: 'blob'
     });
@@ -331,6 +475,40 @@ export const checkinApi = {
     const response = await apiClient.get('/checkin/attendance/today');
     return response.data;
   },
+
+  dailyAttendance: async (
+    startDate: string,
+    endDate: string,
+    location?: string,
+    department?: string
+  ): Promise<DailyAttendance[]> => {
+    const response = await apiClient.get('/checkin/attendance/daily', {
+      params: {
+        start_date: startDate,
+        end_date: endDate,
+        location,
+        department
+      }
+    });
+    return response.data;
+  },
+
+  attendanceAnalytics: async (
+    startDate: string,
+    endDate: string,
+    department?: string,
+    location?: string
+  ): Promise<AttendanceAnalytics> => {
+    const response = await apiClient.get('/checkin/attendance/analytics', {
+      params: {
+        start_date: startDate,
+        end_date: endDate,
+        department,
+        location
+      }
+    });
+    return response.data;
+  },
 };
 
 export default apiClient;
@@ -57,6 +57,11 @@ export interface Model {
   metrics?: any;
   is_public: boolean;
   is_deployed: boolean;
+  max_batch_size?: number;
+  max_batch_wait_ms?: number;
+  runtime?: 'onnx' | 'openvino';
+  runtime_path?: string;
+  runtime_error?: string;
   created_at: string;
   updated_at?: string;
 }
@@ -96,6 +101,33 @@ export interface PredictionResult {
   image_path: string;
   predictions: BoundingBox[];
   inference_time: number;
+  backend: string;
+}
+
+// Parallel arrays instead of one object per box (format=columnar)
+export interface PredictionColumns {
+  image_path: string;
+  boxes: number[]; // flat [x_min, y_min, x_max, y_max, ...]
+  class_ids: number[];
+  confidences: number[];
+  classes: Record<string, string>;
+  inference_time: number;
+  backend: string;
+}
+
+export interface PredictionJob {
+  id: number;
+  model_id: number;
+  status: 'pending' | 'running' | 'completed' | 'failed';
+  confidence: number;
+  iou_threshold: number;
+  total: number;
+  processed: number;
+  failed: number;
+  error_message?: string;
+  started_at?: string;
+  completed_at?: string;
+  created_at: string;
 }
 
 export interface DatasetStatistics {
@@ -113,12 +145,62 @@ export interface Person {
   name: string;
   employee_id?: string;
   department?: string;
+  sites: string[];
   photo_path?: string;
   is_active: boolean;
   created_at: string;
   updated_at?: string;
 }
 
+export interface FaceTemplate {
+  id: number;
+  person_id: number;
+  source: 'enrollment' | 'check_in';
+  photo_path?: string;
+  created_at?: string;
+}
+
+export interface EnrollmentRowReport {
+  row: number;
+  name?: string;
+  employee_id?: string;
+  status: 'created' | 'error';
+  detail?: string;
+  person_id?: number;
+}
+
+export interface EnrollmentJob {
+  id: number;
+  status: 'pending' | 'running' | 'completed' | 'failed';
+  total: number;
+  processed: number;
+  succeeded: number;
+  failed: number;
+  report?: EnrollmentRowReport[];
+  error_message?: string;
+  started_at?: string;
+  completed_at?: string;
+  created_at: string;
+}
+
+export interface ReencodeJob {
+  id: number;
+  status: 'pending' | 'running' | 'completed' | 'failed';
+  parameters?: Record<string, unknown>;
+  total: number;
+  processed: number;
+  failed: number;
+  last_person_id: number;
+  last_template_id?: number;
+  throughput?: number;
+  eta_seconds?: number;
+  failures?: { person_id: number; template_id?: number; detail: string }[];
+  error_message?: string;
+  started_at?: string;
+  completed_at?: string;
+  created_at: string;
+}
+
 export interface AttendanceRecord {
   id: number;
   person_id: number;
@@ -132,6 +214,39 @@ export interface AttendanceRecord {
   person?: Person;
 }
 
+export interface DailyAttendance {
+  date: string;
+  check_ins: number;
+  check_outs: number;
+  persons: number;
+}
+
+export interface PersonDayStats {
+  date: string;
+  week: string;
+  person_id?: number;
+  person_name?: string;
+  department?: string;
+  first_in: string;
+  last_out?: string;
+  hours: number;
+  week_hours: number;
+}
+
+export interface DepartmentRate {
+  department: string;
+  headcount: number;
+  present_days: number;
+  attendance_rate: number;
+}
+
+export interface AttendanceAnalytics {
+  start_date: string;
+  end_date: string;
+  person_days: PersonDayStats[];
+  departments: DepartmentRate[];
+}
+
 export interface FaceDetection {
   x: number;
   y: number;
@@ -141,9 +256,13 @@ export interface FaceDetection {
   person_id?: number;
   person_name?: string;
   match_confidence?: number;
+  track_id?: number;
+  quality?: string;
 }
 
 export interface FaceDetectionResult {
   faces: FaceDetection[];
   processing_time: number;
+  timings?: Record<string, number>;
+  gated?: boolean;
 }